@@ -1,6 +1,20 @@
 # -*- coding: utf-8 -*-
 from ..base import ComponentAPI
 
+# 修改集群、模块后需要失效拓扑、模块相关的缓存
+MODULE_WRITE_APIS = [
+    'cc.add_module', 'cc.create_module', 'cc.del_module', 'cc.delete_module',
+    'cc.update_module', 'cc.update_module_property',
+]
+SET_WRITE_APIS = [
+    'cc.add_set', 'cc.create_set', 'cc.del_set', 'cc.delete_set', 'cc.batch_delete_set',
+    'cc.update_set', 'cc.update_set_property', 'cc.update_set_service_status',
+]
+OBJECT_ATTRIBUTE_WRITE_APIS = [
+    'cc.create_object_attribute', 'cc.update_object_attribute', 'cc.delete_object_attribute',
+]
+PLAT_WRITE_APIS = ['cc.add_plat_id', 'cc.del_plat']
+
 
 class CollectionsCC(object):
     """Collections of CC APIS"""
@@ -206,7 +220,9 @@ class CollectionsCC(object):
         self.search_object_attribute = ComponentAPI(
             client=self.client, method='POST',
             path='/api/c/compapi{bk_api_ver}/cc/search_object_attribute/',
-            description=u'查询对象模型属性'
+            description=u'查询对象模型属性',
+            cache_ttl=300,
+            invalidated_by=OBJECT_ATTRIBUTE_WRITE_APIS
         )
         self.search_object_topo = ComponentAPI(
             client=self.client, method='POST',
@@ -481,7 +497,9 @@ class CollectionsCC(object):
         self.get_modules = ComponentAPI(
             client=self.client, method='GET',
             path='/api/c/compapi{bk_api_ver}/cc/get_modules/',
-            description=u'查询业务下的所有模块'
+            description=u'查询业务下的所有模块',
+            cache_ttl=60,
+            invalidated_by=MODULE_WRITE_APIS + SET_WRITE_APIS
         )
         self.get_modules_by_property = ComponentAPI(
             client=self.client, method='GET',
@@ -491,7 +509,9 @@ class CollectionsCC(object):
         self.get_plat_id = ComponentAPI(
             client=self.client, method='GET',
             path='/api/c/compapi{bk_api_ver}/cc/get_plat_id/',
-            description=u'查询子网列表'
+            description=u'查询子网列表',
+            cache_ttl=300,
+            invalidated_by=PLAT_WRITE_APIS
         )
         self.get_proc_config_instance_status = ComponentAPI(
             client=self.client, method='GET',
@@ -526,7 +546,9 @@ class CollectionsCC(object):
         self.get_topo_tree_by_app_id = ComponentAPI(
             client=self.client, method='GET',
             path='/api/c/compapi{bk_api_ver}/cc/get_topo_tree_by_app_id/',
-            description=u'查询业务拓扑树'
+            description=u'查询业务拓扑树',
+            cache_ttl=60,
+            invalidated_by=MODULE_WRITE_APIS + SET_WRITE_APIS
         )
         self.update_custom_property = ComponentAPI(
             client=self.client, method='POST',
@@ -1,9 +1,13 @@
 # -*- coding: utf-8 -*-
 import json
+import time
 import logging
 
+from . import conf
+from .cache import response_cache
 from .exceptions import ComponentAPIException
 from .conf import COMPONENT_SYSTEM_HOST
+from .metrics import api_metrics
 
 
 logger = logging.getLogger('component')
@@ -14,7 +18,12 @@ class ComponentAPI(object):
 
     HTTP_STATUS_OK = 200
 
-    def __init__(self, client, method, path, description='', default_return_value=None):
+    def __init__(self, client, method, path, description='', default_return_value=None, cache_ttl=None,
+                 invalidated_by=None):
+        """
+        :param int cache_ttl: cache successful responses for cache_ttl seconds, only for idempotent apis
+        :param list invalidated_by: apis which invalidate cached responses after they succeed
+        """
         host = COMPONENT_SYSTEM_HOST
         # Do not use join, use '+' because path may starts with '/'
         self.host = host.rstrip('/')
@@ -23,6 +32,11 @@ class ComponentAPI(object):
         self.client = client
         self.method = method
         self.default_return_value = default_return_value
+        self.metrics_key = '%s %s' % (method, path.format(bk_api_ver=''))
+        self.name = '.'.join(path.rstrip('/').split('/')[-2:])
+        self.cache_ttl = conf.COMPONENT_CACHE_TTL.get(self.name, cache_ttl)
+        if self.cache_ttl and invalidated_by:
+            response_cache.register(self.name, invalidated_by)
 
     def get_url_with_api_ver(self):
         bk_api_ver = self.client.get_bk_api_ver()
@@ -30,10 +44,42 @@ class ComponentAPI(object):
         return self.host + self.path.format(bk_api_ver=sub_path)
 
     def __call__(self, *args, **kwargs):
+        params = {}
+        if args and isinstance(args[0], dict):
+            params = args[0]
+        params.update(kwargs)
+        return self.call(params)
+
+    def call(self, params, timeout=None):
+        """Call api with request options
+
+        :param dict params: api params
+        :param timeout: seconds or a (connect timeout, read timeout) tuple, use default timeouts if not specified
+        """
+        if self.cache_ttl:
+            return response_cache.call(self, params, lambda: self._request(params, timeout))
+        result = self._request(params, timeout)
+        response_cache.after_call(self, params, result)
+        return result
+
+    def invalidate_cache(self, biz_id=None):
+        """Invalidate cached responses of this api
+
+        :param biz_id: only invalidate responses of this business, invalidate all if not specified
+        """
+        response_cache.invalidate(self.name, biz_id)
+
+    def _request(self, params, timeout=None):
         self.url = self.get_url_with_api_ver()
+        start = time.time()
+        error = None
         try:
-            return self._call(*args, **kwargs)
+            result = self._call(params, timeout)
+            if isinstance(result, dict) and not result.get('result', True):
+                error = 'result'
+            return result
         except ComponentAPIException, e:
+            error = e.error_type
             # Combine log message
             log_message = [e.error_message, ]
             log_message.append('url=%(url)s' % {'url': e.api_obj.url})
@@ -49,12 +95,11 @@ class ComponentAPI(object):
                 except:
                     pass
             return {'result': False, 'message': e.error_message, 'data': None}
+        finally:
+            api_metrics.record(self.metrics_key, time.time() - start, error)
 
-    def _call(self, *args, **kwargs):
-        params, data = {}, {}
-        if args and isinstance(args[0], dict):
-            params = args[0]
-        params.update(kwargs)
+    def _call(self, params, timeout=None):
+        data = {}
 
         # Validate params for POST request
         if self.method == 'POST':
@@ -63,20 +108,23 @@ class ComponentAPI(object):
             try:
                 json.dumps(data)
             except Exception:
-                raise ComponentAPIException(self, 'Request parameter error (please pass in a dict or json string)')
+                raise ComponentAPIException(self, 'Request parameter error (please pass in a dict or json string)',
+                                            error_type='params')
 
         # Request remote server
         try:
-            resp = self.client.request(self.method, self.url, params=params, data=data)
+            request_kwargs = {'timeout': timeout} if timeout else {}
+            resp = self.client.request(self.method, self.url, params=params, data=data, **request_kwargs)
         except Exception, e:
             logger.exception('Error occurred when requesting method=%s url=%s',
                              self.method, self.url)
-            raise ComponentAPIException(self, u'Request component error, Exception: %s' % str(e))
+            raise ComponentAPIException(self, u'Request component error, Exception: %s' % str(e),
+                                        error_type='request')
 
         # Parse result
         if resp.status_code != self.HTTP_STATUS_OK:
             message = 'Request component error, status_code: %s' % resp.status_code
-            raise ComponentAPIException(self, message, resp=resp)
+            raise ComponentAPIException(self, message, resp=resp, error_type='status')
         try:
             # Parse response
             json_resp = resp.json()
@@ -99,4 +147,5 @@ class ComponentAPI(object):
             return json_resp
         except:
             raise ComponentAPIException(
-                self, 'Return data format is incorrect, which shall be unified as json', resp=resp)
+                self, 'Return data format is incorrect, which shall be unified as json', resp=resp,
+                error_type='format')
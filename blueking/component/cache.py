@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""Response cache for idempotent component apis
+
+An api is cached when it is declared with cache_ttl, or configured in COMPONENT_CACHE_TTL.
+Cache keys are built from api name, business, api version, language, the client's common args
+(which carry the caller's identity, e.g. bk_username) and params, so callers never share responses.
+
+Invalidation replaces the random version token of an api or a business, the tokens never expire,
+and an evicted token is replaced by a new random one, so stale responses can not be reached again.
+"""
+import copy
+import json
+import uuid
+import hashlib
+import logging
+import threading
+
+from . import conf
+from .metrics import api_metrics
+
+logger = logging.getLogger('component')
+
+BIZ_PARAM_KEYS = ('bk_biz_id', 'app_id', 'biz_id')
+
+
+def get_biz_id(params):
+    if not isinstance(params, dict):
+        return ''
+    for key in BIZ_PARAM_KEYS:
+        if params.get(key) not in (None, ''):
+            return str(params[key])
+    return ''
+
+
+class Flight(object):
+    """An in-progress request shared by concurrent identical calls"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+
+
+class ResponseCache(object):
+
+    def __init__(self):
+        self._invalidations = {}
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        from django.core.cache import caches
+        return caches[conf.COMPONENT_CACHE_ALIAS]
+
+    def register(self, api_name, invalidated_by):
+        """Invalidate cached responses of api_name after any api in invalidated_by succeeds
+
+        :param str api_name: cached api, e.g. "cc.get_modules"
+        :param list invalidated_by: write apis, e.g. ["cc.create_module", "cc.delete_module"]
+        """
+        for name in invalidated_by:
+            self._invalidations.setdefault(name, set()).add(api_name)
+
+    def _version_keys(self, api_name, biz_id):
+        api_version_key = '%s:version:%s' % (conf.COMPONENT_CACHE_PREFIX, api_name)
+        return api_version_key, '%s:%s' % (api_version_key, biz_id)
+
+    def _get_versions(self, keys):
+        versions = self.backend.get_many(keys)
+        missing = [key for key in keys if key not in versions]
+        if missing:
+            for key in missing:
+                self.backend.add(key, uuid.uuid4().hex, None)
+            # another process may add the token first
+            versions.update(self.backend.get_many(missing))
+        return [versions[key] for key in keys]
+
+    def make_key(self, api, params):
+        biz_id = get_biz_id(params)
+        api_version, biz_version = self._get_versions(self._version_keys(api.name, biz_id))
+        digest = hashlib.md5(json.dumps([api.client.get_bk_api_ver(), unicode(api.client.language),
+                                         api.client.common_args, params], sort_keys=True)).hexdigest()
+        return '%s:%s:%s:%s.%s:%s' % (conf.COMPONENT_CACHE_PREFIX, api.name, biz_id, api_version, biz_version, digest)
+
+    def call(self, api, params, request):
+        """Return cached response, or call request() once for concurrent identical calls and cache the result
+
+        :param ComponentAPI api: cached api
+        :param dict params: api params
+        :param request: function which sends the request
+        """
+        try:
+            key = self.make_key(api, params)
+            result = self.backend.get(key)
+        except Exception:
+            logger.exception('Error occurred when getting component cache of %s', api.name)
+            return request()
+
+        if result is not None:
+            api_metrics.record_cache(api.metrics_key, 'hit')
+            return result
+
+        with self._lock:
+            flight = self._flights.get(key)
+            is_leader = flight is None
+            if is_leader:
+                flight = self._flights[key] = Flight()
+
+        if not is_leader:
+            api_metrics.record_cache(api.metrics_key, 'shared')
+            flight.event.wait()
+            if flight.result is None:
+                return request()
+            return copy.deepcopy(flight.result)
+
+        api_metrics.record_cache(api.metrics_key, 'miss')
+        try:
+            flight.result = request()
+            if isinstance(flight.result, dict) and flight.result.get('result'):
+                self.backend.set(key, flight.result, api.cache_ttl)
+        except Exception:
+            logger.exception('Error occurred when setting component cache of %s', api.name)
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.event.set()
+        return flight.result
+
+    def invalidate(self, api_name, biz_id=None):
+        """Invalidate cached responses of api_name
+
+        :param str api_name: cached api, e.g. "cc.get_modules"
+        :param biz_id: only invalidate responses of this business, invalidate all if not specified
+        """
+        api_version_key, biz_version_key = self._version_keys(api_name, biz_id)
+        key = biz_version_key if biz_id else api_version_key
+        self.backend.set(key, uuid.uuid4().hex, None)
+
+    def after_call(self, api, params, result):
+        """Invalidate apis which are registered to be invalidated by api after it succeeds
+        """
+        api_names = self._invalidations.get(api.name)
+        if not api_names or not (isinstance(result, dict) and result.get('result')):
+            return
+        biz_id = get_biz_id(params) or None
+        for api_name in api_names:
+            try:
+                self.invalidate(api_name, biz_id)
+            except Exception:
+                logger.exception('Error occurred when invalidating component cache of %s', api_name)
+
+
+response_cache = ResponseCache()
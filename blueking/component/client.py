@@ -1,12 +1,19 @@
 # -*- coding: utf-8 -*-
 """Component API Client
 """
+import os
 import requests
 import json
 import time
 import random
 import logging
+import threading
 import urlparse
+from multiprocessing.pool import ThreadPool
+
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.packages import six
+from requests.packages.urllib3.util.retry import Retry
 
 from . import conf
 from . import collections
@@ -22,6 +29,62 @@ except:
 logger = logging.getLogger('component')
 
 
+class IdempotentRetry(Retry):
+    """Retry policy which never resends a non-idempotent request the server may have received
+
+    Read errors (timeouts, connections dropped after the request was sent) are only retried for
+    methods in method_whitelist, connection errors are retried for all methods.
+    """
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        if error and self._is_read_error(error) and method and method.upper() not in self.method_whitelist:
+            raise six.reraise(type(error), error, _stacktrace)
+        return super(IdempotentRetry, self).increment(method=method, url=url, response=response, error=error,
+                                                      _pool=_pool, _stacktrace=_stacktrace)
+
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def create_session():
+    """Create a session with keep-alive connection pool and retry policy
+    """
+    session = requests.Session()
+    retries = IdempotentRetry(total=conf.COMPONENT_MAX_RETRIES,
+                              backoff_factor=conf.COMPONENT_RETRY_BACKOFF_FACTOR,
+                              status_forcelist=[502, 503, 504])
+    adapter = HTTPAdapter(pool_connections=conf.COMPONENT_POOL_CONNECTIONS,
+                          pool_maxsize=conf.COMPONENT_POOL_MAXSIZE,
+                          max_retries=retries)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def get_session():
+    """Get the session shared by all clients in current process
+
+    A new session is created after fork, so that worker processes do not share sockets with parent.
+    """
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                _session = create_session()
+                _session_pid = pid
+    return _session
+
+
+def send_request(method, url, **kwargs):
+    """Send request with the shared session, apply default timeouts when not specified
+    """
+    kwargs.setdefault('timeout', (conf.COMPONENT_CONNECT_TIMEOUT, conf.COMPONENT_READ_TIMEOUT))
+    return get_session().request(method, url, **kwargs)
+
+
 class BaseComponentClient(object):
     """Base client class for component"""
 
@@ -96,8 +159,38 @@ class BaseComponentClient(object):
 
         params, data = self.merge_params_data_with_common_args(method, params, data, enable_app_secret=True)
         logger.debug('Calling %s %s with params=%s, data=%s, headers=%s', method, url, params, data, headers)
-        return requests.request(method, url, params=params, data=data, verify=False,
-                                headers=headers, **kwargs)
+        return send_request(method, url, params=params, data=data, verify=False,
+                            headers=headers, **kwargs)
+
+    def batch_call(self, calls, pool_size=None, timeout=None):
+        """Call component apis concurrently
+
+        :param list calls: list of (api, params), e.g. [(client.cc.update_set, {...}), ...]
+        :param int pool_size: max concurrent calls, COMPONENT_BATCH_POOL_SIZE by default
+        :param timeout: timeout of each call, seconds or a (connect timeout, read timeout) tuple
+        :returns: results in the same order as calls, a failed call does not affect others and returns
+                  {'result': False, 'message': ..., 'data': None} like a single call
+        """
+        calls = list(calls)
+        pool_size = pool_size or conf.COMPONENT_BATCH_POOL_SIZE
+
+        def call(item):
+            api, params = item
+            try:
+                return api.call(params, timeout=timeout)
+            except Exception, e:
+                logger.exception('Error occurred when calling component %s', getattr(api, 'path', api))
+                return {'result': False, 'message': u'Request component error, Exception: %s' % e, 'data': None}
+
+        if pool_size <= 1 or len(calls) <= 1:
+            return map(call, calls)
+
+        pool = ThreadPool(min(pool_size, len(calls)))
+        try:
+            return pool.map(call, calls)
+        finally:
+            pool.close()
+            pool.join()
 
     def __getattr__(self, key):
         if key not in self.available_collections:
@@ -135,8 +228,8 @@ class ComponentClientWithSignature(BaseComponentClient):
         params['bk_signature'] = get_signature(method, url_path, self.app_secret, params=params, data=data)
 
         logger.debug('Calling %s %s with params=%s, data=%s', method, url, params, data)
-        return requests.request(method, url, params=params, data=data, verify=False,
-                                headers=headers, **kwargs)
+        return send_request(method, url, params=params, data=data, verify=False,
+                            headers=headers, **kwargs)
 
 
 # 根据是否开启signature来判断使用的Client版本
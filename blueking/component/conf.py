@@ -10,10 +10,46 @@ try:
     SECRET_KEY = settings.APP_TOKEN
     COMPONENT_SYSTEM_HOST = settings.BK_PAAS_HOST
     DEFAULT_BK_API_VER = getattr(settings, 'DEFAULT_BK_API_VER', 'v2')
+    COMPONENT_POOL_CONNECTIONS = getattr(settings, 'COMPONENT_POOL_CONNECTIONS', 10)
+    COMPONENT_POOL_MAXSIZE = getattr(settings, 'COMPONENT_POOL_MAXSIZE', 50)
+    COMPONENT_CONNECT_TIMEOUT = getattr(settings, 'COMPONENT_CONNECT_TIMEOUT', 5)
+    COMPONENT_READ_TIMEOUT = getattr(settings, 'COMPONENT_READ_TIMEOUT', 60)
+    COMPONENT_MAX_RETRIES = getattr(settings, 'COMPONENT_MAX_RETRIES', 3)
+    COMPONENT_RETRY_BACKOFF_FACTOR = getattr(settings, 'COMPONENT_RETRY_BACKOFF_FACTOR', 0.1)
+    COMPONENT_BATCH_POOL_SIZE = getattr(settings, 'COMPONENT_BATCH_POOL_SIZE', 10)
+    COMPONENT_CACHE_TTL = getattr(settings, 'COMPONENT_CACHE_TTL', {})
+    COMPONENT_CACHE_ALIAS = getattr(settings, 'COMPONENT_CACHE_ALIAS', 'default')
+    COMPONENT_CACHE_PREFIX = getattr(settings, 'COMPONENT_CACHE_PREFIX', 'component_cache')
 except:
     APP_CODE = ''
     SECRET_KEY = ''
     COMPONENT_SYSTEM_HOST = ''
     DEFAULT_BK_API_VER = 'v2'
+    COMPONENT_POOL_CONNECTIONS = 10
+    COMPONENT_POOL_MAXSIZE = 50
+    COMPONENT_CONNECT_TIMEOUT = 5
+    COMPONENT_READ_TIMEOUT = 60
+    COMPONENT_MAX_RETRIES = 3
+    COMPONENT_RETRY_BACKOFF_FACTOR = 0.1
+    COMPONENT_BATCH_POOL_SIZE = 10
+    COMPONENT_CACHE_TTL = {}
+    COMPONENT_CACHE_ALIAS = 'default'
+    COMPONENT_CACHE_PREFIX = 'component_cache'
 
 CLIENT_ENABLE_SIGNATURE = False
+
+# HTTP connection pool:
+#   COMPONENT_POOL_CONNECTIONS: number of hosts to keep connection pools for
+#   COMPONENT_POOL_MAXSIZE: max keep-alive connections per host, should not be less than the
+#                           number of threads that call components concurrently in one process
+# Default timeouts (seconds) for requests which do not specify one:
+#   COMPONENT_CONNECT_TIMEOUT, COMPONENT_READ_TIMEOUT
+# Retries, idempotent methods are retried on connection errors, read errors and 502/503/504,
+# other methods (e.g. POST) are only retried when the connection could not be established:
+#   COMPONENT_MAX_RETRIES, COMPONENT_RETRY_BACKOFF_FACTOR
+# Max concurrent calls of ComponentClient.batch_call, keep it less than COMPONENT_POOL_MAXSIZE:
+#   COMPONENT_BATCH_POOL_SIZE
+# Response cache of idempotent apis, stored in django cache COMPONENT_CACHE_ALIAS:
+#   COMPONENT_CACHE_TTL: {api name: ttl}, e.g. {"cc.get_modules": 60}, overrides cache_ttl declared in apis,
+#                        0 disables the cache of a declared api
+#   COMPONENT_CACHE_PREFIX: prefix of cache keys
@@ -8,10 +8,11 @@ class ComponentBaseException(Exception):
 class ComponentAPIException(ComponentBaseException):
     """Exception for Component API"""
 
-    def __init__(self, api_obj, error_message, resp=None):
+    def __init__(self, api_obj, error_message, resp=None, error_type='error'):
         self.api_obj = api_obj
         self.error_message = error_message
         self.resp = resp
+        self.error_type = error_type
 
         if self.resp is not None:
             error_message = '%s, resp=%s' % (error_message, self.resp.text)
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""Per-API latency and error statistics of component calls in current process
+"""
+import threading
+
+
+class APIMetrics(object):
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, api, elapsed, error=None):
+        """Record one call
+
+        :param str api: api identifier, e.g. "POST /cc/get_app_host_list/"
+        :param float elapsed: seconds spent
+        :param str error: error type, None if the call succeeded
+        """
+        with self._lock:
+            stat = self._stats.get(api)
+            if stat is None:
+                stat = self._stats[api] = self._new_stat()
+            stat['count'] += 1
+            stat['total_time'] += elapsed
+            stat['max_time'] = max(stat['max_time'], elapsed)
+            if error:
+                stat['errors'][error] = stat['errors'].get(error, 0) + 1
+
+    def record_cache(self, api, event):
+        """Record one response cache lookup
+
+        :param str api: api identifier
+        :param str event: "hit", "miss", or "shared" (waited for an identical in-progress call)
+        """
+        with self._lock:
+            stat = self._stats.get(api)
+            if stat is None:
+                stat = self._stats[api] = self._new_stat()
+            stat['cache'][event] = stat['cache'].get(event, 0) + 1
+
+    def _new_stat(self):
+        return {'count': 0, 'total_time': 0.0, 'max_time': 0.0, 'errors': {}, 'cache': {}}
+
+    def snapshot(self, reset=False):
+        """Return statistics of each api
+
+        :param bool reset: clear statistics after taking the snapshot
+        """
+        with self._lock:
+            stats = self._stats
+            if reset:
+                self._stats = {}
+            result = {}
+            for api, stat in stats.iteritems():
+                result[api] = {
+                    'count': stat['count'],
+                    'avg_time': stat['total_time'] / stat['count'] if stat['count'] else 0.0,
+                    'max_time': stat['max_time'],
+                    'error_count': sum(stat['errors'].values()),
+                    'errors': dict(stat['errors']),
+                    'cache': dict(stat['cache']),
+                }
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+
+
+api_metrics = APIMetrics()
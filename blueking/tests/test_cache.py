@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+import json
+import time
+
+from django.core.cache import caches
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from blueking.component.base import ComponentAPI
+from blueking.component.client import ComponentClient
+from blueking.component.metrics import api_metrics
+from blueking.tests.utils import ThreadingHTTPServer, StubHandler
+
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
+class CCHandler(StubHandler):
+    def handle_request(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        api_name = self.path.split('?')[0].rstrip('/').rsplit('/', 1)[-1]
+        self.server.requests.append(api_name)
+        time.sleep(self.server.latency)
+        result = self.server.results.get(api_name, True)
+        self.send_body(json.dumps({'result': result, 'message': '', 'data': len(self.server.requests)}))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TestResponseCache(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(CCHandler)
+        self.server.requests = []
+        self.server.results = {}
+        self.server.latency = 0
+        self.server.start()
+        self.client = ComponentClient(bk_app_code='test', bk_app_secret='xxx', common_args={'bk_username': 'admin'})
+        for api in self.client.cc.__dict__.values():
+            if isinstance(api, ComponentAPI):
+                api.host = self.server.host
+        api_metrics.reset()
+        caches['default'].clear()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_hit_and_miss(self):
+        first = self.client.cc.get_modules({'app_id': 1})
+        self.assertEqual(self.client.cc.get_modules({'app_id': 1}), first)
+        self.client.cc.get_modules({'app_id': 2})
+        self.assertEqual(self.server.requests, ['get_modules', 'get_modules'])
+        stats = api_metrics.snapshot()['GET /api/c/compapi/cc/get_modules/']
+        self.assertEqual(stats['cache'], {'hit': 1, 'miss': 2})
+        self.assertEqual(stats['count'], 2)
+
+    def test_failed_response_not_cached(self):
+        self.server.results['get_modules'] = False
+        self.client.cc.get_modules({'app_id': 1})
+        self.client.cc.get_modules({'app_id': 1})
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_invalidate(self):
+        self.client.cc.get_modules({'app_id': 1})
+        self.client.cc.get_modules({'app_id': 2})
+        self.client.cc.get_topo_tree_by_app_id({'app_id': 1})
+
+        # 修改模块后失效该业务下的模块和拓扑缓存
+        self.client.cc.update_module({'bk_biz_id': 1, 'bk_module_id': 1})
+        self.client.cc.get_modules({'app_id': 1})
+        self.client.cc.get_modules({'app_id': 2})
+        self.client.cc.get_topo_tree_by_app_id({'app_id': 1})
+        self.assertEqual(self.server.requests, ['get_modules', 'get_modules', 'get_topo_tree_by_app_id',
+                                                'update_module', 'get_modules', 'get_topo_tree_by_app_id'])
+
+        self.client.cc.get_modules.invalidate_cache()
+        self.client.cc.get_modules({'app_id': 2})
+        self.assertEqual(self.server.requests[-1], 'get_modules')
+
+    def test_cached_per_user(self):
+        other = ComponentClient(bk_app_code='test', bk_app_secret='xxx', common_args={'bk_username': 'other'})
+        other.cc.get_topo_tree_by_app_id.host = self.client.cc.get_topo_tree_by_app_id.host
+        self.client.cc.get_topo_tree_by_app_id({'app_id': 1})
+        other.cc.get_topo_tree_by_app_id({'app_id': 1})
+        self.client.cc.get_topo_tree_by_app_id({'app_id': 1})
+        self.assertEqual(self.server.requests, ['get_topo_tree_by_app_id', 'get_topo_tree_by_app_id'])
+
+    def test_version_evicted(self):
+        self.client.cc.get_modules({'app_id': 1})
+        self.client.cc.update_module({'bk_biz_id': 1, 'bk_module_id': 1})
+        self.client.cc.get_modules({'app_id': 1})
+
+        # 版本被淘汰后不会回到失效前的版本
+        caches['default'].delete('component_cache:version:cc.get_modules:1')
+        self.client.cc.get_modules({'app_id': 1})
+        self.client.cc.get_modules({'app_id': 1})
+        self.assertEqual(self.server.requests, ['get_modules', 'update_module', 'get_modules', 'get_modules'])
+
+    def test_single_flight(self):
+        self.server.latency = 0.2
+        calls = [(self.client.cc.get_plat_id, {'plat_company': 'c'}) for __ in xrange(5)]
+        results = self.client.batch_call(calls, pool_size=5)
+        self.assertEqual(self.server.requests, ['get_plat_id'])
+        self.assertEqual([result['data'] for result in results], [1] * 5)
+        stats = api_metrics.snapshot()['GET /api/c/compapi/cc/get_plat_id/']
+        self.assertEqual(stats['cache'], {'miss': 1, 'shared': 4})
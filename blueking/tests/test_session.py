@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+import json
+import time
+
+from django.test import TestCase
+
+from blueking.component import client as client_module
+from blueking.component.base import ComponentAPI
+from blueking.component.client import ComponentClient
+from blueking.component.metrics import api_metrics
+from blueking.tests.utils import ThreadingHTTPServer, StubHandler
+
+
+class ComponentHandler(StubHandler):
+    def handle_request(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        data = json.loads(self.rfile.read(length)) if length else {}
+        self.server.requests.append((self.command, self.path.split('?')[0], self.client_address[1]))
+        if '/slow/' in self.path:
+            time.sleep(0.5)
+        if '/unavailable/' in self.path:
+            status, body = 503, ''
+        elif '/fail/' in self.path:
+            status, body = 200, json.dumps({'result': False, 'message': 'fail', 'data': None})
+        else:
+            status, body = 200, json.dumps({'result': True, 'message': 'success', 'data': data.get('index', 1)})
+        self.send_body(body, status)
+
+
+class TestComponentSession(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(ComponentHandler)
+        self.server.requests = []
+        self.server.start()
+        self.client = ComponentClient(bk_app_code='test', bk_app_secret='xxx', common_args={'bk_username': 'admin'})
+        api_metrics.reset()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def api(self, method, name):
+        api = ComponentAPI(self.client, method, '/api/c/compapi{bk_api_ver}/test/%s/' % name)
+        api.host = self.server.host
+        return api
+
+    def test_keep_alive(self):
+        api = self.api('POST', 'ok')
+        for __ in xrange(5):
+            self.assertTrue(api({'a': 1})['result'])
+        # 所有请求复用同一个连接
+        self.assertEqual(len(set([port for __, __, port in self.server.requests])), 1)
+        self.assertIs(client_module.get_session(), client_module.get_session())
+
+    def test_retry_idempotent_methods(self):
+        self.assertFalse(self.api('GET', 'unavailable')()['result'])
+        self.assertEqual(len(self.server.requests), 1 + client_module.conf.COMPONENT_MAX_RETRIES)
+
+        self.server.requests = []
+        self.assertFalse(self.api('POST', 'unavailable')()['result'])
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_metrics(self):
+        self.api('POST', 'ok')()
+        self.api('POST', 'ok')()
+        self.api('POST', 'fail')()
+        self.api('POST', 'unavailable')()
+        stats = api_metrics.snapshot(reset=True)
+        self.assertEqual(stats['POST /api/c/compapi/test/ok/']['count'], 2)
+        self.assertEqual(stats['POST /api/c/compapi/test/ok/']['error_count'], 0)
+        self.assertEqual(stats['POST /api/c/compapi/test/fail/']['errors'], {'result': 1})
+        self.assertEqual(stats['POST /api/c/compapi/test/unavailable/']['errors'], {'status': 1})
+        self.assertEqual(api_metrics.snapshot(), {})
+
+    def test_batch_call(self):
+        ok = self.api('POST', 'ok')
+        calls = [(ok, {'index': index}) for index in xrange(20)]
+        calls[3] = (self.api('POST', 'fail'), {})
+        calls[7] = (self.api('POST', 'slow'), {})
+        results = self.client.batch_call(calls, pool_size=5, timeout=(1, 0.1))
+
+        self.assertEqual(len(results), 20)
+        for index, result in enumerate(results):
+            if index in (3, 7):
+                self.assertFalse(result['result'])
+            else:
+                self.assertEqual(result, {'result': True, 'message': 'success', 'data': index})
+        self.assertEqual(results[3]['message'], 'fail')
+        self.assertIn('timed out', results[7]['message'])
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+组件调用测试使用的本地 HTTP 替身服务
+"""
+import threading
+import BaseHTTPServer
+import SocketServer
+
+from blueking.component.client import get_session
+
+
+class ThreadingHTTPServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    # 默认的 5 在并发建立连接时会溢出，导致客户端等待 SYN 重传
+    request_queue_size = 128
+
+    def __init__(self, handler_class):
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', 0), handler_class)
+        self.thread = None
+
+    def handle_error(self, request, client_address):
+        # 客户端超时后断开连接，服务端写入响应时的错误不需要输出
+        pass
+
+    @property
+    def host(self):
+        return 'http://127.0.0.1:%s' % self.server_port
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        # 关闭客户端保持的连接，让服务端的处理线程退出
+        get_session().close()
+        self.shutdown()
+        self.server_close()
+
+
+class StubHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    GET 和 POST 请求都交给 handle_request 处理，子类实现 handle_request 即可
+    """
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def handle_request(self):
+        raise NotImplementedError()
+
+    def send_body(self, body, status=200):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.handle_request()
+
+    def do_POST(self):
+        self.handle_request()
+
+    def log_message(self, *args):
+        pass
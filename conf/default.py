@@ -231,6 +231,27 @@ if IS_USE_CELERY:
         pass
     from pipeline.engine.celery.settings import *
 
+    # 任务事件回调在独立的队列中投递，不占用引擎的 worker
+    CELERY_ROUTES['gcloud.contrib.webhook.tasks.deliver_webhooks'] = {
+        'queue': 'webhook',
+        'routing_key': 'webhook'
+    }
+    CELERY_QUEUES += (Queue('webhook', default_exchange, routing_key='webhook'),)
+
+    # 任务通知在独立的队列中合并发送，CMSI 接口缓慢时不会阻塞引擎推进流程
+    CELERY_ROUTES['gcloud.taskflow3.tasks.send_notifications'] = {
+        'queue': 'notify',
+        'routing_key': 'notify'
+    }
+    CELERY_QUEUES += (Queue('notify', default_exchange, routing_key='notify'),)
+
+    # 业务主机索引的定时刷新需要查询配置平台全业务主机，在独立的队列中执行
+    CELERY_ROUTES['gcloud.core.tasks.refresh_host_index'] = {
+        'queue': 'host_index',
+        'routing_key': 'host_index'
+    }
+    CELERY_QUEUES += (Queue('host_index', default_exchange, routing_key='host_index'),)
+
 # ==============================================================================
 # logging
 # ==============================================================================
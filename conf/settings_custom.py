@@ -29,6 +29,7 @@ INSTALLED_APPS_CUSTOM = (
     'gcloud.contrib.appmaker',
     'gcloud.contrib.function',
     'gcloud.contrib.audit',
+    'gcloud.contrib.webhook',
     'gcloud.apigw',
     'pipeline',
     'pipeline.blueflow',
@@ -1,13 +1,33 @@
 # -*- coding: UTF-8 -*-
-from pyVim.connect import SmartConnect, Disconnect
-import ssl
+import time
 from common.log import logger
-from pyVim import connect
+from pyVmomi import vim, vmodl
 from pyVim.task import WaitForTask
+from session_pool import session_pool
+from inventory import inventory_cache, collect_object_properties, VCENTER_INVENTORY_MIN_REFRESH_INTERVAL
 import sys
+import functools
 reload(sys)
 
 
+# 会话在 vCenter 端失效（超时、vCenter 重启、被管理员注销）时丢弃会话，重新登录后重试一次
+# 抛出 NotAuthenticated 或者返回失败结果且会话已失效时重试，会话失效时操作不会执行，可以安全重试
+def retry_on_session_expired(func):
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        try:
+            result = func(self, *args, **kwargs)
+            expired = isinstance(result, dict) and not result.get("result", True) and \
+                not session_pool.is_alive(self.host, self.user, self.pwd)
+        except vim.fault.NotAuthenticated:
+            expired = True
+        if not expired:
+            return result
+        logger.info(u"vCenter session of %s@%s expired, retry %s" % (self.user, self.host, func.__name__))
+        session_pool.invalidate(self.host, self.user, self.pwd)
+        return func(self, *args, **kwargs)
+    return wrapper
+
 
 class Base:
     def __init__(self, user, pwd, host):
@@ -16,20 +36,18 @@ class Base:
         self.pwd = pwd
 
 
+    # 从会话池中获取 VC 会话，同一个 VC 和用户的多次调用复用同一个会话
     def _connect_vc(self):
         try:
-            context = ssl.SSLContext(ssl.PROTOCOL_TLSv1)
-            context.verify_mode = ssl.CERT_NONE
-            si = SmartConnect(host='192.168.102.200', user='administrator@vsphere.local', pwd='1qaz@WSX', port=443, sslContext=context)
-            # logger.error(u"connect VC")
-            return si
+            return session_pool.get(self.host, self.user, self.pwd)
         except Exception,e:
             logger.exception(e)
             return None
 
 
+    # 会话由会话池统一管理，调用结束后不需要登出
     def _deconnect_vc(self, si):
-        connect.Disconnect(si)
+        pass
 
 
     def _get_content(self):
@@ -38,19 +56,88 @@ class Base:
         return content
 
 
-    # 根据moId获取VM对象
+    # 通过 PropertyCollector 批量获取 container 下 vimtype 对象的属性，结果在缓存有效期内复用
+    def _get_inventory(self, content, vimtype, path_set, container=None, max_age=None):
+        return inventory_cache.get((self.host, self.user), self._connect_vc(), content, vimtype, path_set,
+                                   container, max_age)
+
+
+    # 虚拟机发生变化后丢弃缓存的清单
+    def _invalidate_inventory(self, vimtype=None):
+        inventory_cache.invalidate((self.host, self.user), vimtype)
+
+
+    # 根据moId获取VM对象，vimtype 中的多个类型依次查找
     def _get_obj_bymoId(self, content, vimtype, moId):
-        obj = None
-        container = content.viewManager.CreateContainerView(content.rootFolder, vimtype, True)
-        for c in container.view:
-            if moId:
-                if c._moId == moId:
-                    obj = c
-                    break
-            else:
-                obj = None
-                break
-        return obj
+        if not moId:
+            return None
+        for t in vimtype:
+            entry = self._get_inventory(content, t, ['name'])
+            obj = entry.index.get(moId)
+            # 缓存中不存在时可能是新建的对象，重新获取一次
+            if obj is None and time.time() - entry.time > VCENTER_INVENTORY_MIN_REFRESH_INTERVAL:
+                obj = self._get_inventory(content, t, ['name'], max_age=0).index.get(moId)
+            if obj is not None:
+                return obj
+        return None
+
+
+    # 根据任务ID获取任务对象，会话重新登录后任务ID仍然有效
+    def _get_task(self, task_moId):
+        si = self._connect_vc()
+        if si is None:
+            raise Exception(u"连接vCenter失败")
+        return vim.Task(task_moId, si._stub)
+
+
+    # 查询任务当前的状态，不等待任务结束
+    # finished 为 False 时任务仍在执行或者查询失败，查询失败时 result 为 False、data 为错误信息，否则 data 为任务进度
+    # 只有任务出错或者任务已不存在时才认为任务失败，连接等查询错误由调用方重试
+    @retry_on_session_expired
+    def get_task_result(self, task_moId):
+        try:
+            info = self._get_task(task_moId).info
+        except vmodl.fault.ManagedObjectNotFound,e:
+            logger.exception(e)
+            return {"result": False, "finished": True, "data": u"vCenter任务不存在: {0}".format(task_moId)}
+        except Exception,e:
+            logger.exception(e)
+            error_msg = e.message if e.message else str(e)
+            return {"result": False, "finished": False, "data": error_msg}
+        return self._format_task_info(info)
+
+
+    # 批量查询任务状态，一次请求获取所有任务的信息，返回 {任务ID: 同 get_task_result 的结果}
+    def get_task_results(self, task_moIds):
+        try:
+            si = self._connect_vc()
+            tasks = [vim.Task(task_moId, si._stub) for task_moId in task_moIds]
+            items = collect_object_properties(si.RetrieveContent(), tasks, vim.Task, ['info'])
+        except Exception,e:
+            # 有任务已不存在时整个请求失败，逐个查询
+            logger.exception(e)
+            return {task_moId: self.get_task_result(task_moId) for task_moId in task_moIds}
+        results = {}
+        for task, props in items:
+            results[task._moId] = self._format_task_info(props['info'])
+        for task_moId in task_moIds:
+            if task_moId not in results:
+                results[task_moId] = self.get_task_result(task_moId)
+        return results
+
+
+    def _format_task_info(self, info):
+        if info.state == 'success':
+            self._invalidate_inventory(vim.VirtualMachine)
+            return {"result": True, "finished": True, "data": info.result}
+        if info.state == 'error':
+            return {"result": False, "finished": True, "data": info.error.msg}
+        return {"result": True, "finished": False, "data": info.progress}
+
+
+    # 等待任务结束并返回结果
+    def wait_task(self, task_moId):
+        return self._wait_for_task(self._get_task(task_moId))
 
 
     # 获取任务的结果
@@ -60,6 +147,7 @@ class Base:
         while not task_done:
             if task.info.state == 'success':
                 # task_done = True
+                self._invalidate_inventory(vim.VirtualMachine)
                 return {"result": True, "data": task.info.result}
             if task.info.state == 'error':
                 # task_done = True
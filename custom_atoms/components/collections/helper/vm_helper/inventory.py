@@ -0,0 +1,101 @@
+# -*- coding: UTF-8 -*-
+import time
+import threading
+
+from django.conf import settings
+from pyVmomi import vim, vmodl
+
+# 清单缓存的有效时间(单位s)，表单查询和创建虚拟机时的对象查找共用
+VCENTER_INVENTORY_CACHE_TTL = getattr(settings, 'VCENTER_INVENTORY_CACHE_TTL', 60)
+# 按 moId 查找对象未命中时，距上次获取超过该时间(单位s)才重新获取，避免不存在的 moId 反复触发查询
+VCENTER_INVENTORY_MIN_REFRESH_INTERVAL = getattr(settings, 'VCENTER_INVENTORY_MIN_REFRESH_INTERVAL', 5)
+# PropertyCollector 每页返回的对象数量
+VCENTER_INVENTORY_PAGE_SIZE = getattr(settings, 'VCENTER_INVENTORY_PAGE_SIZE', 1000)
+
+
+def collect_properties(content, vimtype, path_set, container=None):
+    """
+    通过 PropertyCollector 一次获取 container 下所有 vimtype 对象的指定属性，
+    不需要对每个对象的每个属性单独请求
+    返回 [(对象, {属性路径: 值})]，对象没有的属性不在字典中
+    """
+    view = content.viewManager.CreateContainerView(container or content.rootFolder, [vimtype], True)
+    try:
+        traversal_spec = vmodl.query.PropertyCollector.TraversalSpec(
+            name='traverseView', path='view', skip=False, type=vim.view.ContainerView)
+        obj_spec = vmodl.query.PropertyCollector.ObjectSpec(obj=view, skip=True, selectSet=[traversal_spec])
+        prop_spec = vmodl.query.PropertyCollector.PropertySpec(type=vimtype, pathSet=list(path_set), all=False)
+        filter_spec = vmodl.query.PropertyCollector.FilterSpec(objectSet=[obj_spec], propSet=[prop_spec])
+        return _retrieve(content, filter_spec)
+    finally:
+        view.Destroy()
+
+
+def collect_object_properties(content, objs, vimtype, path_set):
+    """
+    通过 PropertyCollector 一次获取多个指定对象的属性，用于批量查询任务状态等
+    返回 [(对象, {属性路径: 值})]，任一对象不存在时整个请求失败
+    """
+    if not objs:
+        return []
+    obj_specs = [vmodl.query.PropertyCollector.ObjectSpec(obj=obj, skip=False) for obj in objs]
+    prop_spec = vmodl.query.PropertyCollector.PropertySpec(type=vimtype, pathSet=list(path_set), all=False)
+    filter_spec = vmodl.query.PropertyCollector.FilterSpec(objectSet=obj_specs, propSet=[prop_spec])
+    return _retrieve(content, filter_spec)
+
+
+def _retrieve(content, filter_spec):
+    options = vmodl.query.PropertyCollector.RetrieveOptions(maxObjects=VCENTER_INVENTORY_PAGE_SIZE)
+    collector = content.propertyCollector
+    result = collector.RetrievePropertiesEx([filter_spec], options)
+    items = []
+    while result:
+        for obj_content in result.objects:
+            items.append((obj_content.obj, {prop.name: prop.val for prop in obj_content.propSet or []}))
+        if not result.token:
+            break
+        result = collector.ContinueRetrievePropertiesEx(result.token)
+    return items
+
+
+class InventoryEntry(object):
+    def __init__(self, si, items):
+        self.si = si
+        self.items = items
+        self.index = {obj._moId: obj for obj, __ in items}
+        self.props = {obj._moId: props for obj, props in items}
+        self.time = time.time()
+
+
+class InventoryCache(object):
+    """
+    进程内的 vCenter 清单缓存，按 vCenter、用户、对象类型、容器和属性列表缓存 collect_properties 的结果
+    """
+
+    def __init__(self, ttl=VCENTER_INVENTORY_CACHE_TTL):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, owner, si, content, vimtype, path_set, container=None, max_age=None):
+        """
+        owner: (host, user)，会话重新登录后旧会话获取的对象不再使用
+        max_age: 缓存的最大有效时间，默认为 ttl，0 表示重新获取
+        """
+        key = owner + (vimtype, container._moId if container is not None else None, tuple(path_set))
+        max_age = self.ttl if max_age is None else max_age
+        entry = self._entries.get(key)
+        if entry is None or entry.si is not si or time.time() - entry.time >= max_age:
+            entry = InventoryEntry(si, collect_properties(content, vimtype, path_set, container))
+            with self._lock:
+                self._entries[key] = entry
+        return entry
+
+    def invalidate(self, owner, vimtype=None):
+        with self._lock:
+            for key in self._entries.keys():
+                if key[:len(owner)] == owner and (vimtype is None or key[len(owner)] is vimtype):
+                    self._entries.pop(key, None)
+
+
+inventory_cache = InventoryCache()
@@ -0,0 +1,133 @@
+# -*- coding: UTF-8 -*-
+import os
+import ssl
+import time
+import atexit
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from pyVim.connect import SmartConnect, Disconnect
+from common.log import logger
+
+# 每个进程最多保持的 vCenter 会话数量，超过时登出最久未使用的会话
+VCENTER_SESSION_MAX = getattr(settings, 'VCENTER_SESSION_MAX', 20)
+# 距离上次检查超过该时间(单位s)后，使用前检查会话是否仍然有效，频繁使用的会话也会定期检查
+VCENTER_SESSION_CHECK_INTERVAL = getattr(settings, 'VCENTER_SESSION_CHECK_INTERVAL', 60)
+
+
+class VCenterSession(object):
+    def __init__(self, si):
+        self.si = si
+        self.last_checked = time.time()
+        self.lock = threading.Lock()
+
+
+class VCenterSessionPool(object):
+    """
+    进程内的 vCenter 会话池，同一个 vCenter 和用户共用一个会话，避免每次调用都重新登录
+    """
+
+    def __init__(self, max_sessions=VCENTER_SESSION_MAX, check_interval=VCENTER_SESSION_CHECK_INTERVAL):
+        self.max_sessions = max_sessions
+        self.check_interval = check_interval
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    @staticmethod
+    def _key(host, user, pwd, port):
+        # 密码修改后使用新的会话
+        return host, port, user, hashlib.md5(pwd.encode('utf-8') if isinstance(pwd, unicode) else pwd).hexdigest()
+
+    @staticmethod
+    def _connect(host, user, pwd, port):
+        context = ssl.SSLContext(ssl.PROTOCOL_TLSv1)
+        context.verify_mode = ssl.CERT_NONE
+        return SmartConnect(host=host, user=user, pwd=pwd, port=port, sslContext=context)
+
+    @staticmethod
+    def _disconnect(si):
+        try:
+            Disconnect(si)
+        except Exception:
+            logger.exception(u"disconnect vCenter session error")
+
+    @staticmethod
+    def _is_alive(si):
+        try:
+            return si.content.sessionManager.currentSession is not None
+        except Exception:
+            return False
+
+    def get(self, host, user, pwd, port=443):
+        """
+        获取会话，会话不存在或已失效时重新登录
+        """
+        key = self._key(host, user, pwd, port)
+        with self._lock:
+            # 子进程不能使用父进程的连接，也不能登出父进程的会话
+            if self._pid != os.getpid():
+                self._sessions = OrderedDict()
+                self._pid = os.getpid()
+            session = self._sessions.pop(key, None)
+            if session is None:
+                session = VCenterSession(None)
+                self._evict()
+            self._sessions[key] = session
+
+        with session.lock:
+            now = time.time()
+            if session.si is not None and now - session.last_checked > self.check_interval:
+                if not self._is_alive(session.si):
+                    logger.info(u"vCenter session of %s@%s expired, reconnect" % (user, host))
+                    session.si = None
+                session.last_checked = now
+            if session.si is None:
+                try:
+                    session.si = self._connect(host, user, pwd, port)
+                except Exception:
+                    with self._lock:
+                        if self._sessions.get(key) is session:
+                            self._sessions.pop(key)
+                    raise
+                session.last_checked = now
+            return session.si
+
+    def is_alive(self, host, user, pwd, port=443):
+        """
+        检查会话是否仍然有效，会话不存在时返回 True，调用失败后用来判断是否由于会话失效导致
+        """
+        with self._lock:
+            session = self._sessions.get(self._key(host, user, pwd, port))
+        if session is None or session.si is None:
+            return True
+        return self._is_alive(session.si)
+
+    def invalidate(self, host, user, pwd, port=443):
+        """
+        调用方发现会话失效时，丢弃该会话，下次获取时重新登录
+        """
+        with self._lock:
+            session = self._sessions.pop(self._key(host, user, pwd, port), None)
+        if session and session.si is not None:
+            self._disconnect(session.si)
+
+    def _evict(self):
+        while len(self._sessions) >= self.max_sessions:
+            __, session = self._sessions.popitem(last=False)
+            if session.si is not None:
+                self._disconnect(session.si)
+
+    def close(self):
+        with self._lock:
+            sessions = self._sessions.values() if self._pid == os.getpid() else []
+            self._sessions = OrderedDict()
+        for session in sessions:
+            if session.si is not None:
+                self._disconnect(session.si)
+
+
+session_pool = VCenterSessionPool()
+atexit.register(session_pool.close)
@@ -1,53 +1,54 @@
 # -*- coding: UTF-8 -*-
-from base import Base
+from base import Base, retry_on_session_expired
 from pyVmomi import vim,vmodl
 from pyVim.task import WaitForTask
 from common.log import logger
 import datetime
 import time
 
+# 虚拟机列表需要的属性
+VM_PROPERTIES = ['name', 'summary.config.template', 'summary.config.guestFullName', 'summary.runtime.powerState',
+                 'summary.guest.ipAddress', 'config.hardware.numCPU', 'config.hardware.memoryMB',
+                 'config.hardware.device']
+# 存储列表需要的属性
+DS_PROPERTIES = ['name', 'parent', 'summary.accessible', 'summary.freeSpace']
+
 
 class Virtualmachine(Base):
 
     # 获取虚拟机
+    @retry_on_session_expired
     def get_vm_info(self):
         try:
             si = self._connect_vc()
             content = si.RetrieveContent()
-            vm_list = content.viewManager.CreateContainerView(content.rootFolder, [vim.VirtualMachine], True).view
             vms_list = []
-            for vm in vm_list:
-                summary = vm.summary
-                hardware = vm.config.hardware
-                device = hardware.device
+            for vm, props in self._get_inventory(content, vim.VirtualMachine, VM_PROPERTIES).items:
+                if props.get('summary.config.template') != False:
+                    continue
                 all_disk_size = 0
-                for j in device:
+                for j in props.get('config.hardware.device', []):
                     if isinstance(j, vim.vm.device.VirtualDisk):
                         all_disk_size += int(j.capacityInKB / 1024 / 1024)
-                if summary.config.template == False:
-                    device = vm.config.hardware.device
-                    ds_list = []
-                    for dev in device:
-                        if isinstance(dev, vim.vm.device.VirtualDisk):
-                            ds_list.append(dev)
-                    if summary.runtime.powerState == 'poweredOn':
-                        Status = u"运行中"
-                    elif summary.runtime.powerState == 'poweredOff':
-                        Status = u"已停止"
-                    else:
-                        Status = u"暂停的"
-                    vms_list.append({"resource_id": vm._moId,
-                                     "resource_name": vm.name,
-                                     "resource_type": "vm",
-                                     "moId": vm._moId,
-                                     "name": vm.name,
-                                     "vm_os": summary.config.guestFullName.decode("utf8"),
-                                     "Cpu": hardware.numCPU,
-                                     "Memory": hardware.memoryMB / 1024,
-                                     "DiskSize": all_disk_size,
-                                     "IpAddress": summary.guest.ipAddress,
-                                     "Status": Status})
-            self._deconnect_vc(si)
+                powerstate = props.get('summary.runtime.powerState')
+                if powerstate == 'poweredOn':
+                    Status = u"运行中"
+                elif powerstate == 'poweredOff':
+                    Status = u"已停止"
+                else:
+                    Status = u"暂停的"
+                vm_os = props.get('summary.config.guestFullName') or ''
+                vms_list.append({"resource_id": vm._moId,
+                                 "resource_name": props['name'],
+                                 "resource_type": "vm",
+                                 "moId": vm._moId,
+                                 "name": props['name'],
+                                 "vm_os": vm_os.decode("utf8") if isinstance(vm_os, str) else vm_os,
+                                 "Cpu": props.get('config.hardware.numCPU'),
+                                 "Memory": props.get('config.hardware.memoryMB', 0) / 1024,
+                                 "DiskSize": all_disk_size,
+                                 "IpAddress": props.get('summary.guest.ipAddress'),
+                                 "Status": Status})
             return {"result": True, "data": vms_list}
         except Exception,e:
             logger.exception("get_vm_info")
@@ -55,6 +56,7 @@ class Virtualmachine(Base):
 
 
     # 关闭虚拟机
+    @retry_on_session_expired
     def stop_vm(self, vm_moId):
         si = self._connect_vc()
         content = si.RetrieveContent()
@@ -72,6 +74,7 @@ class Virtualmachine(Base):
 
 
     # 重启虚拟机
+    @retry_on_session_expired
     def restart_vm(self, vm_moId):
         si = self._connect_vc()
         content = si.RetrieveContent()
@@ -90,6 +93,15 @@ class Virtualmachine(Base):
 
     # 开启虚拟机电源
     def start_vm(self, vm_moId):
+        task_result = self.start_vm_task(vm_moId)
+        if not task_result["result"]:
+            return task_result
+        return self.wait_task(task_result["data"])
+
+
+    # 提交开机任务，不等待任务结束，返回任务ID
+    @retry_on_session_expired
+    def start_vm_task(self, vm_moId):
         si = self._connect_vc()
         content = si.RetrieveContent()
         try:
@@ -97,8 +109,7 @@ class Virtualmachine(Base):
             powerstate = vm.summary.runtime.powerState
             if powerstate != "poweredOn":
                 task = vm.PowerOn()
-                task_result = self._wait_for_task(task)
-                return task_result
+                return {"result": True, "data": task._moId}
             else:
                 return {"result": False, "data": u"已开机状态的虚拟机无法进行开机操作"}
         except Exception, e:
@@ -107,6 +118,7 @@ class Virtualmachine(Base):
 
 
     # 关闭虚拟机电源
+    @retry_on_session_expired
     def poweroff_vm(self, vmargs):
         si = self._connect_vc()
         content = si.RetrieveContent()
@@ -121,6 +133,7 @@ class Virtualmachine(Base):
 
 
     # 重置虚拟机
+    @retry_on_session_expired
     def reset_vm(self, vmargs):
         si = self._connect_vc()
         content = si.RetrieveContent()
@@ -135,6 +148,7 @@ class Virtualmachine(Base):
 
 
     # 挂起虚拟机
+    @retry_on_session_expired
     def suspend_vm(self, vmargs):
         si = self._connect_vc()
         content = si.RetrieveContent()
@@ -150,39 +164,49 @@ class Virtualmachine(Base):
 
     # 删除虚拟机
     def delete_vm(self, vm_moId):
+        task_result = self.delete_vm_task(vm_moId)
+        if not task_result["result"]:
+            return task_result
+        return self.wait_task(task_result["data"])
+
+
+    # 提交删除任务，不等待任务结束，返回任务ID
+    @retry_on_session_expired
+    def delete_vm_task(self, vm_moId):
         si = self._connect_vc()
         content = si.RetrieveContent()
         try:
             vm = self._get_obj_bymoId(content, [vim.VirtualMachine], vm_moId)
             task = vm.Destroy()
-            task_result = self._wait_for_task(task)
-            return task_result
+            return {"result": True, "data": task._moId}
         except Exception, e:
             error_msg = e.message if e.message else str(e)
             return {"result": False, "data": error_msg}
 
 
     # 移除虚拟机
+    @retry_on_session_expired
     def remove_vm(self, vmargs):
         si = self._connect_vc()
         content = si.RetrieveContent()
         try:
             vm = self._get_obj_bymoId(content, [vim.VirtualMachine], vmargs["vm_moId"])
             vm.UnregisterVM()
+            self._invalidate_inventory(vim.VirtualMachine)
             return {"result": True}
         except Exception, e:
             error_msg = e.message if e.message else str(e)
             return {"result": False, "data": error_msg}
 
 
+    @retry_on_session_expired
     def get_datacenter_info(self):
         try:
             si = self._connect_vc()
             content = si.RetrieveContent()
-            container = content.viewManager.CreateContainerView(content.rootFolder, [vim.Datacenter], True)
             dc_data = []
-            for i in container.view:
-                dc_data.append({"dc_moId": i._moId, "dc_name": i.name})
+            for i, props in self._get_inventory(content, vim.Datacenter, ['name']).items:
+                dc_data.append({"dc_moId": i._moId, "dc_name": props['name']})
             return {"result": True, "data": dc_data}
         except Exception, e:
             logger.exception("get_datacenter_info")
@@ -190,18 +214,18 @@ class Virtualmachine(Base):
 
 
     # 获取主机和群集
+    @retry_on_session_expired
     def get_hc_info(self, dc_moId):
         try:
             si = self._connect_vc()
             content = si.RetrieveContent()
             dc = self._get_obj_bymoId(content, [vim.Datacenter], dc_moId)
-            container = content.viewManager.CreateContainerView(dc.hostFolder, [vim.ComputeResource], True)
             hc_data = []
-            for i in container.view:
+            for i, props in self._get_inventory(content, vim.ComputeResource, ['name'], dc.hostFolder).items:
                 if isinstance(i, vim.ClusterComputeResource):
-                    hc_data.append({"hc_moId": i._moId, "hc_name": i.name, "type": "ClusterComputer"})
+                    hc_data.append({"hc_moId": i._moId, "hc_name": props['name'], "type": "ClusterComputer"})
                 else:
-                    hc_data.append({"hc_moId": i._moId, "hc_name": i.name, "type": "Computer"})
+                    hc_data.append({"hc_moId": i._moId, "hc_name": props['name'], "type": "Computer"})
             return {"result": True, "data": hc_data}
         except Exception, e:
             logger.exception("get_hc_info")
@@ -209,6 +233,7 @@ class Virtualmachine(Base):
 
 
     # 获取hc存储
+    @retry_on_session_expired
     def get_ds_info(self, hc_moId):
         try:
             si = self._connect_vc()
@@ -216,19 +241,18 @@ class Virtualmachine(Base):
             hc = self._get_obj_bymoId(content, [vim.ClusterComputeResource], hc_moId)
             if hc == None:
                 hc =self._get_obj_bymoId(content, [vim.ComputeResource], hc_moId)
-            datastore = hc.datastore
+            ds_props = self._get_inventory(content, vim.Datastore, DS_PROPERTIES).props
+            pod_props = self._get_inventory(content, vim.StoragePod, ['name']).props
             datastore_list = []
-            for i in datastore:
-                if isinstance(i.parent, vim.StoragePod):
-                    i = i.parent
-                summary = i.summary
-                if hasattr(summary, "accessible"):
-                    if summary.accessible == True:
-                        if {"ds_moId": i._moId, "ds_name": i.name} not in datastore_list:
-                            datastore_list.append({"ds_moId": i._moId, "ds_name": i.name})
-                else:
-                    if {"ds_moId": i._moId, "ds_name": i.name} not in datastore_list:
-                        datastore_list.append({"ds_moId": i._moId, "ds_name": i.name})
+            for i in hc.datastore:
+                props = ds_props.get(i._moId, {})
+                parent = props.get('parent')
+                if isinstance(parent, vim.StoragePod):
+                    i = parent
+                    props = pod_props.get(i._moId, {})
+                if props.get('summary.accessible', True) == True:
+                    if {"ds_moId": i._moId, "ds_name": props.get('name')} not in datastore_list:
+                        datastore_list.append({"ds_moId": i._moId, "ds_name": props.get('name')})
             return {"result": True, "data": datastore_list}
         except Exception, e:
             logger.exception("get_ds_info")
@@ -236,6 +260,7 @@ class Virtualmachine(Base):
 
 
     # 获取hc的虚拟交换机网络
+    @retry_on_session_expired
     def get_vswitch_info(self, hc_moId):
         try:
             si = self._connect_vc()
@@ -243,18 +268,21 @@ class Virtualmachine(Base):
             hc = self._get_obj_bymoId(content, [vim.ClusterComputeResource], hc_moId)
             if hc == None:
                 hc = self._get_obj_bymoId(content, [vim.ComputeResource], hc_moId)
-            vswitch = hc.network
+            network_props = self._get_inventory(content, vim.Network, ['name', 'summary.accessible']).props
+            portgroup_props = self._get_inventory(content, vim.dvs.DistributedVirtualPortgroup, ['config']).props
             vswitch_list = []
-            for i in vswitch:
-                if i.summary.accessible:
+            for i in hc.network:
+                props = network_props.get(i._moId, {})
+                if props.get('summary.accessible'):
                     if isinstance(i, vim.dvs.DistributedVirtualPortgroup):
-                        if hasattr(i.config, "uplink"):
-                            if not i.config.uplink:
-                                vswitch_list.append({"vs_moId": i._moId, "vs_name": i.name.encode('utf8')})
+                        config = portgroup_props.get(i._moId, {}).get('config')
+                        if hasattr(config, "uplink"):
+                            if not config.uplink:
+                                vswitch_list.append({"vs_moId": i._moId, "vs_name": props['name'].encode('utf8')})
                         else:
-                            vswitch_list.append({"vs_moId": i._moId, "vs_name": i.name.encode('utf8')})
+                            vswitch_list.append({"vs_moId": i._moId, "vs_name": props['name'].encode('utf8')})
                     else:
-                        vswitch_list.append({"vs_moId": i._moId, "vs_name": i.name.encode('utf8')})
+                        vswitch_list.append({"vs_moId": i._moId, "vs_name": props['name'].encode('utf8')})
             return {"result": True, "data": vswitch_list}
         except Exception, e:
             logger.exception("get_vswitch_hc")
@@ -262,6 +290,7 @@ class Virtualmachine(Base):
 
 
     # 获取文件夹
+    @retry_on_session_expired
     def get_folder_info(self, dc_moId):
         try:
             si = self._connect_vc()
@@ -288,6 +317,7 @@ class Virtualmachine(Base):
         return folder_child
 
     # 创建虚拟机，无tools
+    @retry_on_session_expired
     def clone_vm_sample(self, args):
         logger.error("args:")
         logger.error(args)
@@ -338,6 +368,7 @@ class Virtualmachine(Base):
 
 
     # 根据自定义条件创建虚拟机，有tools
+    @retry_on_session_expired
     def clone_vm_custom(self, args):
         # 连接VC
         # si = connect_vc(args["vc_id"])
@@ -487,11 +518,15 @@ class Virtualmachine(Base):
         return config
 
     def _get_datastore_bysp(self, StoragePod):
-        datastores = [i for i in StoragePod.childEntity if i.summary.accessible]
-        datastore = datastores[0]
-        for i in datastores:
-            if i.summary.freeSpace > datastore.summary.freeSpace:
-                datastore = i
+        # 剩余空间实时获取，不使用缓存
+        content = self._connect_vc().RetrieveContent()
+        datastores = [(i, props) for i, props in
+                      self._get_inventory(content, vim.Datastore, DS_PROPERTIES, StoragePod, max_age=0).items
+                      if props.get('summary.accessible')]
+        datastore, datastore_props = datastores[0]
+        for i, props in datastores:
+            if props['summary.freeSpace'] > datastore_props['summary.freeSpace']:
+                datastore, datastore_props = i, props
         return datastore
 
     def _get_identity_win(self, computer_name, passwordstr):
@@ -592,6 +627,7 @@ class Virtualmachine(Base):
                 return {"result": False, "data": task.info.error.msg}
 
     # 获取创建失败的虚拟机
+    @retry_on_session_expired
     def get_failvm(self, args):
         si = self._connect_vc()
         content = si.RetrieveContent()
@@ -624,6 +660,7 @@ class Virtualmachine(Base):
             return {"result": False, "data": error_msg}
 
 
+    @retry_on_session_expired
     def change_vm_cpu(self, new_numCPU, vm_moId):
         si = self._connect_vc()
         content = si.RetrieveContent()
@@ -655,6 +692,7 @@ class Virtualmachine(Base):
             return {"result": False, "data": error_msg}
 
     # 内存扩缩容
+    @retry_on_session_expired
     def change_vm_mem(self, new_memoryMB, vm_moId):
         si = self._connect_vc()
         content = si.RetrieveContent()
@@ -689,6 +727,7 @@ class Virtualmachine(Base):
             return {"result": False, "data": error_msg}
 
     # 磁盘Disk扩容
+    @retry_on_session_expired
     def change_vm_disk(self, disk_label, new_disk_size, vm_moId):
         si = self._connect_vc()
         content = si.RetrieveContent()
@@ -720,6 +759,7 @@ class Virtualmachine(Base):
             return {"result": False, "data": error_msg}
 
     # 磁盘Disk新增
+    @retry_on_session_expired
     def add_vm_disk(self, new_disk_size, new_disk_type, vm_moId):
         si = self._connect_vc()
         content = si.RetrieveContent()
@@ -763,15 +803,24 @@ class Virtualmachine(Base):
 
     #重命名虚拟机
     def rename_vm(self, vm_moId, new_name):
+        task_result = self.rename_vm_task(vm_moId, new_name)
+        if not task_result["result"]:
+            return task_result
+        return {"result": True, "data": ""}
+
+
+    # 提交重命名任务，不等待任务结束，返回任务ID
+    @retry_on_session_expired
+    def rename_vm_task(self, vm_moId, new_name):
         try:
             si = self._connect_vc()
             content = si.RetrieveContent()
             vm = self._get_obj_bymoId(content, [vim.VirtualMachine], vm_moId)
             spec = vim.vm.ConfigSpec()
             spec.name = new_name
-            vm.ReconfigVM_Task(spec=spec)
-            self._deconnect_vc(si)
-            return {"result": True, "data": ""}
+            task = vm.ReconfigVM_Task(spec=spec)
+            self._invalidate_inventory(vim.VirtualMachine)
+            return {"result": True, "data": task._moId}
         except Exception,e:
             logger.exception("rename_vm")
             return {"result": False, "data": str(e)}
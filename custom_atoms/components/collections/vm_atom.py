@@ -1,116 +1,98 @@
 # -*- coding: utf-8 -*-
+import re
+import time
+
 from django.utils.translation import ugettext_lazy as _
 
 from pipeline.component_framework.component import Component
 from pipeline.conf import settings
-from pipeline.core.flow.activity import Service
+from pipeline.core.flow.activity import Service, StaticIntervalGenerator
 from ..collections.helper.password_crypt import *
 from ..collections.helper.vm_helper.vm_helper import Virtualmachine
 
 __group_name__ = _(u"vmware接口(vmware)")
 
-#创建虚拟机
+# 批量操作默认同时执行的 vCenter 任务数量
+VCENTER_BATCH_CONCURRENCY = getattr(settings, 'VCENTER_BATCH_CONCURRENCY', 10)
+# 等待 vCenter 任务结束的最长时间(单位s)，超时后原子失败
+VCENTER_TASK_TIMEOUT = getattr(settings, 'VCENTER_TASK_TIMEOUT', 3600)
 
-class CreateVmService(Service):
-    __need_schedule__ = False  # 异步轮巡
 
-    def execute(self, data, parent_data):  # 执行函数
-        try:
-            # is_interface = data.get_one_of_inputs('is_interface')
-            host = data.get_one_of_inputs('host')
-            account = data.get_one_of_inputs('account')
-            password = data.get_one_of_inputs('password')
-            dc_moId = data.get_one_of_inputs('dc_moId')
-            hc_moId = data.get_one_of_inputs('hc_moId')
-            ds_moId = data.get_one_of_inputs('ds_moId')
-            vs_moId = data.get_one_of_inputs('vs_moId')
-            vs_name = data.get_one_of_inputs('vs_name')
-            folder_moId = data.get_one_of_inputs('folder_moId')
-            vmtemplate_os = data.get_one_of_inputs('vmtemplate_os')
-            vmtemplate_moId = data.get_one_of_inputs('vmtemplate_moId')
-            computer_name = data.get_one_of_inputs('computer_name')
-            vm_name = data.get_one_of_inputs('vm_name')
-            vmtemplate_pwd = data.get_one_of_inputs('vmtemplate_pwd')
-            cpu = data.get_one_of_inputs('cpu')
-            mem = data.get_one_of_inputs('mem')
-            disk_size = data.get_one_of_inputs('disk_size')
-            disk_type = data.get_one_of_inputs('disk_type')
-            ip = data.get_one_of_inputs('ip')
-            mask = data.get_one_of_inputs('mask')
-            gateway = data.get_one_of_inputs('gateway')
-            dns = data.get_one_of_inputs('dns')
-
-            # if is_interface == 'true':
-            #     res, password = aes_decrypt(password)
-        # try:
-        #     host = '192.168.102.200'
-        #     account = 'administrator@vsphere.local'
-        #     password = '1qaz@WSX'
-        #     dc_moId = 'datacenter-21'
-        #     hc_moId = 'domain-c26'
-        #     ds_moId = 'datastore-30'
-        #     vs_moId = 'network-31'
-        #     vs_name = 'VM Network'
-        #     folder_moId = 'group-v28'
-        #     vmtemplate_os = 'windows8Server64Guest'
-        #     vmtemplate_moId = 'vm-47'
-        #     computer_name = 'win2012R2_template'
-        #     vm_name = 'test-windows2'
-        #     vmtemplate_pwd = '1qaz@WSX'
-        #     cpu = '1'
-        #     mem = '2'
-        #     disk_size = '50'
-        #     disk_type = 'thin'
-        #     ip = '10.10.10.21'
-        #     mask = '255.0.0.0'
-        #     gateway = '10.10.10.1'
-        #     dns = '127.0.0.1'
+# 根据原子的输入获取 vCenter 连接，execute 和 schedule 可能在不同的进程中执行
+def get_virtualmachine(data):
+    is_interface = data.get_one_of_inputs('is_interface')
+    host = data.get_one_of_inputs('host')
+    account = data.get_one_of_inputs('account')
+    password = data.get_one_of_inputs('password')
+    if is_interface == 'true':
+        res, password = aes_decrypt(password)
+    return Virtualmachine(account, password, host)
 
 
-            vm = Virtualmachine(account, password, host)
-            params = {
-                "dc_moId": dc_moId,
-                "hc_moId": hc_moId,
-                "ds_moId": ds_moId,
-                "vs_moId": vs_moId,
-                "vs_name": vs_name,
-                "folder_moId": folder_moId,
-                "vmtemplate_os": vmtemplate_os,
-                "vmtemplate_moId": vmtemplate_moId,
-                "computer_name": computer_name,
-                "vm_name": vm_name,
-                "vmtemplate_pwd": vmtemplate_pwd,
-                "cpu": int(cpu),
-                "mem": int(mem),
-                "disk": int(disk_size),
-                "disk_type": disk_type,
-                "ip": ip,
-                "mask": mask,
-                "gateway": gateway,
-                "dns": dns.split(","),
-                "vmtemplate_toolstatus": "toolsNotInstalled"
-            }
-            logger.error(params)
-            result = vm.wait_for_vmclone_finish(params)
-
-            if result["result"]:
-                vm_moId = result["data"]._moId
-                data.set_outputs('result', u"虚拟机ID为:{0}".format(vm_moId))
-                data.set_outputs('atom_res', "true")
-                data.set_outputs('message', "")
-            else:
-                data.set_outputs('result', u"创建虚拟机失败")
-                data.set_outputs('atom_res', "false")
-                data.set_outputs('message', result["data"])
-            return True
+class VmTaskService(Service):
+    """
+    vCenter 任务类原子的基类，execute 中提交任务并记录任务ID，schedule 中轮询任务状态，
+    vCenter 执行任务期间不占用 worker，查询失败时继续轮询，超过 VCENTER_TASK_TIMEOUT 后失败
+    """
+    __need_schedule__ = True  # 异步轮巡
+    interval = StaticIntervalGenerator(5)
+
+    success_result = u""
+    fail_result = u""
+
+    def submit(self, data):  # 提交任务，返回 {"result": True, "data": 任务ID}
+        raise NotImplementedError
+
+    def set_success_outputs(self, data, task_data):
+        data.set_outputs('result', self.success_result)
+        data.set_outputs('atom_res', "true")
+        data.set_outputs('message', "")
+
+    def set_fail_outputs(self, data, message):
+        data.set_outputs('result', self.fail_result)
+        data.set_outputs('atom_res', "false")
+        data.set_outputs('message', message)
+
+    def execute(self, data, parent_data):  # 执行函数
+        try:
+            task_result = self.submit(data)
         except Exception,e:
-            data.set_outputs('result', u"创建虚拟机失败")
-            data.set_outputs('atom_res', "false")
-            data.set_outputs('message', str(e))
-            return True
+            task_result = {"result": False, "data": str(e)}
+        if task_result["result"]:
+            data.set_outputs('task_moId', task_result["data"])
+            data.set_outputs('task_deadline', time.time() + VCENTER_TASK_TIMEOUT)
+        else:
+            self.set_fail_outputs(data, task_result["data"])
+        return True
 
     def schedule(self, data, parent_data, callback_data=None):  # 轮巡函数
-
+        task_moId = data.get_one_of_outputs('task_moId')
+        # 提交任务失败，不需要轮询
+        if not task_moId:
+            self.finish_schedule()
+            return True
+        try:
+            task_result = get_virtualmachine(data).get_task_result(task_moId)
+        except Exception,e:
+            logger.exception(e)
+            task_result = {"result": False, "finished": False, "data": str(e)}
+        if not task_result["finished"]:
+            # 任务仍在执行或者查询失败，超时前继续轮询
+            deadline = data.get_one_of_outputs('task_deadline')
+            if deadline is None:  # 兼容没有记录超时时间的任务
+                deadline = time.time() + VCENTER_TASK_TIMEOUT
+                data.set_outputs('task_deadline', deadline)
+            if time.time() < deadline:
+                return True
+            message = u"等待vCenter任务{0}超时".format(task_moId)
+            if not task_result["result"]:
+                message = u"{0}，最近一次查询错误: {1}".format(message, task_result["data"])
+            task_result = {"result": False, "finished": True, "data": message}
+        if task_result["result"]:
+            self.set_success_outputs(data, task_result["data"])
+        else:
+            self.set_fail_outputs(data, task_result["data"])
+        self.finish_schedule()
         return True
 
     def outputs_format(self):  # 输出结果
@@ -118,8 +100,93 @@ class CreateVmService(Service):
             self.OutputItem(name=_(u'result'), key='result', type='str'),
             self.OutputItem(name=_(u'执行结果'), key='atom_res', type='str'),
             self.OutputItem(name=_(u'执行信息'), key='message', type='str'),
+            self.OutputItem(name=_(u'vCenter任务ID'), key='task_moId', type='str'),
         ]
 
+#创建虚拟机
+
+class CreateVmService(VmTaskService):
+    fail_result = u"创建虚拟机失败"
+
+    def set_success_outputs(self, data, task_data):
+        super(CreateVmService, self).set_success_outputs(data, task_data)
+        data.set_outputs('result', u"虚拟机ID为:{0}".format(task_data._moId))
+
+    def submit(self, data):
+        dc_moId = data.get_one_of_inputs('dc_moId')
+        hc_moId = data.get_one_of_inputs('hc_moId')
+        ds_moId = data.get_one_of_inputs('ds_moId')
+        vs_moId = data.get_one_of_inputs('vs_moId')
+        vs_name = data.get_one_of_inputs('vs_name')
+        folder_moId = data.get_one_of_inputs('folder_moId')
+        vmtemplate_os = data.get_one_of_inputs('vmtemplate_os')
+        vmtemplate_moId = data.get_one_of_inputs('vmtemplate_moId')
+        computer_name = data.get_one_of_inputs('computer_name')
+        vm_name = data.get_one_of_inputs('vm_name')
+        vmtemplate_pwd = data.get_one_of_inputs('vmtemplate_pwd')
+        cpu = data.get_one_of_inputs('cpu')
+        mem = data.get_one_of_inputs('mem')
+        disk_size = data.get_one_of_inputs('disk_size')
+        disk_type = data.get_one_of_inputs('disk_type')
+        ip = data.get_one_of_inputs('ip')
+        mask = data.get_one_of_inputs('mask')
+        gateway = data.get_one_of_inputs('gateway')
+        dns = data.get_one_of_inputs('dns')
+
+        # if is_interface == 'true':
+        #     res, password = aes_decrypt(password)
+    # try:
+    #     host = '192.168.102.200'
+    #     account = 'administrator@vsphere.local'
+    #     password = '1qaz@WSX'
+    #     dc_moId = 'datacenter-21'
+    #     hc_moId = 'domain-c26'
+    #     ds_moId = 'datastore-30'
+    #     vs_moId = 'network-31'
+    #     vs_name = 'VM Network'
+    #     folder_moId = 'group-v28'
+    #     vmtemplate_os = 'windows8Server64Guest'
+    #     vmtemplate_moId = 'vm-47'
+    #     computer_name = 'win2012R2_template'
+    #     vm_name = 'test-windows2'
+    #     vmtemplate_pwd = '1qaz@WSX'
+    #     cpu = '1'
+    #     mem = '2'
+    #     disk_size = '50'
+    #     disk_type = 'thin'
+    #     ip = '10.10.10.21'
+    #     mask = '255.0.0.0'
+    #     gateway = '10.10.10.1'
+    #     dns = '127.0.0.1'
+
+
+        vm = get_virtualmachine(data)
+        params = {
+            "dc_moId": dc_moId,
+            "hc_moId": hc_moId,
+            "ds_moId": ds_moId,
+            "vs_moId": vs_moId,
+            "vs_name": vs_name,
+            "folder_moId": folder_moId,
+            "vmtemplate_os": vmtemplate_os,
+            "vmtemplate_moId": vmtemplate_moId,
+            "computer_name": computer_name,
+            "vm_name": vm_name,
+            "vmtemplate_pwd": vmtemplate_pwd,
+            "cpu": int(cpu),
+            "mem": int(mem),
+            "disk": int(disk_size),
+            "disk_type": disk_type,
+            "ip": ip,
+            "mask": mask,
+            "gateway": gateway,
+            "dns": dns.split(","),
+            "vmtemplate_toolstatus": "toolsNotInstalled"
+        }
+        logger.error(params)
+        task = vm.clone_vm_sample(params)
+        return {"result": True, "data": task._moId}
+
 
 class CreateVmComponent(Component):
     name = u'创建vm虚拟机'
@@ -129,47 +196,13 @@ class CreateVmComponent(Component):
 
 # 启动虚拟机
 
-class StartVmService(Service):
-    __need_schedule__ = False  # 异步轮巡
-
-    def execute(self, data, parent_data):  # 执行函数
-        try:
-            is_interface = data.get_one_of_inputs('is_interface')
-            host = data.get_one_of_inputs('host')
-            account = data.get_one_of_inputs('account')
-            password = data.get_one_of_inputs('password')
-            vm_moId = data.get_one_of_inputs('vm_moId')
-            if is_interface == 'true':
-                res, password = aes_decrypt(password)
-
-            vm = Virtualmachine(account, password, host)
-            task_result = vm.start_vm(vm_moId)
-            if task_result["result"]:
-                data.set_outputs('result', u"开机成功")
-                data.set_outputs('atom_res', "true")
-                data.set_outputs('message', "")
-            else:
-                data.set_outputs('result', u"开启虚拟机失败")
-                data.set_outputs('atom_res', "false")
-                data.set_outputs('message', task_result["data"])
-            return True
-        except Exception,e:
-            data.set_outputs('result', u"开启虚拟机失败")
-            data.set_outputs('atom_res', "false")
-            data.set_outputs('message', str(e))
-            return True
-
-
-    def schedule(self, data, parent_data, callback_data=None):  # 轮巡函数
-
-        return True
+class StartVmService(VmTaskService):
+    success_result = u"开机成功"
+    fail_result = u"开启虚拟机失败"
 
-    def outputs_format(self):  # 输出结果
-        return [
-            self.OutputItem(name=_(u'result'), key='result', type='str'),
-            self.OutputItem(name=_(u'执行结果'), key='atom_res', type='str'),
-            self.OutputItem(name=_(u'执行信息'), key='message', type='str'),
-        ]
+    def submit(self, data):
+        vm_moId = data.get_one_of_inputs('vm_moId')
+        return get_virtualmachine(data).start_vm_task(vm_moId)
 
 
 class StartVmComponent(Component):
@@ -281,46 +314,13 @@ class RestartVmComponent(Component):
 
 # 移除虚拟机
 
-class RemoveVmService(Service):
-    __need_schedule__ = False  # 异步轮巡
-
-    def execute(self, data, parent_data):  # 执行函数
-        try:
-            is_interface = data.get_one_of_inputs('is_interface')
-            host = data.get_one_of_inputs('host')
-            account = data.get_one_of_inputs('account')
-            password = data.get_one_of_inputs('password')
-            vm_moId = data.get_one_of_inputs('vm_moId')
-            if is_interface == 'true':
-                res, password = aes_decrypt(password)
-
-            vm = Virtualmachine(account, password, host)
-            task_result = vm.delete_vm(vm_moId)
-            if task_result["result"]:
-                data.set_outputs('result', u"删除成功")
-                data.set_outputs('atom_res', "true")
-                data.set_outputs('message', "")
-            else:
-                data.set_outputs('result', u"删除虚拟机失败")
-                data.set_outputs('atom_res', "false")
-                data.set_outputs('message', task_result["data"])
-            return True
-        except Exception,e:
-            data.set_outputs('result', u"删除虚拟机失败")
-            data.set_outputs('atom_res', "false")
-            data.set_outputs('message', str(e))
-            return True
-
-    def schedule(self, data, parent_data, callback_data=None):  # 轮巡函数
-
-        return True
+class RemoveVmService(VmTaskService):
+    success_result = u"删除成功"
+    fail_result = u"删除虚拟机失败"
 
-    def outputs_format(self):  # 输出结果
-        return [
-            self.OutputItem(name=_(u'result'), key='result', type='str'),
-            self.OutputItem(name=_(u'执行结果'), key='atom_res', type='str'),
-            self.OutputItem(name=_(u'执行信息'), key='message', type='str'),
-        ]
+    def submit(self, data):
+        vm_moId = data.get_one_of_inputs('vm_moId')
+        return get_virtualmachine(data).delete_vm_task(vm_moId)
 
 
 class RemoveVmComponent(Component):
@@ -331,39 +331,171 @@ class RemoveVmComponent(Component):
 
 # 重命名虚拟机
 
-class RenameVmService(Service):
-    __need_schedule__ = False  # 异步轮巡
+class RenameVmService(VmTaskService):
+    success_result = u"修改成功"
+    fail_result = u"修改失败"
 
-    def execute(self, data, parent_data):  # 执行函数
-        try:
-            is_interface = data.get_one_of_inputs('is_interface')
-            host = data.get_one_of_inputs('host')
-            account = data.get_one_of_inputs('account')
-            password = data.get_one_of_inputs('password')
-            vm_moId = data.get_one_of_inputs('vm_moId')
-            name = data.get_one_of_inputs('name')
-            if is_interface == 'true':
-                res, password = aes_decrypt(password)
+    def submit(self, data):
+        vm_moId = data.get_one_of_inputs('vm_moId')
+        name = data.get_one_of_inputs('name')
+        return get_virtualmachine(data).rename_vm_task(vm_moId, name)
 
-            vm = Virtualmachine(account, password, host)
-            task_result = vm.rename_vm(vm_moId, name)
+
+class RenameVmComponent(Component):
+    name = u'修改vm虚拟机名称'
+    code = 'rename_vm'
+    bound_service = RenameVmService
+    form = settings.STATIC_URL + 'custom_atoms/vmware/rename_vm.js'
+
+
+# 批量操作虚拟机
+
+class VmBatchService(Service):
+    """
+    批量虚拟机操作的基类，vm_moIds 中的虚拟机按 concurrency 限制同时执行的任务数量，
+    在 schedule 中轮询已提交的任务并补充提交，所有虚拟机完成后输出每台虚拟机的结果，
+    查询任务失败时继续轮询，超过 VCENTER_TASK_TIMEOUT * 提交批次数 后未完成的虚拟机失败
+    """
+    __need_schedule__ = True  # 异步轮巡
+    interval = StaticIntervalGenerator(5)
+
+    success_message = u""
+
+    def submit(self, vm, vm_moId):  # 提交单台虚拟机的操作，返回 {"result":, "data": 任务ID}，没有任务ID时表示已完成
+        raise NotImplementedError
+
+    @staticmethod
+    def _get_vm_moIds(data):
+        vm_moIds = []
+        for vm_moId in re.split(r'[\s,;]+', data.get_one_of_inputs('vm_moIds') or ''):
+            if vm_moId and vm_moId not in vm_moIds:
+                vm_moIds.append(vm_moId)
+        return vm_moIds
+
+    @staticmethod
+    def _get_concurrency(data):
+        try:
+            concurrency = int(data.get_one_of_inputs('concurrency') or VCENTER_BATCH_CONCURRENCY)
+        except (TypeError, ValueError):
+            concurrency = VCENTER_BATCH_CONCURRENCY
+        return max(concurrency, 1)
+
+    @staticmethod
+    def _set_vm_result(data, vm_moId, result, message):
+        vm_results = data.get_one_of_outputs('vm_results')
+        vm_results.append({
+            'vm_moId': vm_moId,
+            'atom_res': "true" if result else "false",
+            'message': message,
+        })
+        data.set_outputs('vm_results', vm_results)
+
+    def _get_deadline(self, data, count):
+        # 每批虚拟机最多等待 VCENTER_TASK_TIMEOUT
+        concurrency = self._get_concurrency(data)
+        batches = max((count + concurrency - 1) // concurrency, 1)
+        return time.time() + VCENTER_TASK_TIMEOUT * batches
+
+    def _submit_pending(self, data, vm):
+        pending = data.get_one_of_outputs('pending_vm_moIds')
+        running = data.get_one_of_outputs('running_tasks')
+        slots = self._get_concurrency(data) - len(running)
+        for vm_moId in pending[:max(slots, 0)]:
+            try:
+                task_result = self.submit(vm, vm_moId)
+            except Exception,e:
+                task_result = {"result": False, "data": str(e)}
+            if task_result["result"] and task_result.get("data"):
+                running[vm_moId] = task_result["data"]
+            elif task_result["result"]:
+                self._set_vm_result(data, vm_moId, True, self.success_message)
+            else:
+                self._set_vm_result(data, vm_moId, False, task_result["data"])
+        data.set_outputs('pending_vm_moIds', pending[max(slots, 0):])
+        data.set_outputs('running_tasks', running)
+
+    def _poll_running(self, data, vm):
+        running = data.get_one_of_outputs('running_tasks')
+        if not running:
+            return
+        task_results = vm.get_task_results(running.values())
+        poll_errors = {}
+        for vm_moId, task_moId in running.items():
+            task_result = task_results[task_moId]
+            if not task_result["finished"]:
+                # 查询失败不代表任务失败，记录错误后继续轮询
+                if not task_result["result"]:
+                    poll_errors[vm_moId] = task_result["data"]
+                continue
+            running.pop(vm_moId)
             if task_result["result"]:
-                data.set_outputs('result', u"修改成功")
-                data.set_outputs('atom_res', "true")
-                data.set_outputs('message', "")
+                self._set_vm_result(data, vm_moId, True, self.success_message)
             else:
-                data.set_outputs('result', u"修改失败")
-                data.set_outputs('atom_res', "false")
-                data.set_outputs('message', task_result["data"])
+                self._set_vm_result(data, vm_moId, False, task_result["data"])
+        data.set_outputs('running_tasks', running)
+        data.set_outputs('poll_errors', poll_errors)
+
+    def _set_timeout(self, data):
+        poll_errors = data.get_one_of_outputs('poll_errors') or {}
+        for vm_moId in data.get_one_of_outputs('running_tasks'):
+            message = u"等待vCenter任务超时"
+            if vm_moId in poll_errors:
+                message = u"{0}，最近一次查询错误: {1}".format(message, poll_errors[vm_moId])
+            self._set_vm_result(data, vm_moId, False, message)
+        for vm_moId in data.get_one_of_outputs('pending_vm_moIds'):
+            self._set_vm_result(data, vm_moId, False, u"等待提交vCenter任务超时")
+        data.set_outputs('running_tasks', {})
+        data.set_outputs('pending_vm_moIds', [])
+
+    def _set_summary(self, data):
+        vm_results = data.get_one_of_outputs('vm_results')
+        failed = [item for item in vm_results if item['atom_res'] != "true"]
+        data.set_outputs('result', u"成功{0}台，失败{1}台".format(len(vm_results) - len(failed), len(failed)))
+        data.set_outputs('atom_res', "false" if failed else "true")
+        data.set_outputs('message', u"\n".join([u"{0}: {1}".format(item['vm_moId'], item['message'])
+                                                for item in failed]))
+
+    def execute(self, data, parent_data):  # 执行函数
+        vm_moIds = self._get_vm_moIds(data)
+        data.set_outputs('vm_results', [])
+        data.set_outputs('pending_vm_moIds', vm_moIds)
+        data.set_outputs('running_tasks', {})
+        data.set_outputs('deadline', self._get_deadline(data, len(vm_moIds)))
+        if not vm_moIds:
+            data.set_outputs('result', u"虚拟机ID不能为空")
+            data.set_outputs('atom_res', "false")
+            data.set_outputs('message', "")
             return True
+        try:
+            self._submit_pending(data, get_virtualmachine(data))
         except Exception,e:
-            data.set_outputs('result', u"修改失败")
+            data.set_outputs('result', u"连接vCenter失败")
             data.set_outputs('atom_res', "false")
             data.set_outputs('message', str(e))
-            return True
+            data.set_outputs('pending_vm_moIds', [])
+        return True
 
     def schedule(self, data, parent_data, callback_data=None):  # 轮巡函数
-
+        if data.get_one_of_outputs('pending_vm_moIds') or data.get_one_of_outputs('running_tasks'):
+            try:
+                vm = get_virtualmachine(data)
+                self._poll_running(data, vm)
+                self._submit_pending(data, vm)
+            except Exception,e:
+                # vCenter 暂时不可用时下次轮询重试
+                logger.exception(e)
+            if data.get_one_of_outputs('pending_vm_moIds') or data.get_one_of_outputs('running_tasks'):
+                deadline = data.get_one_of_outputs('deadline')
+                if deadline is None:  # 兼容没有记录超时时间的任务
+                    deadline = self._get_deadline(data, len(data.get_one_of_outputs('pending_vm_moIds')) +
+                                                  len(data.get_one_of_outputs('running_tasks')))
+                    data.set_outputs('deadline', deadline)
+                if time.time() < deadline:
+                    return True
+                self._set_timeout(data)
+        if data.get_one_of_outputs('vm_results'):
+            self._set_summary(data)
+        self.finish_schedule()
         return True
 
     def outputs_format(self):  # 输出结果
@@ -371,11 +503,61 @@ class RenameVmService(Service):
             self.OutputItem(name=_(u'result'), key='result', type='str'),
             self.OutputItem(name=_(u'执行结果'), key='atom_res', type='str'),
             self.OutputItem(name=_(u'执行信息'), key='message', type='str'),
+            self.OutputItem(name=_(u'每台虚拟机的执行结果'), key='vm_results', type='list'),
         ]
 
 
-class RenameVmComponent(Component):
-    name = u'修改vm虚拟机名称'
-    code = 'rename_vm'
-    bound_service = RemoveVmService
-    form = settings.STATIC_URL + 'custom_atoms/vmware/rename_vm.js'
+class BatchStartVmService(VmBatchService):
+    success_message = u"开机成功"
+
+    def submit(self, vm, vm_moId):
+        return vm.start_vm_task(vm_moId)
+
+
+class BatchStartVmComponent(Component):
+    name = u'批量启动vm虚拟机'
+    code = 'batch_start_vm'
+    bound_service = BatchStartVmService
+    form = settings.STATIC_URL + 'custom_atoms/vmware/batch_start_vm.js'
+
+
+class BatchStopVmService(VmBatchService):
+    success_message = u"关机成功"
+
+    def submit(self, vm, vm_moId):
+        return vm.stop_vm(vm_moId)
+
+
+class BatchStopVmComponent(Component):
+    name = u'批量关闭vm虚拟机'
+    code = 'batch_stop_vm'
+    bound_service = BatchStopVmService
+    form = settings.STATIC_URL + 'custom_atoms/vmware/batch_stop_vm.js'
+
+
+class BatchRestartVmService(VmBatchService):
+    success_message = u"重启成功"
+
+    def submit(self, vm, vm_moId):
+        return vm.restart_vm(vm_moId)
+
+
+class BatchRestartVmComponent(Component):
+    name = u'批量重启vm虚拟机'
+    code = 'batch_restart_vm'
+    bound_service = BatchRestartVmService
+    form = settings.STATIC_URL + 'custom_atoms/vmware/batch_restart_vm.js'
+
+
+class BatchRemoveVmService(VmBatchService):
+    success_message = u"删除成功"
+
+    def submit(self, vm, vm_moId):
+        return vm.delete_vm_task(vm_moId)
+
+
+class BatchRemoveVmComponent(Component):
+    name = u'批量删除vm虚拟机'
+    code = 'batch_remove_vm'
+    bound_service = BatchRemoveVmService
+    form = settings.STATIC_URL + 'custom_atoms/vmware/batch_remove_vm.js'
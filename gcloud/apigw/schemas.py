@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
 from gcloud.core.constant import TASK_FLOW
+from gcloud.contrib.webhook.models import WEBHOOK_EVENTS
+from gcloud.taskflow3.models import INSTANCE_ACTIONS
 
 
 APIGW_CREATE_TASK_PARAMS = {
@@ -23,3 +25,100 @@ APIGW_CREATE_TASK_PARAMS = {
         }
     }
 }
+
+# 单次批量创建任务的最大数量
+BULK_CREATE_TASK_MAX_COUNT = 500
+
+APIGW_BULK_CREATE_TASK_PARAMS = {
+    'type': 'object',
+    'required': ['tasks'],
+    'properties': {
+        'tasks': {
+            'type': 'array',
+            'minItems': 1,
+            'maxItems': BULK_CREATE_TASK_MAX_COUNT,
+            'items': {
+                'type': 'object',
+            }
+        }
+    }
+}
+
+# 单次批量操作任务的最大数量
+BULK_OPERATE_TASK_MAX_COUNT = 500
+
+APIGW_BULK_START_TASK_PARAMS = {
+    'type': 'object',
+    'required': ['task_id_list'],
+    'properties': {
+        'task_id_list': {
+            'type': 'array',
+            'minItems': 1,
+            'maxItems': BULK_OPERATE_TASK_MAX_COUNT,
+            'items': {
+                'type': 'integer',
+            }
+        }
+    }
+}
+
+APIGW_BULK_OPERATE_TASK_PARAMS = {
+    'type': 'object',
+    'required': ['task_id_list', 'action'],
+    'properties': {
+        'task_id_list': APIGW_BULK_START_TASK_PARAMS['properties']['task_id_list'],
+        'action': {
+            'type': 'string',
+            'enum': INSTANCE_ACTIONS.keys(),
+        }
+    }
+}
+
+# 单次批量查询任务状态的最大数量
+BULK_GET_TASK_STATUS_MAX_COUNT = 5000
+
+APIGW_BULK_GET_TASK_STATUS_PARAMS = {
+    'type': 'object',
+    'required': ['task_id_list'],
+    'properties': {
+        'task_id_list': {
+            'type': 'array',
+            'minItems': 1,
+            'maxItems': BULK_GET_TASK_STATUS_MAX_COUNT,
+            'items': {
+                'type': 'integer',
+            }
+        },
+        'max_depth': {
+            'type': 'integer',
+            'minimum': 0,
+        }
+    }
+}
+
+APIGW_REGISTER_WEBHOOK_PARAMS = {
+    'type': 'object',
+    'required': ['url', 'events'],
+    'properties': {
+        'url': {
+            'type': 'string',
+            'pattern': '^https?://',
+            'maxLength': 255,
+        },
+        'events': {
+            'type': 'array',
+            'minItems': 1,
+            'items': {
+                'type': 'string',
+                'enum': [event for event, __ in WEBHOOK_EVENTS],
+            }
+        },
+        'template_id': {
+            'type': 'integer',
+        },
+        'secret': {
+            'type': 'string',
+            'maxLength': 128,
+        }
+    }
+}
@@ -8,8 +8,15 @@ urlpatterns = [
     url(r'^get_template_list/(?P<bk_biz_id>\d+)/$', views.get_template_list),
     url(r'^get_template_info/(?P<template_id>\d+)/(?P<bk_biz_id>\d+)/$', views.get_template_info),
     url(r'^create_task/(?P<template_id>\d+)/(?P<bk_biz_id>\d+)/$', views.create_task),
+    url(r'^bulk_create_task/(?P<template_id>\d+)/(?P<bk_biz_id>\d+)/$', views.bulk_create_task),
     url(r'^start_task/(?P<task_id>\d+)/(?P<bk_biz_id>\d+)/$', views.start_task),
     url(r'^operate_task/(?P<task_id>\d+)/(?P<bk_biz_id>\d+)/$', views.operate_task),
+    url(r'^bulk_start_task/(?P<bk_biz_id>\d+)/$', views.bulk_start_task),
+    url(r'^bulk_operate_task/(?P<bk_biz_id>\d+)/$', views.bulk_operate_task),
     url(r'^get_task_status/(?P<task_id>\d+)/(?P<bk_biz_id>\d+)/$', views.get_task_status),
+    url(r'^bulk_get_task_status/(?P<bk_biz_id>\d+)/$', views.bulk_get_task_status),
+    url(r'^get_task_status_changes/(?P<task_id>\d+)/(?P<bk_biz_id>\d+)/$', views.get_task_status_changes),
     url(r'^query_task_count/(?P<bk_biz_id>\d+)/$', views.query_task_count),
+    url(r'^register_webhook/(?P<bk_biz_id>\d+)/$', views.register_webhook),
+    url(r'^delete_webhook/(?P<webhook_id>\d+)/(?P<bk_biz_id>\d+)/$', views.delete_webhook),
 ]
@@ -7,6 +7,7 @@ from django.db.models import Count
 from django.http import JsonResponse
 from django.views.decorators.http import require_GET, require_POST
 from django.views.decorators.csrf import csrf_exempt
+from guardian.core import ObjectPermissionChecker
 from django.utils.translation import ugettext as _
 
 try:
@@ -17,9 +18,13 @@ except ImportError:
 
 from common.log import logger
 from account.decorators import login_exempt
-from gcloud.apigw.decorators import api_check_user_perm_of_business, api_check_user_perm_of_task
-from gcloud.apigw.schemas import APIGW_CREATE_TASK_PARAMS
+from gcloud.apigw.decorators import (api_check_user_perm_of_business, api_check_user_perm_of_task,
+                                     check_white_apps)
+from gcloud.apigw.schemas import (APIGW_CREATE_TASK_PARAMS, APIGW_BULK_CREATE_TASK_PARAMS,
+                                  APIGW_BULK_START_TASK_PARAMS, APIGW_BULK_OPERATE_TASK_PARAMS,
+                                  APIGW_BULK_GET_TASK_STATUS_PARAMS, APIGW_REGISTER_WEBHOOK_PARAMS)
 from gcloud.core.models import Business
+from gcloud.contrib.webhook.models import Webhook
 from gcloud.core.utils import strftime_with_timezone
 from gcloud.tasktmpl3.models import TaskTemplate
 from gcloud.taskflow3.models import TaskFlowInstance
@@ -131,6 +136,58 @@ def create_task(request, template_id, bk_biz_id):
     return JsonResponse({'result': True, 'data': {'task_id': task.id}})
 
 
+@login_exempt
+@csrf_exempt
+@require_POST
+@apigw_required
+@api_check_user_perm_of_task('create_task')
+def bulk_create_task(request, template_id, bk_biz_id):
+    biz = Business.objects.get(cc_id=bk_biz_id)
+    try:
+        tmpl = TaskTemplate.objects.select_related('pipeline_template').get(id=template_id, business=biz)
+    except TaskTemplate.DoesNotExist:
+        return JsonResponse({'result': False, 'message': 'template[id=%s] does not exist' % template_id})
+    params = json.loads(request.body)
+    try:
+        jsonschema.validate(params, APIGW_BULK_CREATE_TASK_PARAMS)
+    except jsonschema.ValidationError as e:
+        logger.warning(u"apigw bulk_create_task raise prams error: %s" % e)
+        message = 'task params is invalid: %s' % e
+        return JsonResponse({'result': False, 'message': message})
+    logger.info('apigw bulk_create_task info, template_id: %s, bk_biz_id: %s, task count: %s' % (
+        template_id, bk_biz_id, len(params['tasks'])))
+
+    # 参数不合法的任务单独返回错误信息，不影响其他任务的创建
+    results = [None] * len(params['tasks'])
+    valid_indexes = []
+    tasks_info = []
+    for index, task_params in enumerate(params['tasks']):
+        task_params.setdefault('flow_type', 'common')
+        task_params.setdefault('constants', {})
+        task_params.setdefault('exclude_task_nodes_id', [])
+        try:
+            jsonschema.validate(task_params, APIGW_CREATE_TASK_PARAMS)
+        except jsonschema.ValidationError as e:
+            results[index] = {'result': False, 'message': 'task params is invalid: %s' % e}
+            continue
+        valid_indexes.append(index)
+        tasks_info.append(task_params)
+
+    try:
+        created = TaskFlowInstance.objects.bulk_create_tasks(
+            tmpl,
+            biz,
+            tasks_info,
+            creator=request.user.username,
+            create_method='api',
+            create_info=request.jwt.app.app_code if hasattr(request, 'jwt') else request.META.get('HTTP_BK_APP_CODE'))
+    except PipelineException as e:
+        return JsonResponse({'result': False, 'message': e.message})
+    for index, result in zip(valid_indexes, created):
+        results[index] = result
+    return JsonResponse({'result': True, 'data': results})
+
+
 @login_exempt
 @csrf_exempt
 @require_POST
@@ -157,6 +214,70 @@ def operate_task(request, task_id, bk_biz_id):
     return JsonResponse(ctx)
 
 
+def _get_tasks_with_perm(request, biz, task_id_list, permit):
+    """
+    @summary: 批量获取用户有权限操作的任务，业务级别的权限只校验一次，模板权限一次性预取
+    @return: {任务 ID: 任务}, {任务 ID: 错误信息}
+    """
+    tasks = {task.id: task for task in TaskFlowInstance.objects.select_related('pipeline_instance').filter(
+        id__in=task_id_list, business=biz, is_deleted=False)}
+    errors = {task_id: {'result': False, 'message': 'task: %s does not exist' % task_id}
+              for task_id in task_id_list if task_id not in tasks}
+
+    user = request.user
+    if check_white_apps(request) or user.is_superuser or user.has_perm('manage_business', biz):
+        return tasks, errors
+
+    templates = TaskTemplate.objects.filter(pk__in=set([task.template_id for task in tasks.itervalues()]))
+    checker = ObjectPermissionChecker(user)
+    checker.prefetch_perms(templates)
+    permitted = set([str(template.pk) for template in templates if checker.has_perm(permit, template)])
+    for task_id, task in tasks.items():
+        if task.template_id not in permitted:
+            tasks.pop(task_id)
+            errors[task_id] = {
+                'result': False,
+                'message': 'user: %s does not have perm[%s] of task: %s' % (user.username, permit, task_id)
+            }
+    return tasks, errors
+
+
+def _bulk_task_action(request, bk_biz_id, schema, action=None):
+    params = json.loads(request.body)
+    try:
+        jsonschema.validate(params, schema)
+    except jsonschema.ValidationError as e:
+        logger.warning(u"apigw bulk task action raise prams error: %s" % e)
+        message = 'task params is invalid: %s' % e
+        return JsonResponse({'result': False, 'message': message})
+
+    action = action or params['action']
+    biz = Business.objects.get(cc_id=bk_biz_id)
+    task_id_list = params['task_id_list']
+    tasks, results = _get_tasks_with_perm(request, biz, task_id_list, 'execute_task')
+    results.update(TaskFlowInstance.objects.batch_task_action(tasks.values(), action, request.user.username))
+    data = [dict(results[task_id], task_id=task_id) for task_id in task_id_list]
+    return JsonResponse({'result': True, 'data': data})
+
+
+@login_exempt
+@csrf_exempt
+@require_POST
+@apigw_required
+@api_check_user_perm_of_business('view_business')
+def bulk_start_task(request, bk_biz_id):
+    return _bulk_task_action(request, bk_biz_id, APIGW_BULK_START_TASK_PARAMS, 'start')
+
+
+@login_exempt
+@csrf_exempt
+@require_POST
+@apigw_required
+@api_check_user_perm_of_business('view_business')
+def bulk_operate_task(request, bk_biz_id):
+    return _bulk_task_action(request, bk_biz_id, APIGW_BULK_OPERATE_TASK_PARAMS)
+
+
 @login_exempt
 @require_GET
 @apigw_required
@@ -193,6 +314,62 @@ def get_task_status(request, task_id, bk_biz_id):
     return JsonResponse(result)
 
 
+@login_exempt
+@csrf_exempt
+@require_POST
+@apigw_required
+@api_check_user_perm_of_business('view_business')
+def bulk_get_task_status(request, bk_biz_id):
+    params = json.loads(request.body)
+    try:
+        jsonschema.validate(params, APIGW_BULK_GET_TASK_STATUS_PARAMS)
+    except jsonschema.ValidationError as e:
+        logger.warning(u"apigw bulk_get_task_status raise prams error: %s" % e)
+        message = 'task params is invalid: %s' % e
+        return JsonResponse({'result': False, 'message': message})
+
+    task_id_list = params['task_id_list']
+    tasks = list(TaskFlowInstance.objects.select_related('pipeline_instance').filter(
+        id__in=task_id_list, business__cc_id=bk_biz_id, is_deleted=False))
+    task_ids = set([task.id for task in tasks])
+    try:
+        status = TaskFlowInstance.objects.batch_get_status(tasks, max_depth=params.get('max_depth', 99))
+    except Exception as e:
+        message = 'tasks get status error: %s' % e
+        logger.error(message)
+        return JsonResponse({'result': False, 'message': message})
+
+    data = []
+    for task_id in task_id_list:
+        if task_id in status:
+            data.append({'task_id': task_id, 'result': True, 'data': status[task_id]})
+        elif task_id in task_ids:
+            data.append({'task_id': task_id, 'result': False, 'message': 'task: %s status does not exist' % task_id})
+        else:
+            data.append({'task_id': task_id, 'result': False, 'message': 'task: %s does not exist' % task_id})
+    return JsonResponse({'result': True, 'data': data})
+
+
+@login_exempt
+@require_GET
+@apigw_required
+@api_check_user_perm_of_business('view_business')
+def get_task_status_changes(request, task_id, bk_biz_id):
+    try:
+        cursor = int(request.GET.get('cursor', 0))
+        wait = float(request.GET.get('wait', 0))
+        task = TaskFlowInstance.objects.get(pk=task_id, business__cc_id=bk_biz_id)
+        result = {
+            'result': True,
+            'data': task.get_status_changes(cursor=cursor, wait=wait)
+        }
+    except Exception as e:
+        message = 'task[id=%s] get status changes error: %s' % (task_id, e)
+        logger.error(message)
+        result = {'result': False, 'message': message}
+    return JsonResponse(result)
+
+
 @login_exempt
 @csrf_exempt
 @require_POST
@@ -223,3 +400,45 @@ def query_task_count(request, bk_biz_id):
     if not success:
         return JsonResponse({'result': False, 'message': content})
     return JsonResponse({'result': True, 'data': content})
+
+
+@login_exempt
+@csrf_exempt
+@require_POST
+@apigw_required
+@api_check_user_perm_of_business('manage_business')
+def register_webhook(request, bk_biz_id):
+    params = json.loads(request.body)
+    try:
+        jsonschema.validate(params, APIGW_REGISTER_WEBHOOK_PARAMS)
+    except jsonschema.ValidationError as e:
+        logger.warning(u"apigw register_webhook raise prams error: %s" % e)
+        message = 'webhook params is invalid: %s' % e
+        return JsonResponse({'result': False, 'message': message})
+
+    biz = Business.objects.get(cc_id=bk_biz_id)
+    template_id = params.get('template_id')
+    if template_id and not TaskTemplate.objects.filter(pk=template_id, business=biz, is_deleted=False).exists():
+        return JsonResponse({'result': False, 'message': 'template[id=%s] does not exist' % template_id})
+
+    webhook = Webhook.objects.create(
+        business=biz,
+        template_id=str(template_id or ''),
+        url=params['url'],
+        events=json.dumps(params['events']),
+        secret=params.get('secret', ''),
+        creator=request.user.username,
+    )
+    return JsonResponse({'result': True, 'data': {'webhook_id': webhook.id}})
+
+
+@login_exempt
+@csrf_exempt
+@require_POST
+@apigw_required
+@api_check_user_perm_of_business('manage_business')
+def delete_webhook(request, webhook_id, bk_biz_id):
+    deleted = Webhook.objects.filter(id=webhook_id, business__cc_id=bk_biz_id).update(is_active=False)
+    if not deleted:
+        return JsonResponse({'result': False, 'message': 'webhook[id=%s] does not exist' % webhook_id})
+    return JsonResponse({'result': True, 'data': {'webhook_id': int(webhook_id)}})
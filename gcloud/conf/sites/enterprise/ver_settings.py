@@ -44,3 +44,43 @@ TEST_TEMPLATE_ID = 8
 TEST_TOKEN = {
     "BK_TOKEN": 'NGpWESNXOYOgIAegc6cQOffLEtWYGF'
 }
+
+# 任务事件回调投递配置
+#   WEBHOOK_DELIVER_INTERVAL: 投递任务的执行间隔(单位s)
+#   WEBHOOK_DELIVER_MAX_COUNT: 每次最多投递的事件数量
+#   WEBHOOK_DELIVER_BATCH_SIZE: 同一个回调地址每个请求最多包含的事件数量
+#   WEBHOOK_DELIVER_POOL_SIZE: 并发投递的回调地址数量
+#   WEBHOOK_DELIVER_TIMEOUT: 回调请求超时时间(单位s)
+#   WEBHOOK_DELIVER_LEASE: 事件被领取后的租期，租期内不会被重复领取，剩余租期不足两倍请求超时时间时不再发送请求，
+#     未发送的事件在下次投递时重新领取(单位s)
+#   WEBHOOK_MAX_RETRY_TIMES: 投递失败后的最大重试次数
+#   WEBHOOK_RETRY_BACKOFF, WEBHOOK_RETRY_MAX_BACKOFF: 重试间隔从 WEBHOOK_RETRY_BACKOFF 开始指数增长，不超过最大值(单位s)
+WEBHOOK_DELIVER_INTERVAL = 5
+WEBHOOK_DELIVER_MAX_COUNT = 1000
+WEBHOOK_DELIVER_BATCH_SIZE = 100
+WEBHOOK_DELIVER_POOL_SIZE = 8
+WEBHOOK_DELIVER_TIMEOUT = 10
+WEBHOOK_DELIVER_LEASE = 300
+WEBHOOK_MAX_RETRY_TIMES = 8
+WEBHOOK_RETRY_BACKOFF = 10
+WEBHOOK_RETRY_MAX_BACKOFF = 3600
+
+# 任务通知发送配置
+#   NOTIFY_SEND_INTERVAL: 通知发送任务的执行间隔(单位s)，同一个任务在间隔内的多个节点失败通知会合并成一条
+#   NOTIFY_SEND_MAX_COUNT: 每次最多处理的通知记录数量
+#   NOTIFY_SEND_POOL_SIZE: 并发发送通知的任务数量
+#   NOTIFY_DIGEST_MAX_NODES: 合并后的失败通知中最多列出的节点数量
+#   NOTIFY_RECEIVER_CACHE_TIME: 业务下各角色通知人的缓存时间(单位s)
+#   NOTIFY_SEND_LEASE: 通知处于发送中超过该时间后认为发送进程已经退出，重新发送(单位s)
+#   NOTIFY_MAX_RETRY_TIMES: 发送失败后的最大重试次数
+#   NOTIFY_RETRY_INTERVAL: 发送失败后的重试间隔(单位s)
+#   NOTIFY_EXPIRE_DAYS: 已发送和发送失败的通知保留的天数，过期的通知定时清理
+NOTIFY_SEND_INTERVAL = 5
+NOTIFY_SEND_MAX_COUNT = 1000
+NOTIFY_SEND_POOL_SIZE = 8
+NOTIFY_DIGEST_MAX_NODES = 10
+NOTIFY_RECEIVER_CACHE_TIME = 300
+NOTIFY_SEND_LEASE = 600
+NOTIFY_MAX_RETRY_TIMES = 3
+NOTIFY_RETRY_INTERVAL = 60
+NOTIFY_EXPIRE_DAYS = 7
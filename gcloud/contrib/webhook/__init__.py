@@ -0,0 +1,3 @@
+# -*- coding: utf-8 -*-
+
+default_app_config = 'gcloud.contrib.webhook.apps.WebhookConfig'
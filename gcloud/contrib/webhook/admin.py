@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+from django.contrib import admin
+
+from gcloud.contrib.webhook import models
+
+
+@admin.register(models.Webhook)
+class WebhookAdmin(admin.ModelAdmin):
+    list_display = ['id', 'business', 'template_id', 'url', 'events', 'is_active', 'creator', 'create_time']
+    list_filter = ['is_active']
+    search_fields = ['id', 'url', 'template_id', 'creator']
+    raw_id_fields = ['business']
+
+
+@admin.register(models.WebhookDelivery)
+class WebhookDeliveryAdmin(admin.ModelAdmin):
+    list_display = ['id', 'webhook', 'event', 'status', 'retry_times', 'create_time', 'deliver_time', 'lag']
+    list_filter = ['status', 'event']
+    search_fields = ['id', 'webhook__url']
+    raw_id_fields = ['webhook']
@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+from django.apps import AppConfig
+
+
+class WebhookConfig(AppConfig):
+    name = 'gcloud.contrib.webhook'
+    verbose_name = 'GcloudContribWebhook'
+
+    def ready(self):
+        # 导入 handlers 时注册任务信号的处理函数
+        from gcloud.contrib.webhook import handlers
+        handlers.dispatch_activity_failed()
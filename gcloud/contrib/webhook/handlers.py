@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+import logging
+
+from django.dispatch import receiver
+
+from gcloud.taskflow3.models import TaskFlowInstance
+from gcloud.taskflow3.signals import taskflow_started, taskflow_finished
+from gcloud.contrib.webhook.models import WebhookDelivery
+from pipeline.engine.signals import activity_failed
+
+logger = logging.getLogger('celery')
+
+# 以下处理函数可能运行在引擎的 worker 中，只记录投递记录，不发送请求
+
+
+@receiver(taskflow_started)
+def webhook_taskflow_started_handler(sender, username, **kwargs):
+    try:
+        WebhookDelivery.objects.record_event(sender, 'task_started', executor=username)
+    except Exception as e:
+        logger.exception(u"webhook_taskflow_started_handler[taskflow_id=%s] record event error: %s" % (sender.id, e))
+
+
+@receiver(taskflow_finished)
+def webhook_taskflow_finished_handler(sender, username, **kwargs):
+    try:
+        WebhookDelivery.objects.record_event(sender, 'task_finished', executor=username)
+    except Exception as e:
+        logger.exception(u"webhook_taskflow_finished_handler[taskflow_id=%s] record event error: %s" % (sender.id, e))
+
+
+def webhook_node_failed_handler(sender, pipeline_instance, pipeline_activity_id, **kwargs):
+    try:
+        taskflow = TaskFlowInstance.objects.get(pipeline_instance=pipeline_instance)
+    except TaskFlowInstance.DoesNotExist:
+        logger.error(u"webhook node failed handler get taskflow error, pipeline_instance_id=%s" % pipeline_instance.id)
+        return
+
+    try:
+        WebhookDelivery.objects.record_event(taskflow, 'node_failed', node_id=pipeline_activity_id)
+    except Exception as e:
+        logger.exception(u"webhook_node_failed_handler[taskflow_id=%s] record event error: %s" % (taskflow.id, e))
+
+
+def dispatch_activity_failed():
+    activity_failed.connect(
+        webhook_node_failed_handler,
+        dispatch_uid='_webhook_node_failed',
+    )
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_environmentvariables'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Webhook',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('template_id', models.CharField(db_index=True, max_length=255, verbose_name='\u6a21\u677fID', blank=True)),
+                ('url', models.URLField(max_length=255, verbose_name='\u56de\u8c03\u5730\u5740')),
+                ('events', models.TextField(default=b'[]', verbose_name='\u8ba2\u9605\u7684\u4e8b\u4ef6')),
+                ('secret', models.CharField(max_length=128, verbose_name='\u7b7e\u540d\u5bc6\u94a5', blank=True)),
+                ('is_active', models.BooleanField(default=True, verbose_name='\u662f\u5426\u542f\u7528')),
+                ('creator', models.CharField(max_length=32, verbose_name='\u521b\u5efa\u8005')),
+                ('create_time', models.DateTimeField(auto_now_add=True, verbose_name='\u521b\u5efa\u65f6\u95f4')),
+                ('business', models.ForeignKey(verbose_name='\u6240\u5c5e\u4e1a\u52a1', to='core.Business')),
+            ],
+            options={
+                'ordering': ['-id'],
+                'verbose_name': '\u56de\u8c03\u5730\u5740 Webhook',
+                'verbose_name_plural': '\u56de\u8c03\u5730\u5740 Webhook',
+            },
+        ),
+        migrations.CreateModel(
+            name='WebhookDelivery',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('event', models.CharField(max_length=32, verbose_name='\u4e8b\u4ef6', choices=[(b'task_started', '\u4efb\u52a1\u5f00\u59cb\u6267\u884c'), (b'task_finished', '\u4efb\u52a1\u6267\u884c\u5b8c\u6210'), (b'node_failed', '\u8282\u70b9\u6267\u884c\u5931\u8d25')])),
+                ('payload', models.TextField(verbose_name='\u4e8b\u4ef6\u6570\u636e')),
+                ('status', models.CharField(default=b'pending', max_length=32, verbose_name='\u6295\u9012\u72b6\u6001', choices=[(b'pending', '\u5f85\u6295\u9012'), (b'succeeded', '\u6295\u9012\u6210\u529f'), (b'failed', '\u6295\u9012\u5931\u8d25')])),
+                ('retry_times', models.IntegerField(default=0, verbose_name='\u91cd\u8bd5\u6b21\u6570')),
+                ('next_deliver_time', models.DateTimeField(verbose_name='\u4e0b\u6b21\u6295\u9012\u65f6\u95f4', db_index=True)),
+                ('last_error', models.TextField(verbose_name='\u6700\u8fd1\u4e00\u6b21\u6295\u9012\u9519\u8bef', blank=True)),
+                ('create_time', models.DateTimeField(auto_now_add=True, verbose_name='\u4e8b\u4ef6\u65f6\u95f4')),
+                ('deliver_time', models.DateTimeField(null=True, verbose_name='\u6295\u9012\u6210\u529f\u65f6\u95f4', blank=True)),
+                ('webhook', models.ForeignKey(related_name='deliveries', verbose_name='\u56de\u8c03\u5730\u5740', to='webhook.Webhook')),
+            ],
+            options={
+                'ordering': ['-id'],
+                'verbose_name': '\u56de\u8c03\u6295\u9012\u8bb0\u5f55 WebhookDelivery',
+                'verbose_name_plural': '\u56de\u8c03\u6295\u9012\u8bb0\u5f55 WebhookDelivery',
+            },
+        ),
+        migrations.AlterIndexTogether(
+            name='webhookdelivery',
+            index_together=set([('status', 'next_deliver_time')]),
+        ),
+    ]
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+import json
+import datetime
+
+from django.db import models, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.translation import ugettext_lazy as _
+
+from gcloud.conf import settings
+from gcloud.core.models import Business
+from gcloud.core.utils import strftime_with_timezone
+
+WEBHOOK_EVENTS = [
+    ('task_started', _(u"任务开始执行")),
+    ('task_finished', _(u"任务执行完成")),
+    ('node_failed', _(u"节点执行失败")),
+]
+
+DELIVERY_STATUS = [
+    ('pending', _(u"待投递")),
+    ('succeeded', _(u"投递成功")),
+    ('failed', _(u"投递失败")),
+]
+
+
+class WebhookManager(models.Manager):
+    def subscribed(self, business_id, template_id, event):
+        """
+        @summary: 获取订阅了某个业务下某个模板的任务事件的回调地址
+        @param business_id: 业务 ID
+        @param template_id: 模板 ID
+        @param event: 事件
+        @return:
+        """
+        webhooks = self.filter(Q(template_id='') | Q(template_id=str(template_id)),
+                               business_id=business_id, is_active=True)
+        return [webhook for webhook in webhooks if event in webhook.event_list]
+
+
+class Webhook(models.Model):
+    """
+    任务状态变更事件的回调地址，模板 ID 为空时订阅业务下所有任务的事件
+    """
+    business = models.ForeignKey(Business, verbose_name=_(u"所属业务"))
+    template_id = models.CharField(_(u"模板ID"), max_length=255, blank=True, db_index=True)
+    url = models.URLField(_(u"回调地址"), max_length=255)
+    events = models.TextField(_(u"订阅的事件"), default='[]')
+    secret = models.CharField(_(u"签名密钥"), max_length=128, blank=True)
+    is_active = models.BooleanField(_(u"是否启用"), default=True)
+    creator = models.CharField(_(u"创建者"), max_length=32)
+    create_time = models.DateTimeField(_(u"创建时间"), auto_now_add=True)
+
+    objects = WebhookManager()
+
+    def __unicode__(self):
+        return u"%s_%s" % (self.business, self.url)
+
+    class Meta:
+        verbose_name = _(u"回调地址 Webhook")
+        verbose_name_plural = _(u"回调地址 Webhook")
+        ordering = ['-id']
+
+    @property
+    def event_list(self):
+        return json.loads(self.events)
+
+
+class WebhookDeliveryManager(models.Manager):
+    def record_event(self, taskflow, event, **data):
+        """
+        @summary: 为订阅了任务事件的回调地址生成投递记录，由独立的队列负责投递
+        @param taskflow: 任务
+        @param event: 事件
+        @param data: 事件数据
+        @return: 投递记录数量
+        """
+        webhooks = Webhook.objects.subscribed(taskflow.business_id, taskflow.template_id, event)
+        if not webhooks:
+            return 0
+        now = timezone.now()
+        data.update({
+            'event': event,
+            'task_id': taskflow.id,
+            'task_name': taskflow.pipeline_instance.name,
+            'bk_biz_id': taskflow.business.cc_id,
+            'template_id': taskflow.template_id,
+            'time': strftime_with_timezone(now),
+        })
+        payload = json.dumps(data)
+        self.bulk_create([self.model(webhook=webhook, event=event, payload=payload, next_deliver_time=now)
+                          for webhook in webhooks])
+        return len(webhooks)
+
+    def claim_due(self, limit):
+        """
+        @summary: 获取到期需要投递的记录，并把下次投递时间推迟到租期结束，避免被其他进程重复投递，
+                  返回记录的 next_deliver_time 即租期结束时间，投递方需要在租期内完成投递或者释放记录
+        @param limit: 最大数量
+        @return:
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            ids = list(self.select_for_update().filter(status='pending', next_deliver_time__lte=now,
+                                                       webhook__is_active=True)
+                       .order_by('next_deliver_time').values_list('id', flat=True)[:limit])
+            lease = now + datetime.timedelta(seconds=settings.WEBHOOK_DELIVER_LEASE)
+            self.filter(id__in=ids).update(next_deliver_time=lease)
+        return list(self.select_related('webhook').filter(id__in=ids).order_by('id'))
+
+    def release(self, deliveries):
+        """
+        @summary: 释放租期内来不及投递的记录，下次投递时重新领取，不计入重试次数
+        """
+        self.filter(id__in=[delivery.id for delivery in deliveries]).update(next_deliver_time=timezone.now())
+
+    def mark_succeeded(self, deliveries):
+        self.filter(id__in=[delivery.id for delivery in deliveries]).update(status='succeeded',
+                                                                           deliver_time=timezone.now())
+
+    def mark_failed(self, deliveries, error):
+        """
+        @summary: 投递失败后按照指数退避推迟下次投递，超过最大重试次数后不再投递
+        """
+        now = timezone.now()
+        for delivery in deliveries:
+            delivery.retry_times += 1
+            delivery.last_error = error[:1024]
+            if delivery.retry_times > settings.WEBHOOK_MAX_RETRY_TIMES:
+                delivery.status = 'failed'
+            else:
+                backoff = min(settings.WEBHOOK_RETRY_BACKOFF * 2 ** (delivery.retry_times - 1),
+                              settings.WEBHOOK_RETRY_MAX_BACKOFF)
+                delivery.next_deliver_time = now + datetime.timedelta(seconds=backoff)
+            delivery.save()
+
+    def statistics(self, since):
+        """
+        @summary: 投递延迟统计
+        @param since: 统计从该时间开始投递成功的记录
+        @return:
+        """
+        now = timezone.now()
+        lags = [(deliver_time - create_time).total_seconds() for create_time, deliver_time in
+                self.filter(status='succeeded', deliver_time__gte=since).values_list('create_time', 'deliver_time')]
+        pending_qs = self.filter(status='pending', webhook__is_active=True)
+        oldest_pending = pending_qs.order_by('create_time').values_list('create_time', flat=True).first()
+        return {
+            'delivered': len(lags),
+            'avg_lag': sum(lags) / len(lags) if lags else 0,
+            'max_lag': max(lags) if lags else 0,
+            'pending': pending_qs.count(),
+            'oldest_pending_lag': (now - oldest_pending).total_seconds() if oldest_pending else 0,
+        }
+
+
+class WebhookDelivery(models.Model):
+    """
+    回调事件投递记录
+    """
+    webhook = models.ForeignKey(Webhook, verbose_name=_(u"回调地址"), related_name='deliveries')
+    event = models.CharField(_(u"事件"), max_length=32, choices=WEBHOOK_EVENTS)
+    payload = models.TextField(_(u"事件数据"))
+    status = models.CharField(_(u"投递状态"), max_length=32, choices=DELIVERY_STATUS, default='pending')
+    retry_times = models.IntegerField(_(u"重试次数"), default=0)
+    next_deliver_time = models.DateTimeField(_(u"下次投递时间"), db_index=True)
+    last_error = models.TextField(_(u"最近一次投递错误"), blank=True)
+    create_time = models.DateTimeField(_(u"事件时间"), auto_now_add=True)
+    deliver_time = models.DateTimeField(_(u"投递成功时间"), null=True, blank=True)
+
+    objects = WebhookDeliveryManager()
+
+    def __unicode__(self):
+        return u"%s_%s" % (self.webhook_id, self.event)
+
+    class Meta:
+        verbose_name = _(u"回调投递记录 WebhookDelivery")
+        verbose_name_plural = _(u"回调投递记录 WebhookDelivery")
+        ordering = ['-id']
+        index_together = [('status', 'next_deliver_time')]
+
+    @property
+    def lag(self):
+        if not self.deliver_time:
+            return None
+        return (self.deliver_time - self.create_time).total_seconds()
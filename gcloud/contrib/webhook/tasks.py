@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+import hmac
+import json
+import hashlib
+import logging
+import datetime
+
+import requests
+from celery.decorators import periodic_task
+from django.utils import timezone
+
+from gcloud.conf import settings
+from gcloud.contrib.webhook.models import WebhookDelivery
+from pipeline.utils.pool import map_in_threads
+
+logger = logging.getLogger('celery')
+
+
+def sign_payload(secret, body):
+    return hmac.new(str(secret), body, hashlib.sha1).hexdigest()
+
+
+def post_events(webhook, deliveries):
+    """
+    @summary: 将同一个回调地址的多个事件合并成一次请求投递，每个事件带有投递记录 ID，重试时不变，接收方可以据此去重
+    @return: 错误信息，投递成功时为空
+    """
+    body = json.dumps({'events': [dict(json.loads(delivery.payload), delivery_id=delivery.id)
+                                  for delivery in deliveries]})
+    headers = {'Content-Type': 'application/json'}
+    if webhook.secret:
+        headers['X-Webhook-Signature'] = sign_payload(webhook.secret, body)
+    try:
+        response = requests.post(webhook.url, data=body, headers=headers, timeout=settings.WEBHOOK_DELIVER_TIMEOUT)
+    except Exception as e:
+        return u"request error: %s" % e
+    if not 200 <= response.status_code < 300:
+        return u"response status code: %s" % response.status_code
+    return ''
+
+
+def deliver_to_webhook(item):
+    webhook, deliveries = item
+    sent = failed = 0
+    # 租期结束后记录可能被其他进程领取，剩余租期不足以完成一次请求时释放剩余的记录
+    lease = deliveries[0].next_deliver_time - datetime.timedelta(seconds=settings.WEBHOOK_DELIVER_TIMEOUT * 2)
+    for i in xrange(0, len(deliveries), settings.WEBHOOK_DELIVER_BATCH_SIZE):
+        if timezone.now() > lease:
+            logger.warning(u"webhook[id=%s] deliver lease expired, %s events released" % (webhook.id,
+                                                                                        len(deliveries) - i))
+            WebhookDelivery.objects.release(deliveries[i:])
+            break
+        batch = deliveries[i:i + settings.WEBHOOK_DELIVER_BATCH_SIZE]
+        error = post_events(webhook, batch)
+        if error:
+            logger.warning(u"webhook[id=%s] deliver %s events failed: %s" % (webhook.id, len(batch), error))
+            WebhookDelivery.objects.mark_failed(batch, error)
+            failed += len(batch)
+        else:
+            WebhookDelivery.objects.mark_succeeded(batch)
+            sent += len(batch)
+    return sent, failed
+
+
+@periodic_task(run_every=datetime.timedelta(seconds=settings.WEBHOOK_DELIVER_INTERVAL), ignore_result=True)
+def deliver_webhooks():
+    """
+    @summary: 投递到期的回调事件，运行在独立的 webhook 队列中，不占用引擎的 worker
+    """
+    started_time = timezone.now()
+    deliveries = WebhookDelivery.objects.claim_due(settings.WEBHOOK_DELIVER_MAX_COUNT)
+    if not deliveries:
+        return
+
+    groups = {}
+    for delivery in deliveries:
+        groups.setdefault(delivery.webhook_id, (delivery.webhook, []))[1].append(delivery)
+    results = map_in_threads(deliver_to_webhook, groups.values(), settings.WEBHOOK_DELIVER_POOL_SIZE)
+
+    stats = WebhookDelivery.objects.statistics(since=started_time)
+    logger.info(u"webhook deliver finished, sent: %s, failed: %s, avg lag: %.3fs, max lag: %.3fs, "
+                u"pending: %s, oldest pending lag: %.3fs" % (sum([result[0] for result in results]),
+                                                            sum([result[1] for result in results]),
+                                                            stats['avg_lag'], stats['max_lag'], stats['pending'],
+                                                            stats['oldest_pending_lag']))
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+import json
+import datetime
+from collections import namedtuple
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from gcloud.core.models import Business
+from gcloud.contrib.webhook import tasks
+from gcloud.contrib.webhook.models import Webhook, WebhookDelivery
+
+PipelineInstance = namedtuple('PipelineInstance', 'name')
+TaskFlow = namedtuple('TaskFlow', 'id business_id business template_id pipeline_instance')
+
+
+class FakeResponse(object):
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+@override_settings(WEBHOOK_DELIVER_LEASE=300, WEBHOOK_DELIVER_TIMEOUT=10, WEBHOOK_DELIVER_BATCH_SIZE=2,
+                   WEBHOOK_MAX_RETRY_TIMES=3, WEBHOOK_RETRY_BACKOFF=10, WEBHOOK_RETRY_MAX_BACKOFF=30)
+class TestWebhookDelivery(TestCase):
+    def setUp(self):
+        self.biz = Business.objects.create(cc_id=2, cc_name='biz', cc_owner='owner', cc_company='company')
+        self.webhook = Webhook.objects.create(business=self.biz, url='http://127.0.0.1/webhook/', secret='secret',
+                                              events='["task_finished"]', creator='tester')
+        self.taskflow = TaskFlow(1, self.biz.id, self.biz, '1', PipelineInstance('task'))
+        self.requests = []
+        self.status_code = 200
+        self.origin_post = tasks.requests.post
+        tasks.requests.post = self.post
+
+    def tearDown(self):
+        tasks.requests.post = self.origin_post
+
+    def post(self, url, data, headers, timeout):
+        self.requests.append((url, data, headers))
+        return FakeResponse(self.status_code)
+
+    def record(self, count):
+        for __ in xrange(count):
+            WebhookDelivery.objects.record_event(self.taskflow, 'task_finished', executor='tester')
+
+    def test_claim_due(self):
+        self.record(3)
+        deliveries = WebhookDelivery.objects.claim_due(2)
+        self.assertEqual(len(deliveries), 2)
+        for delivery in deliveries:
+            self.assertGreater(delivery.next_deliver_time, timezone.now() + datetime.timedelta(seconds=290))
+
+        # 租期内不会被重复领取，释放后可以重新领取
+        self.assertEqual(len(WebhookDelivery.objects.claim_due(10)), 1)
+        self.assertEqual(WebhookDelivery.objects.claim_due(10), [])
+        WebhookDelivery.objects.release(deliveries)
+        self.assertEqual(len(WebhookDelivery.objects.claim_due(10)), 2)
+
+    def test_backoff(self):
+        self.record(1)
+        delivery = WebhookDelivery.objects.get()
+        for backoff in [10, 20, 30]:
+            WebhookDelivery.objects.mark_failed([delivery], 'error')
+            delivery = WebhookDelivery.objects.get()
+            self.assertEqual(delivery.status, 'pending')
+            self.assertAlmostEqual((delivery.next_deliver_time - timezone.now()).total_seconds(), backoff, delta=2)
+
+        WebhookDelivery.objects.mark_failed([delivery], 'error')
+        delivery = WebhookDelivery.objects.get()
+        self.assertEqual(delivery.status, 'failed')
+        self.assertEqual(delivery.retry_times, 4)
+
+    def test_deliver(self):
+        self.record(3)
+        deliveries = WebhookDelivery.objects.claim_due(10)
+        self.assertEqual(tasks.deliver_to_webhook((self.webhook, deliveries)), (3, 0))
+        self.assertEqual(WebhookDelivery.objects.filter(status='succeeded').count(), 3)
+
+        # 按批次合并请求，每个事件带有投递记录 ID，请求头带有请求体的签名
+        self.assertEqual(len(self.requests), 2)
+        delivery_ids = []
+        for url, body, headers in self.requests:
+            self.assertEqual(url, self.webhook.url)
+            self.assertEqual(headers['X-Webhook-Signature'], tasks.sign_payload('secret', body))
+            delivery_ids.extend([event['delivery_id'] for event in json.loads(body)['events']])
+        self.assertEqual(delivery_ids, [delivery.id for delivery in deliveries])
+
+    def test_deliver_failed(self):
+        self.record(1)
+        self.status_code = 500
+        deliveries = WebhookDelivery.objects.claim_due(10)
+        self.assertEqual(tasks.deliver_to_webhook((self.webhook, deliveries)), (0, 1))
+        delivery = WebhookDelivery.objects.get()
+        self.assertEqual(delivery.retry_times, 1)
+        self.assertEqual(delivery.last_error, 'response status code: 500')
+
+    def test_lease_expired(self):
+        self.record(1)
+        deliveries = WebhookDelivery.objects.claim_due(10)
+        deliveries[0].next_deliver_time = timezone.now() + datetime.timedelta(seconds=10)
+        self.assertEqual(tasks.deliver_to_webhook((self.webhook, deliveries)), (0, 0))
+        self.assertEqual(self.requests, [])
+        self.assertEqual(len(WebhookDelivery.objects.claim_due(10)), 1)
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+import logging
+import datetime
+
+from celery.decorators import periodic_task
+
+from pipeline.conf import settings
+from pipeline.components.host_index import host_index
+
+logger = logging.getLogger('celery')
+
+
+@periodic_task(run_every=datetime.timedelta(seconds=settings.PIPELINE_HOST_INDEX_REFRESH_INTERVAL),
+               ignore_result=True)
+def refresh_host_index():
+    """
+    @summary: 刷新最近使用过的主机索引
+    """
+    count = host_index.refresh_active()
+    logger.info(u"host index refreshed, index count: %s" % count)
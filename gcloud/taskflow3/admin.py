@@ -17,3 +17,11 @@ class TaskFlowInstanceAdmin(admin.ModelAdmin):
         queryset.update(is_deleted=True)
 
     fake_delete.short_description = 'Fake delete'
+
+
+@admin.register(models.TaskNotification)
+class TaskNotificationAdmin(admin.ModelAdmin):
+    list_display = ['id', 'taskflow', 'msg_type', 'node_id', 'status', 'create_time', 'send_time']
+    list_filter = ['status', 'msg_type']
+    search_fields = ['id', 'taskflow__id', 'node_id']
+    raw_id_fields = ['taskflow']
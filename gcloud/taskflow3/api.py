@@ -42,6 +42,21 @@ def status(request, biz_cc_id):
     return JsonResponse(ctx)
 
 
+@require_GET
+def status_changes(request, biz_cc_id):
+    instance_id = request.GET.get('instance_id')
+    try:
+        cursor = int(request.GET.get('cursor', 0))
+        wait = float(request.GET.get('wait', 0))
+        task = TaskFlowInstance.objects.get(pk=instance_id, business__cc_id=biz_cc_id)
+        ctx = {'result': True, 'data': task.get_status_changes(cursor=cursor, wait=wait)}
+    except Exception as e:
+        message = 'taskflow[id=%s] get status changes error: %s' % (instance_id, e)
+        logger.error(message)
+        ctx = {'result': False, 'message': message}
+    return JsonResponse(ctx)
+
+
 @require_GET
 def data(request, biz_cc_id):
     task_id = request.GET.get('instance_id')
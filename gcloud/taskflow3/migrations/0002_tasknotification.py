@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskflow3', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskNotification',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('msg_type', models.CharField(max_length=32, verbose_name='\u901a\u77e5\u7c7b\u578b', choices=[(b'atom_failed', '\u8282\u70b9\u6267\u884c\u5931\u8d25'), (b'task_finished', '\u4efb\u52a1\u6267\u884c\u5b8c\u6210')])),
+                ('node_id', models.CharField(max_length=32, verbose_name='\u5931\u8d25\u8282\u70b9ID', blank=True)),
+                ('status', models.CharField(default=b'pending', max_length=32, verbose_name='\u53d1\u9001\u72b6\u6001', db_index=True, choices=[(b'pending', '\u5f85\u53d1\u9001'), (b'sending', '\u53d1\u9001\u4e2d'), (b'sent', '\u5df2\u53d1\u9001'), (b'failed', '\u53d1\u9001\u5931\u8d25')])),
+                ('create_time', models.DateTimeField(auto_now_add=True, verbose_name='\u521b\u5efa\u65f6\u95f4')),
+                ('send_time', models.DateTimeField(null=True, verbose_name='\u53d1\u9001\u65f6\u95f4', blank=True)),
+                ('taskflow', models.ForeignKey(verbose_name='\u4efb\u52a1', to='taskflow3.TaskFlowInstance')),
+            ],
+            options={
+                'ordering': ['-id'],
+                'verbose_name': '\u4efb\u52a1\u901a\u77e5 TaskNotification',
+                'verbose_name_plural': '\u4efb\u52a1\u901a\u77e5 TaskNotification',
+            },
+        ),
+    ]
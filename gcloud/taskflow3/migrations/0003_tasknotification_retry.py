@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskflow3', '0002_tasknotification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tasknotification',
+            name='claim_time',
+            field=models.DateTimeField(null=True, verbose_name='\u5f00\u59cb\u53d1\u9001\u65f6\u95f4', blank=True),
+        ),
+        migrations.AddField(
+            model_name='tasknotification',
+            name='retry_times',
+            field=models.IntegerField(default=0, verbose_name='\u53d1\u9001\u5931\u8d25\u6b21\u6570'),
+        ),
+    ]
@@ -1,9 +1,13 @@
 # -*- coding: utf-8 -*-
+import copy
 import json
 import logging
+import datetime
 
 import re
 from django.db import models, transaction
+from django.db.models import Q, F
+from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 
 from common.log import logger
@@ -48,6 +52,16 @@ NODE_ACTIONS = {
 }
 
 
+CREATED_TASK_STATUS = {
+    "start_time": None,
+    "state": "CREATED",
+    "retry": 0,
+    "skip": 0,
+    "finish_time": None,
+    "children": {}
+}
+
+
 class TaskFlowInstanceManager(models.Manager, managermixins.ClassificationCountMixin):
     @staticmethod
     def create_pipeline_instance(template, **kwargs):
@@ -97,6 +111,159 @@ class TaskFlowInstanceManager(models.Manager, managermixins.ClassificationCountM
 
         return True, pipeline_inst
 
+    def bulk_create_tasks(self, template, business, tasks_info, creator, create_method='api', create_info=''):
+        """
+        @summary: 用同一个模板批量创建任务，模板数据只读取一次，相同的取消执行节点只预处理一次，
+                  快照、pipeline 实例和任务分别批量写入
+        @param template: 流程模板 TaskTemplate
+        @param business: 业务
+        @param tasks_info: [{
+            'name': '',
+            'description': '',
+            'flow_type': 'common',
+            'constants': {'${a}': '1'},
+            'exclude_task_nodes_id': [],
+        }]
+        @param creator: 创建者
+        @param create_method: 创建方式
+        @param create_info: 创建任务额外信息
+        @return: 与 tasks_info 一一对应的创建结果，如 [{'result': True, 'data': {'task_id': 1}},
+                                                      {'result': False, 'message': ''}]
+        """
+        results = [None] * len(tasks_info)
+        template_tree = template.pipeline_tree
+        replace_template_id(template_tree)
+
+        previews = {}
+        pending = []
+        for index, task_info in enumerate(tasks_info):
+            exclude_task_nodes_id = tuple(task_info.get('exclude_task_nodes_id', []))
+            if exclude_task_nodes_id not in previews:
+                pipeline_tree = copy.deepcopy(template_tree)
+                try:
+                    self.preview_pipeline_tree_exclude_task_nodes(pipeline_tree, list(exclude_task_nodes_id))
+                    previews[exclude_task_nodes_id] = (True, pipeline_tree)
+                except Exception as e:
+                    previews[exclude_task_nodes_id] = (False, e.message)
+            result, data = previews[exclude_task_nodes_id]
+            if not result:
+                results[index] = {'result': False, 'message': data}
+                continue
+
+            pipeline_tree = copy.deepcopy(data)
+            for key, value in task_info.get('constants', {}).items():
+                if key in pipeline_tree[PE.constants]:
+                    pipeline_tree[PE.constants][key]['value'] = value
+            pending.append((index, task_info, {
+                'exec_data': pipeline_tree,
+                'name': task_info['name'],
+                'creator': creator,
+                'description': task_info.get('description', ''),
+            }))
+
+        if not pending:
+            return results
+
+        # 职能化任务的认领单由 TaskFlowInstance 的 post_save 创建，bulk_create 不会发送该信号
+        from gcloud.contrib.function.models import FunctionTask
+
+        with transaction.atomic():
+            created = PipelineInstance.objects.bulk_create_instances(
+                template.pipeline_template,
+                [instance_info for __, __, instance_info in pending]
+            )
+            created_pending = []
+            for (index, task_info, __), (result, data) in zip(pending, created):
+                if result:
+                    created_pending.append((index, task_info, data))
+                else:
+                    results[index] = {'result': False, 'message': data}
+            if not created_pending:
+                return results
+
+            tasks = []
+            for __, task_info, pipeline_instance in created_pending:
+                flow_type = task_info.get('flow_type', 'common')
+                tasks.append(self.model(
+                    business=business,
+                    pipeline_instance_id=pipeline_instance.id,
+                    category=template.category,
+                    template_id=template.id,
+                    create_method=create_method,
+                    create_info=create_info,
+                    flow_type=flow_type,
+                    current_flow='execute_task' if flow_type == 'common' else 'func_claim',
+                ))
+            self.bulk_create(tasks)
+            task_ids = dict(self.filter(pipeline_instance_id__in=[inst.id for __, __, inst in created_pending])
+                            .values_list('pipeline_instance_id', 'id'))
+            FunctionTask.objects.bulk_create([
+                FunctionTask(task_id=task_ids[pipeline_instance.id], creator=creator)
+                for __, task_info, pipeline_instance in created_pending
+                if task_info.get('flow_type', 'common') == 'common_func'
+            ])
+
+        for index, __, pipeline_instance in created_pending:
+            results[index] = {'result': True, 'data': {'task_id': task_ids[pipeline_instance.id]}}
+        return results
+
+    @staticmethod
+    def batch_task_action(tasks, action, username):
+        """
+        @summary: 批量操作任务，启动操作会在一次批量启动中完成，某个任务操作失败不影响其他任务
+        @param tasks: 任务列表
+        @param action: 操作，见 INSTANCE_ACTIONS
+        @param username: 操作者
+        @return: {任务 ID: 与 task_action 相同格式的操作结果}
+        """
+        results = {}
+        to_start = []
+        for task in tasks:
+            if action == 'start' and task.current_flow == 'execute_task':
+                to_start.append(task)
+            else:
+                results[task.id] = task.task_action(action, username)
+        if not to_start:
+            return results
+
+        try:
+            started = PipelineInstance.objects.batch_start([task.pipeline_instance for task in to_start], username)
+        except Exception as e:
+            message = u"tasks[id=%s] action failed:%s" % (','.join([str(task.id) for task in to_start]), e)
+            logger.exception(message)
+            for task in to_start:
+                results[task.id] = {'result': False, 'message': message}
+            return results
+
+        for task in to_start:
+            success, data = started[task.pipeline_instance.id]
+            if success:
+                taskflow_started.send(sender=task, username=username)
+            results[task.id] = {'result': success, 'data': data, 'message': data}
+        return results
+
+    @staticmethod
+    def batch_get_status(tasks, max_depth=99):
+        """
+        @summary: 批量获取任务状态，查询次数与任务数量和流程树大小无关
+        @param tasks: 任务列表
+        @param max_depth: 状态树的最大深度，为 0 时只返回任务本身的状态
+        @return: {任务 ID: 与 get_status 格式相同的状态树}，未能获取到状态的任务不包含在内
+        """
+        instance_ids = [task.pipeline_instance.instance_id for task in tasks if task.pipeline_instance.is_started]
+        status_trees = pipeline_api.get_status_trees(instance_ids, max_depth=max_depth)
+        TaskFlowInstance.resolve_blocked_status(status_trees.values())
+
+        results = {}
+        for task in tasks:
+            if not task.pipeline_instance.is_started:
+                results[task.id] = copy.deepcopy(CREATED_TASK_STATUS)
+            elif task.pipeline_instance.instance_id in status_trees:
+                status_tree = status_trees[task.pipeline_instance.instance_id]
+                TaskFlowInstance.format_pipeline_status(status_tree)
+                results[task.id] = status_tree
+        return results
+
     @staticmethod
     def preview_pipeline_tree_exclude_task_nodes(pipeline_tree, exclude_task_nodes_id=None):
         if exclude_task_nodes_id is None:
@@ -364,6 +531,8 @@ class TaskFlowInstance(models.Model):
         @summary: 转换通过 pipeline api 获取的任务状态格式
         @return:
         """
+        # 超过查询深度的节点没有 children，不能据此判断子流程的状态
+        children_loaded = 'children' in status_tree
         status_tree.setdefault('children', {})
         status_tree.pop('created_time', '')
         status_tree['start_time'] = strftime_with_timezone(status_tree.pop('started_time'))
@@ -381,23 +550,49 @@ class TaskFlowInstance(models.Model):
             elif states.SUSPENDED in child_status or 'NODE_SUSPENDED' in child_status:
                 status_tree['state'] = 'NODE_SUSPENDED'
             # 子流程 BLOCKED 状态表示子节点失败
-            elif not child_status:
+            elif not child_status and children_loaded:
                 status_tree['state'] = states.FAILED
 
+    @staticmethod
+    def resolve_blocked_status(status_trees):
+        """
+        @summary: 没有加载子节点的 BLOCKED 节点需要根据其后代节点的状态确定展示的状态，所有这类节点一起查询
+        @param status_trees: 通过 pipeline api 获取的状态树列表
+        @return:
+        """
+        blocked = {}
+        nodes = list(status_trees)
+        while nodes:
+            node = nodes.pop()
+            if 'children' in node:
+                nodes.extend(node['children'].values())
+            elif node['state'] == states.BLOCKED:
+                blocked[node['id']] = node
+        for node_id, status_tree in pipeline_api.get_status_trees(blocked.keys(), max_depth=99).iteritems():
+            TaskFlowInstance.format_pipeline_status(status_tree)
+            blocked[node_id]['state'] = status_tree['state']
+
     def get_status(self):
         if not self.pipeline_instance.is_started:
-            return {
-                "start_time": None,
-                "state": "CREATED",
-                "retry": 0,
-                "skip": 0,
-                "finish_time": None,
-                "children": {}
-            }
+            return copy.deepcopy(CREATED_TASK_STATUS)
         status_tree = pipeline_api.get_status_tree(self.pipeline_instance.instance_id, max_depth=99)
         TaskFlowInstance.format_pipeline_status(status_tree)
         return status_tree
 
+    def get_status_changes(self, cursor=0, wait=0):
+        """
+        @summary: 增量获取任务中节点的状态变更记录，没有新的变更时最多等待 wait 秒
+        @param cursor: 上次返回的游标，为 0 时从头获取
+        @param wait: 等待时间
+        @return:
+        """
+        if not self.pipeline_instance.is_started:
+            return {'cursor': cursor, 'changes': []}
+        result = pipeline_api.get_status_changes(self.pipeline_instance.instance_id, cursor=cursor, wait=wait)
+        for change in result['changes']:
+            change['time'] = strftime_with_timezone(change.pop('created_time'))
+        return result
+
     def get_act_data(self, act_id, component_code=None, subprocess_stack=None):
         act_started = True
         result = True
@@ -410,8 +605,11 @@ class TaskFlowInstance(models.Model):
         if component_code:
             if not act_started:
                 try:
-                    instance_data = self.pipeline_instance.execution_data
-                    inputs = pipeline_parser.WebPipelineAdapter(instance_data).get_act_inputs(
+                    execution_snapshot = self.pipeline_instance.execution_snapshot
+                    inputs = pipeline_parser.WebPipelineAdapter(
+                        execution_snapshot.data,
+                        cache_key=execution_snapshot.md5sum
+                    ).get_act_inputs(
                         act_id=act_id,
                         subprocess_stack=subprocess_stack,
                         root_pipeline_data=get_pipeline_context(self.pipeline_instance, 'instance')
@@ -455,6 +653,7 @@ class TaskFlowInstance(models.Model):
             detail = pipeline_api.get_status_tree(act_id)
         except exceptions.InvalidOperationException as e:
             return {'result': False, 'message': e.message}
+        TaskFlowInstance.resolve_blocked_status([detail])
         TaskFlowInstance.format_pipeline_status(detail)
         data = self.get_act_data(act_id, component_code, subprocess_stack)
         if not data['result']:
@@ -610,25 +809,67 @@ class TaskFlowInstance(models.Model):
 
         return get_act_of_pipeline(self.pipeline_tree)
 
-    def send_message(self, msg_type, atom_node_name=''):
+    def get_act_web_names(self, act_ids):
+        """
+        @summary: 获取多个节点（包括子流程中的节点）的名称
+        @param act_ids: 节点 ID 列表
+        @return: {act_id: name}
+        """
+        act_ids = set(act_ids)
+        names = {}
+        pipelines = [self.pipeline_tree]
+        while pipelines and len(names) < len(act_ids):
+            pipeline_tree = pipelines.pop()
+            for node_id, node_info in pipeline_tree['activities'].items():
+                if node_id in act_ids:
+                    names[node_id] = node_info['name']
+                if node_info['type'] == 'SubProcess':
+                    pipelines.append(node_info['pipeline'])
+        return names
+
+    def send_message(self, msg_type, atom_node_name='', atom_node_names=None):
+        """
+        @summary: 发送任务通知
+        @param msg_type: 通知类型，atom_failed 或 task_finished
+        @param atom_node_name: 失败节点名称
+        @param atom_node_names: 失败节点名称列表，同一个任务的多个节点失败时合并成一条通知发送
+        @return:
+        """
         template = self.template
         pipeline_inst = self.pipeline_instance
         executor = pipeline_inst.executor
 
         notify_type = json.loads(template.notify_type)
+        if not notify_type:
+            return True
         receivers_list = template.get_notify_receivers_list(executor)
         receivers = ','.join(receivers_list)
 
         if msg_type == 'atom_failed':
+            atom_node_names = atom_node_names or [atom_node_name]
             title = _(u"【标准运维APP通知】执行失败")
-            content = _(u"您在【{cc_name}】业务中的任务【{task_name}】执行失败，当前失败节点是【{node_name}】，"
-                        u"操作员是【{executor}】，请前往标准运维APP({url})查看详情！").format(
-                cc_name=self.business.cc_name,
-                task_name=pipeline_inst.name,
-                node_name=atom_node_name,
-                executor=executor,
-                url=self.url
-            )
+            if len(atom_node_names) == 1:
+                content = _(u"您在【{cc_name}】业务中的任务【{task_name}】执行失败，当前失败节点是【{node_name}】，"
+                            u"操作员是【{executor}】，请前往标准运维APP({url})查看详情！").format(
+                    cc_name=self.business.cc_name,
+                    task_name=pipeline_inst.name,
+                    node_name=atom_node_names[0],
+                    executor=executor,
+                    url=self.url
+                )
+            else:
+                node_name = u"、".join(atom_node_names[:settings.NOTIFY_DIGEST_MAX_NODES])
+                if len(atom_node_names) > settings.NOTIFY_DIGEST_MAX_NODES:
+                    node_name += u"..."
+                content = _(u"您在【{cc_name}】业务中的任务【{task_name}】有{count}个节点执行失败，失败节点是【{node_name}】，"
+                            u"操作员是【{executor}】，请前往标准运维APP({url})查看详情！").format(
+                    cc_name=self.business.cc_name,
+                    task_name=pipeline_inst.name,
+                    count=len(atom_node_names),
+                    node_name=node_name,
+                    executor=executor,
+                    url=self.url
+                )
         elif msg_type == 'task_finished':
             title = _(u"【标准运维APP通知】执行完成")
             content = _(u"您在【{cc_name}】业务中的任务【{task_name}】执行成功，操作员是【{executor}】，"
@@ -686,3 +927,93 @@ class TaskFlowInstance(models.Model):
                                                                             json.dumps(result)))
 
         return True
+
+
+NOTIFY_MSG_TYPES = [
+    ('atom_failed', _(u"节点执行失败")),
+    ('task_finished', _(u"任务执行完成")),
+]
+
+NOTIFY_STATUS = [
+    ('pending', _(u"待发送")),
+    ('sending', _(u"发送中")),
+    ('sent', _(u"已发送")),
+    ('failed', _(u"发送失败")),
+]
+
+
+class TaskNotificationManager(models.Manager):
+    def record(self, taskflow, msg_type, node_id=''):
+        """
+        @summary: 记录待发送的任务通知，由独立的队列合并发送，模板未配置通知方式时不记录
+        @param taskflow: 任务
+        @param msg_type: 通知类型
+        @param node_id: 失败节点 ID
+        @return:
+        """
+        if not json.loads(taskflow.template.notify_type):
+            return None
+        return self.create(taskflow=taskflow, msg_type=msg_type, node_id=node_id)
+
+    def claim_pending(self, limit):
+        """
+        @summary: 获取待发送的通知并标记为发送中，避免被其他进程重复发送，
+                  发送中超过 NOTIFY_SEND_LEASE 的通知（发送进程异常退出）和未超过重试次数的失败通知会被重新获取
+        @param limit: 最大数量
+        @return:
+        """
+        now = timezone.now()
+        lease_expired = now - datetime.timedelta(seconds=settings.NOTIFY_SEND_LEASE)
+        retry_due = now - datetime.timedelta(seconds=settings.NOTIFY_RETRY_INTERVAL)
+        claimable = (Q(status='pending') |
+                     Q(status='sending', claim_time__lte=lease_expired) |
+                     Q(status='failed', retry_times__lte=settings.NOTIFY_MAX_RETRY_TIMES, send_time__lte=retry_due))
+        with transaction.atomic():
+            ids = list(self.select_for_update().filter(claimable).order_by('id')
+                       .values_list('id', flat=True)[:limit])
+            self.filter(id__in=ids).update(status='sending', claim_time=now)
+        return list(self.select_related('taskflow').filter(id__in=ids).order_by('id'))
+
+    def mark_finished(self, notifications, success):
+        qs = self.filter(id__in=[notification.id for notification in notifications])
+        if success:
+            qs.update(status='sent', send_time=timezone.now())
+        else:
+            qs.update(status='failed', send_time=timezone.now(), retry_times=F('retry_times') + 1)
+
+    def clean_expired(self, expire_days):
+        """
+        @summary: 删除过期的已发送和发送失败的通知
+        @param expire_days: 通知保留的天数
+        @return: 删除的通知数量
+        """
+        expire_time = timezone.now() - datetime.timedelta(days=expire_days)
+        qs = self.filter(status__in=['sent', 'failed'], create_time__lt=expire_time)
+        count = qs.count()
+        qs.delete()
+        return count
+
+
+class TaskNotification(models.Model):
+    """
+    待发送的任务通知，同一个任务的多个节点失败通知会被合并成一条发送
+    """
+    taskflow = models.ForeignKey(TaskFlowInstance, verbose_name=_(u"任务"))
+    msg_type = models.CharField(_(u"通知类型"), max_length=32, choices=NOTIFY_MSG_TYPES)
+    node_id = models.CharField(_(u"失败节点ID"), max_length=32, blank=True)
+    status = models.CharField(_(u"发送状态"), max_length=32, choices=NOTIFY_STATUS, default='pending',
+                              db_index=True)
+    create_time = models.DateTimeField(_(u"创建时间"), auto_now_add=True)
+    send_time = models.DateTimeField(_(u"发送时间"), null=True, blank=True)
+    claim_time = models.DateTimeField(_(u"开始发送时间"), null=True, blank=True)
+    retry_times = models.IntegerField(_(u"发送失败次数"), default=0)
+
+    objects = TaskNotificationManager()
+
+    def __unicode__(self):
+        return u"%s_%s" % (self.taskflow_id, self.msg_type)
+
+    class Meta:
+        verbose_name = _(u"任务通知 TaskNotification")
+        verbose_name_plural = _(u"任务通知 TaskNotification")
+        ordering = ['-id']
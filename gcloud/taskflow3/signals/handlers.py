@@ -5,12 +5,14 @@ import logging
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
-from gcloud.taskflow3.models import TaskFlowInstance
+from gcloud.taskflow3.models import TaskFlowInstance, TaskNotification
 from gcloud.taskflow3.signals import taskflow_finished
 from pipeline.models import PipelineInstance
 
 logger = logging.getLogger('celery')
 
+# 通知处理函数运行在引擎的 worker 中，只记录待发送的通知，由 notify 队列合并后发送
+
 
 @receiver(post_save, sender=PipelineInstance)
 def pipeline_post_save_handler(sender, instance, created, **kwargs):
@@ -34,10 +36,9 @@ def taskflow_node_failed_handler(sender, pipeline_instance, pipeline_activity_id
         return
 
     try:
-        activity_name = taskflow.get_act_web_info(pipeline_activity_id)['name']
-        taskflow.send_message('atom_filed', activity_name)
+        TaskNotification.objects.record(taskflow, 'atom_failed', pipeline_activity_id)
     except Exception as e:
-        logger.error('taskflow_node_failed_handler[taskflow_id=%s] send message error: %s' % (taskflow.id, e))
+        logger.error('taskflow_node_failed_handler[taskflow_id=%s] record message error: %s' % (taskflow.id, e))
     return
 
 
@@ -45,7 +46,7 @@ def taskflow_node_failed_handler(sender, pipeline_instance, pipeline_activity_id
 def taskflow_finished_handler(sender, username, **kwargs):
     try:
         taskflow = sender
-        taskflow.send_message('task_finished')
+        TaskNotification.objects.record(taskflow, 'task_finished')
     except Exception as e:
-        logger.error('taskflow_finished_handler[taskflow_id=%s] send message error: %s' % (taskflow.id, e))
+        logger.error('taskflow_finished_handler[taskflow_id=%s] record message error: %s' % (taskflow.id, e))
     return
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+import logging
+import datetime
+
+from celery.decorators import periodic_task
+
+from gcloud.conf import settings
+from gcloud.taskflow3.models import TaskNotification
+from pipeline.utils.pool import map_in_threads
+
+logger = logging.getLogger('celery')
+
+
+def send_taskflow_notifications(item):
+    """
+    @summary: 发送同一个任务的通知，多个节点失败通知合并成一条
+    @return: 发送成功的通知条数
+    """
+    taskflow, notifications = item
+    failed = [notification for notification in notifications if notification.msg_type == 'atom_failed']
+    finished = [notification for notification in notifications if notification.msg_type == 'task_finished']
+    sent = 0
+
+    if failed:
+        success = False
+        try:
+            names = taskflow.get_act_web_names([notification.node_id for notification in failed])
+            node_names = [names.get(notification.node_id, notification.node_id) for notification in failed]
+            success = taskflow.send_message('atom_failed', atom_node_names=node_names)
+        except Exception as e:
+            logger.exception(u"taskflow[id=%s] send atom_failed message error: %s" % (taskflow.id, e))
+        TaskNotification.objects.mark_finished(failed, success)
+        sent += int(bool(success))
+
+    if finished:
+        success = False
+        try:
+            success = taskflow.send_message('task_finished')
+        except Exception as e:
+            logger.exception(u"taskflow[id=%s] send task_finished message error: %s" % (taskflow.id, e))
+        TaskNotification.objects.mark_finished(finished, success)
+        sent += int(bool(success))
+
+    return sent
+
+
+@periodic_task(run_every=datetime.timedelta(seconds=settings.NOTIFY_SEND_INTERVAL), ignore_result=True)
+def send_notifications():
+    """
+    @summary: 合并发送任务通知，运行在独立的 notify 队列中，CMSI 接口缓慢时不会阻塞引擎推进流程
+    """
+    notifications = TaskNotification.objects.claim_pending(settings.NOTIFY_SEND_MAX_COUNT)
+    if not notifications:
+        return
+
+    groups = {}
+    for notification in notifications:
+        groups.setdefault(notification.taskflow_id, (notification.taskflow, []))[1].append(notification)
+    results = map_in_threads(send_taskflow_notifications, groups.values(), settings.NOTIFY_SEND_POOL_SIZE)
+    logger.info(u"taskflow notifications sent, records: %s, messages: %s" % (len(notifications), sum(results)))
+
+
+@periodic_task(run_every=datetime.timedelta(hours=1), ignore_result=True)
+def clean_notifications():
+    """
+    @summary: 清理过期的任务通知
+    """
+    count = TaskNotification.objects.clean_expired(settings.NOTIFY_EXPIRE_DAYS)
+    logger.info(u"expired taskflow notifications cleaned: %s" % count)
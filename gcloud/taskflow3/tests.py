@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+import datetime
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from gcloud.core.models import Business
+from gcloud.taskflow3 import tasks
+from gcloud.taskflow3.models import TaskFlowInstance, TaskNotification
+from pipeline.engine import states
+from pipeline.engine.models import Status, NodeRelationship, Data
+from pipeline.models import PipelineTemplate, PipelineInstance, Snapshot
+
+
+class FakeTaskFlow(object):
+    def __init__(self, success=True):
+        self.id = 1
+        self.success = success
+        self.messages = []
+
+    def get_act_web_names(self, act_ids):
+        return {act_id: 'name_%s' % act_id for act_id in act_ids if act_id != 'unknown'}
+
+    def send_message(self, msg_type, atom_node_names=None):
+        self.messages.append((msg_type, atom_node_names))
+        return self.success
+
+
+def create_taskflow():
+    business = Business.objects.create(cc_id=2, cc_name='biz', cc_owner='owner', cc_company='company')
+    snapshot, __ = Snapshot.objects.create_or_get_snapshot({})
+    template = PipelineTemplate.objects.create(template_id='1', creator='tester', snapshot=snapshot)
+    instance = PipelineInstance.objects.create(template=template, instance_id='1', snapshot=snapshot,
+                                               execution_snapshot=snapshot)
+    return TaskFlowInstance.objects.create(business=business, pipeline_instance=instance,
+                                           template_id='1', current_flow='execute_task')
+
+
+@override_settings(NOTIFY_SEND_LEASE=600, NOTIFY_MAX_RETRY_TIMES=1, NOTIFY_RETRY_INTERVAL=60)
+class TestTaskNotification(TestCase):
+    def setUp(self):
+        self.taskflow = create_taskflow()
+
+    def notify(self, msg_type, node_id=''):
+        return TaskNotification.objects.create(taskflow=self.taskflow, msg_type=msg_type, node_id=node_id)
+
+    def test_digest(self):
+        notifications = [self.notify('atom_failed', 'node_1'), self.notify('atom_failed', 'unknown'),
+                         self.notify('task_finished')]
+        taskflow = FakeTaskFlow()
+        self.assertEqual(tasks.send_taskflow_notifications((taskflow, notifications)), 2)
+        # 多个节点失败通知合并成一条，找不到名称的节点使用节点 ID
+        self.assertEqual(taskflow.messages, [('atom_failed', ['name_node_1', 'unknown']), ('task_finished', None)])
+        self.assertEqual(TaskNotification.objects.filter(status='sent').count(), 3)
+
+    def test_claim_pending(self):
+        notifications = [self.notify('atom_failed', 'node_1'), self.notify('task_finished')]
+        self.assertEqual(len(TaskNotification.objects.claim_pending(1)), 1)
+        self.assertEqual(len(TaskNotification.objects.claim_pending(10)), 1)
+        self.assertEqual(TaskNotification.objects.claim_pending(10), [])
+
+        # 发送进程退出后，租期过期的通知会被重新获取
+        TaskNotification.objects.filter(id=notifications[0].id).update(
+            claim_time=timezone.now() - datetime.timedelta(seconds=601))
+        self.assertEqual([n.id for n in TaskNotification.objects.claim_pending(10)], [notifications[0].id])
+
+    def test_retry_failed(self):
+        notification = self.notify('task_finished')
+        tasks.send_taskflow_notifications((FakeTaskFlow(success=False), [notification]))
+        notification = TaskNotification.objects.get()
+        self.assertEqual((notification.status, notification.retry_times), ('failed', 1))
+        self.assertEqual(TaskNotification.objects.claim_pending(10), [])
+
+        # 到达重试间隔后重试，超过最大重试次数后不再发送
+        last_send_time = timezone.now() - datetime.timedelta(seconds=61)
+        TaskNotification.objects.update(send_time=last_send_time)
+        notifications = TaskNotification.objects.claim_pending(10)
+        self.assertEqual(len(notifications), 1)
+        TaskNotification.objects.mark_finished(notifications, False)
+        TaskNotification.objects.update(send_time=last_send_time)
+        self.assertEqual(TaskNotification.objects.claim_pending(10), [])
+        self.assertEqual(TaskNotification.objects.get().retry_times, 2)
+
+    def test_clean_expired(self):
+        sent = self.notify('task_finished')
+        pending = self.notify('task_finished')
+        TaskNotification.objects.mark_finished([sent], True)
+        TaskNotification.objects.update(create_time=timezone.now() - datetime.timedelta(days=8))
+        self.assertEqual(TaskNotification.objects.clean_expired(7), 1)
+        self.assertEqual([n.id for n in TaskNotification.objects.all()], [pending.id])
+
+
+class TestActDetail(TestCase):
+    def setUp(self):
+        self.taskflow = create_taskflow()
+        # act -> sub -> sub_act，嵌套子流程中的节点执行失败
+        for node_id, state in [('act', states.BLOCKED), ('sub', states.BLOCKED), ('sub_act', states.FAILED)]:
+            Status.objects.create(id=node_id, state=state, version='v')
+        NodeRelationship.objects.build_relationship('act', 'act')
+        NodeRelationship.objects.build_relationship('act', 'sub')
+        NodeRelationship.objects.build_relationship('sub', 'sub_act')
+        Data.objects.create(id='act', inputs={}, outputs={}, ex_data='')
+
+    def test_nested_subprocess_failed(self):
+        result = self.taskflow.get_act_detail('act')
+        self.assertTrue(result['result'])
+        detail = result['data']
+        self.assertEqual(detail['state'], states.FAILED)
+        # 超过查询深度的子流程根据其后代节点的状态展示为失败
+        self.assertEqual(detail['children']['sub']['state'], states.FAILED)
+        self.assertEqual(detail['children']['sub']['children'], {})
@@ -9,6 +9,7 @@ urlpatterns = [
     url(r'^execute/(?P<biz_cc_id>\d+)/$', views.execute),
 
     url(r'^api/status/(?P<biz_cc_id>\d+)/$', api.status),
+    url(r'^api/status_changes/(?P<biz_cc_id>\d+)/$', api.status_changes),
     url(r'^api/clone/(?P<biz_cc_id>\d+)/$', api.task_clone),
     url(r'^api/action/(?P<action>\w+)/(?P<biz_cc_id>\d+)/$', api.task_action),
 
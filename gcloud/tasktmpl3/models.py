@@ -30,12 +30,25 @@ def get_permission_list():
 
 def replace_template_id(pipeline_data, reverse=False):
     activities = pipeline_data[PE.activities]
-    for act_id, act in activities.iteritems():
-        if act['type'] == PE.SubProcess:
-            if not reverse:
-                act['template_id'] = TaskTemplate.objects.get(pk=act['template_id']).pipeline_template.template_id
-            else:
-                act['template_id'] = str(TaskTemplate.objects.get(pipeline_template__template_id=act['template_id']).pk)
+    subprocess_acts = [act for act in activities.itervalues() if act['type'] == PE.SubProcess]
+    if not subprocess_acts:
+        return
+    template_ids = set([act['template_id'] for act in subprocess_acts])
+    # 一次查询获取所有子流程的模板 ID 映射
+    if not reverse:
+        id_map = {str(pk): template_id for pk, template_id in
+                  TaskTemplate.objects.filter(pk__in=template_ids, pipeline_template__isnull=False)
+                                      .values_list('pk', 'pipeline_template__template_id')}
+    else:
+        id_map = {template_id: str(pk) for template_id, pk in
+                  TaskTemplate.objects.filter(pipeline_template__template_id__in=template_ids)
+                                      .values_list('pipeline_template__template_id', 'pk')}
+    for act in subprocess_acts:
+        try:
+            act['template_id'] = id_map[str(act['template_id'])]
+        except KeyError:
+            raise TaskTemplate.DoesNotExist('TaskTemplate referred by SubProcess[template_id=%s] does not exist' %
+                                            act['template_id'])
 
 
 class TaskTemplateManager(models.Manager):
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 import itertools
 
+from django.core.cache import cache
 from django.db import transaction
 from django.http import HttpResponseForbidden
 from django.test import RequestFactory
@@ -15,9 +16,12 @@ from guardian.shortcuts import (assign_perm,
 
 from common.log import logger
 
+from gcloud.conf import settings
 from gcloud.core.roles import CC_PERSON_GROUP, CC_ROLES
 from gcloud.core.utils import get_business_obj
 
+CACHE_PREFIX = __name__.replace('.', '_')
+
 
 @transaction.atomic
 def assign_tmpl_perms(request, perms, groups, tmpl_inst):
@@ -70,15 +74,20 @@ def get_notify_group_by_biz_core(biz_cc_id):
     return notify_group_list
 
 
-def get_notify_receivers(username, biz_cc_id, receiver_group, more_receiver):
+def get_business_role_members(username, biz_cc_id, roles):
     """
-    @summary: 根据通知分组和附加通知人获取最终通知人
+    @summary: 获取业务下各角色的人员，按照业务和角色缓存，缓存全部命中时不再请求 CC
     @param username: 请求人
     @param biz_cc_id: 业务CC ID
-    @param receiver_group: 通知分组
-    @param more_receiver: 附加通知人
-    @return:
+    @param roles: 角色列表
+    @return: {role: [member]}
     """
+    roles = [role for role in roles if role in CC_ROLES]
+    keys = dict((role, "%s_role_members_%s_%s" % (CACHE_PREFIX, biz_cc_id, role)) for role in CC_ROLES)
+    cached = cache.get_many([keys[role] for role in roles])
+    if len(cached) == len(roles):
+        return dict((role, cached[keys[role]]) for role in roles)
+
     # produce a request on backend
     request = RequestFactory().get('/')
     User = get_user_model()
@@ -87,6 +96,21 @@ def get_notify_receivers(username, biz_cc_id, receiver_group, more_receiver):
 
     biz_info, __, role_info = get_business_obj(request, biz_cc_id,
                                                use_maintainer=True)
+    # ESB组件接口返回的人员信息，多个人是用;分隔的
+    members = dict((role, [name for name in (role_info.get(role) or '').split(';') if name]) for role in CC_ROLES)
+    cache.set_many(dict((keys[role], members[role]) for role in CC_ROLES), settings.NOTIFY_RECEIVER_CACHE_TIME)
+    return dict((role, members[role]) for role in roles)
+
+
+def get_notify_receivers(username, biz_cc_id, receiver_group, more_receiver):
+    """
+    @summary: 根据通知分组和附加通知人获取最终通知人
+    @param username: 请求人
+    @param biz_cc_id: 业务CC ID
+    @param receiver_group: 通知分组
+    @param more_receiver: 附加通知人
+    @return:
+    """
     notify_receivers = [username]
     if not isinstance(receiver_group, list):
         receiver_group = receiver_group.split(',')
@@ -94,12 +118,9 @@ def get_notify_receivers(username, biz_cc_id, receiver_group, more_receiver):
         if more_receiver.strip():
             more_receiver = more_receiver.strip().split(',')
             notify_receivers += more_receiver
-    for group in receiver_group:
-        if group in CC_ROLES:
-            role_members = role_info.get(group, '')
-            if role_members:
-                # ESB组件接口返回的人员信息，多个人是用;分隔的
-                notify_receivers += role_members.split(';')
+    role_members = get_business_role_members(username, biz_cc_id, receiver_group)
+    for members in role_members.values():
+        notify_receivers += members
     notify_receivers = list(set(notify_receivers))
     return notify_receivers
 
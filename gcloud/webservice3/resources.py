@@ -307,9 +307,22 @@ class TaskTemplateResource(GCloudModelResource):
         attribute='template_id',
         readonly=True,
         null=True)
+    node_count = fields.IntegerField(
+        attribute='pipeline_template__node_count',
+        readonly=True,
+        null=True)
+    constant_keys = fields.CharField(
+        attribute='pipeline_template__constant_keys',
+        readonly=True,
+        null=True)
+    form_keys = fields.CharField(
+        attribute='pipeline_template__form_keys',
+        readonly=True,
+        null=True)
 
     class Meta:
-        queryset = TaskTemplate.objects.filter(pipeline_template__isnull=False, is_deleted=False)
+        queryset = TaskTemplate.objects.select_related('pipeline_template', 'business')\
+                                       .filter(pipeline_template__isnull=False, is_deleted=False)
         resource_name = 'template'
         authorization = GCloudGenericAuthorization()
         always_return_data = True
@@ -589,9 +602,22 @@ class TaskFlowInstanceResource(GCloudModelResource):
         use_in='detail',
         readonly=True,
         null=True)
+    node_count = fields.IntegerField(
+        attribute='pipeline_instance__node_count',
+        readonly=True,
+        null=True)
+    constant_keys = fields.CharField(
+        attribute='pipeline_instance__constant_keys',
+        readonly=True,
+        null=True)
+    form_keys = fields.CharField(
+        attribute='pipeline_instance__form_keys',
+        readonly=True,
+        null=True)
 
     class Meta:
-        queryset = TaskFlowInstance.objects.filter(pipeline_instance__isnull=False, is_deleted=False)
+        queryset = TaskFlowInstance.objects.select_related('pipeline_instance', 'business')\
+                                           .filter(pipeline_instance__isnull=False, is_deleted=False)
         resource_name = 'taskflow'
         authorization = TaskflowAuthorization()
         always_return_data = True
@@ -1,10 +1,13 @@
 # -*- coding: utf-8 -*-
 import copy
+import re
 
 from pipeline.exceptions import ConstantNotExistException, ConstantReferenceException
 from pipeline.core.data.var import CONSTANT_EXP, get_data_reference, resolve_data
 from pipeline.utils.graph import Graph
 
+KEY_EXP = r'^%s$' % CONSTANT_EXP
+
 
 class ConstantPool(object):
 
@@ -12,6 +15,8 @@ class ConstantPool(object):
         assert isinstance(pool, dict)
         self.raw_pool = pool
         self.pool = None
+        self.standard_keys = False
+        self._maps = {}
 
         if not lazy:
             self.resolve()
@@ -34,7 +39,39 @@ class ConstantPool(object):
         if trace:
             raise ConstantReferenceException('Exist circle reference between constants: %s' % '->'.join(trace))
 
-        # resolve the constants reference
+        # key 不是 ${xxx} 形式时可能被其他变量以字符串替换的方式引用，无法按引用关系渲染
+        self.standard_keys = all(re.match(KEY_EXP, key) for key in self.raw_pool)
+        if self.standard_keys:
+            self.pool = self._resolve_by_reference(refs)
+        else:
+            self.pool = self._resolve_by_round()
+        self._maps = {key: info['value'] for key, info in self.pool.iteritems()}
+
+    def _resolve_by_reference(self, refs):
+        """
+        @summary: 按引用关系的拓扑序渲染，每个变量只拷贝、渲染一次
+        """
+        pool = {}
+        for root in self.raw_pool:
+            if root in pool:
+                continue
+            stack = [root]
+            while stack:
+                key = stack[-1]
+                unresolved = [ref for ref in refs[key] if ref not in pool]
+                if unresolved:
+                    stack.extend(unresolved)
+                    continue
+                stack.pop()
+                if key in pool:
+                    continue
+                info = copy.deepcopy(self.raw_pool[key])
+                if refs[key]:
+                    info['value'] = resolve_data(info['value'], {ref: pool[ref]['value'] for ref in refs[key]})
+                pool[key] = info
+        return pool
+
+    def _resolve_by_round(self):
         pool = {}
         temp_pool = copy.deepcopy(self.raw_pool)
         # get those constants which are referenced only(not refer other constants)
@@ -50,8 +87,7 @@ class ConstantPool(object):
                 pool[ref] = temp_pool[ref]
                 temp_pool.pop(ref)
             referenced_only = ConstantPool._get_referenced_only(temp_pool)
-
-        self.pool = pool
+        return pool
 
     @staticmethod
     def _get_referenced_only(pool):
@@ -81,6 +117,9 @@ class ConstantPool(object):
         if not self.pool:
             self.resolve()
 
-        maps = {key: self.pool[key]['value'] for key in self.pool}
-
+        if self.standard_keys:
+            # 只用 val 引用到的变量渲染，避免每个值都遍历整个变量池
+            maps = {key: self._maps[key] for key in get_data_reference(CONSTANT_EXP, val) if key in self._maps}
+        else:
+            maps = self._maps
         return resolve_data(val, maps)
@@ -71,16 +71,18 @@ class NotifyService(Service):
             data.set_outputs('ex_data', msg)
             return False
 
-        for t in notify_type:
-            kwargs = self._args_gen[t](self, receivers, title, content)
-            result = getattr(client.cmsi, self._send_func[t])(kwargs)
-
-            if not result['result']:
-                data.set_outputs('ex_data', result['message'])
-                return False
+        # 各通知渠道并发发送，某个渠道失败时其他渠道仍会发送
+        calls = [(getattr(client.cmsi, self._send_func[t]), self._args_gen[t](self, receivers, title, content))
+                 for t in notify_type]
+        results = client.batch_call(calls)
+        failed_messages = [send_result['message'] for send_result in results if not send_result['result']]
+        if failed_messages:
+            data.set_outputs('ex_data', '\n'.join(failed_messages))
+            return False
 
-            code = result['code']
-            message = result['message']
+        for send_result in results:
+            code = send_result['code']
+            message = send_result['message']
 
         data.set_outputs('code', code)
         data.set_outputs('message', message)
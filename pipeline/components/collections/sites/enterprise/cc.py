@@ -10,6 +10,7 @@ from pipeline.conf import settings
 from pipeline.core.flow.activity import Service
 from pipeline.component_framework.component import Component
 from pipeline.components.utils import get_ip_by_regex
+from pipeline.components.host_index import host_index
 
 logger = logging.getLogger('celery')
 
@@ -28,38 +29,34 @@ def cc_handle_api_error(api_name, params, error):
     return message
 
 
+def cc_batch_call(client, api_name, kwargs_list):
+    """
+    @summary: 并发调用配置平台的同一个接口，单个调用失败不影响其他调用
+    @param client: ESB client
+    @param api_name: 接口名称
+    @param kwargs_list: 每次调用的参数
+    @return: 所有失败调用的错误信息，全部成功时为空字符串
+    """
+    api = getattr(client.cc, api_name)
+    results = client.batch_call([(api, kwargs) for kwargs in kwargs_list])
+    messages = [cc_handle_api_error('cc.%s' % api_name, kwargs, result['message'])
+                for kwargs, result in zip(kwargs_list, results) if not result['result']]
+    return '\n'.join(messages)
+
+
 def cc_get_host_id_by_innerip(executor, bk_biz_id, ip_list):
     """
-    获取主机ID
+    获取主机ID，优先从业务主机索引中获取，索引中不存在的IP实时查询
     :param executor:
     :param bk_biz_id:
     :param ip_list:
     :return: [1, 2, 3] id列表
     """
-    cc_kwargs = {
-        'bk_biz_id': bk_biz_id,
-        'ip': {
-            'data': ip_list,
-            'exact': 1,
-            'flag': 'bk_host_innerip'
-        },
-        'condition': [
-            {
-                'bk_obj_id': 'host',
-                'fields': ['bk_host_id', 'bk_host_innerip']
-            }
-        ],
-    }
-
-    client = get_client_by_user(executor)
-    client.set_bk_api_ver('v2')
-    cc_result = client.cc.search_host(cc_kwargs)
+    host_result = host_index.get_hosts(executor, bk_biz_id, ip_list)
+    if not host_result['result']:
+        return host_result
 
-    if not cc_result['result']:
-        message = cc_handle_api_error('cc.search_host', cc_kwargs, cc_result['message'])
-        return {'result': False, 'message': message}
-
-    ip_to_id = {item['host']['bk_host_innerip']: str(item['host']['bk_host_id']) for item in cc_result['data']['info']}
+    ip_to_id = {ip: str(host['bk_host_id']) for ip, host in host_result['data'].items()}
     host_id_list = []
     invalid_ip_list = []
     for ip in ip_list:
@@ -155,6 +152,8 @@ class CCTransferHostModuleService(Service):
             "is_increment": cc_is_increment
         }
         cc_result = client.cc.transfer_host_module(cc_kwargs)
+        # 转移模块不会更新主机的 last_time，增量刷新无法发现，部分失败时也可能已有主机被修改
+        host_index.invalidate(biz_cc_id)
         if cc_result['result']:
             return True
         else:
@@ -231,6 +230,7 @@ class CCUpdateHostService(Service):
             }
         }
         cc_result = client.cc.update_host(cc_kwargs)
+        host_index.invalidate(biz_cc_id)
         if cc_result['result']:
             return True
         else:
@@ -261,22 +261,19 @@ class CCReplaceFaultMachineService(Service):
 
         cc_hosts = data.get_one_of_inputs('cc_host_replace_detail')
 
-        # 克隆属性
-        clone_kwargs = {
-            "bk_biz_id": biz_cc_id
-        }
-        fault_machine = []
-        for item in cc_hosts:
-            clone_kwargs.update({"bk_org_ip": item['cc_fault_ip'].strip()})
-            clone_kwargs.update({"bk_dst_ip": item['cc_new_ip'].strip()})
-            # 克隆主机属性会自动把主机移动到对应模块
-            clone_result = client.cc.clone_host_property(clone_kwargs)
-            if not clone_result['result']:
-                message = cc_handle_api_error('cc.clone_host_property', clone_kwargs, clone_result['message'])
-                data.set_outputs('ex_data', message)
-                return False
+        # 克隆属性，克隆主机属性会自动把主机移动到对应模块
+        clone_kwargs_list = [{
+            "bk_biz_id": biz_cc_id,
+            "bk_org_ip": item['cc_fault_ip'].strip(),
+            "bk_dst_ip": item['cc_new_ip'].strip(),
+        } for item in cc_hosts]
+        message = cc_batch_call(client, 'clone_host_property', clone_kwargs_list)
+        host_index.invalidate(biz_cc_id)
+        if message:
+            data.set_outputs('ex_data', message)
+            return False
 
-            fault_machine.append(item['cc_fault_ip'].strip())
+        fault_machine = [item['cc_fault_ip'].strip() for item in cc_hosts]
 
         # 将故障机上交至故障机模块
         host_result = cc_get_host_id_by_innerip(executor, biz_cc_id, fault_machine)
@@ -289,6 +286,7 @@ class CCReplaceFaultMachineService(Service):
             "bk_host_id": [int(host_id) for host_id in host_result['data']],
         }
         cc_result = client.cc.transfer_host_to_faultmodule(to_fault_module_kwargs)
+        host_index.invalidate(biz_cc_id)
         if cc_result['result']:
             return True
         else:
@@ -320,18 +318,15 @@ class CCEmptySetHostsService(Service):
             setattr(client, 'language', parent_data.get_one_of_inputs('language'))
 
         cc_set_select = data.get_one_of_inputs('cc_set_select')
-        for set_id in cc_set_select:
-            cc_kwargs = {
-                "bk_biz_id": biz_cc_id,
-                "bk_set_id": set_id,
-            }
-            cc_result = client.cc.transfer_sethost_to_idle_module(cc_kwargs)
-            if not cc_result['result']:
-                message = cc_handle_api_error('cc.transfer_sethost_to_idle_module',
-                                              cc_kwargs,
-                                              cc_result['message'])
-                data.set_outputs('ex_data', message)
-                return False
+        cc_kwargs_list = [{
+            "bk_biz_id": biz_cc_id,
+            "bk_set_id": set_id,
+        } for set_id in cc_set_select]
+        message = cc_batch_call(client, 'transfer_sethost_to_idle_module', cc_kwargs_list)
+        host_index.invalidate(biz_cc_id)
+        if message:
+            data.set_outputs('ex_data', message)
+            return False
         return True
 
     def outputs_format(self):
@@ -362,6 +357,7 @@ class CCBatchDeleteSetService(Service):
             }
         }
         cc_result = client.cc.batch_delete_set(cc_kwargs)
+        host_index.invalidate(biz_cc_id)
         if not cc_result['result']:
             message = cc_handle_api_error('cc.batch_delete_set',
                                           cc_kwargs,
@@ -392,21 +388,17 @@ class CCUpdateSetServiceStatusService(Service):
             setattr(client, 'language', parent_data.get_one_of_inputs('language'))
 
         cc_set_select = data.get_one_of_inputs('cc_set_select')
-        for set_id in cc_set_select:
-            cc_kwargs = {
-                "bk_biz_id": biz_cc_id,
-                "bk_set_id": set_id,
-                "data": {
-                    "bk_service_status": data.get_one_of_inputs('cc_set_status')
-                }
+        cc_kwargs_list = [{
+            "bk_biz_id": biz_cc_id,
+            "bk_set_id": set_id,
+            "data": {
+                "bk_service_status": data.get_one_of_inputs('cc_set_status')
             }
-            cc_result = client.cc.update_set(cc_kwargs)
-            if not cc_result['result']:
-                message = cc_handle_api_error('cc.update_set',
-                                              cc_kwargs,
-                                              cc_result['message'])
-                data.set_outputs('ex_data', message)
-                return False
+        } for set_id in cc_set_select]
+        message = cc_batch_call(client, 'update_set', cc_kwargs_list)
+        if message:
+            data.set_outputs('ex_data', message)
+            return False
         return True
 
     def outputs_format(self):
@@ -480,21 +472,18 @@ class CCUpdateSetService(Service):
         else:
             cc_set_prop_value = data.get_one_of_inputs('cc_set_prop_value')
 
-        for set_id in cc_set_select:
-            cc_kwargs = {
-                "bk_biz_id": biz_cc_id,
-                "bk_set_id": set_id,
-                "data": {
-                    cc_set_property: cc_set_prop_value
-                }
+        cc_kwargs_list = [{
+            "bk_biz_id": biz_cc_id,
+            "bk_set_id": set_id,
+            "data": {
+                cc_set_property: cc_set_prop_value
             }
-            cc_result = client.cc.update_set(cc_kwargs)
-            if not cc_result['result']:
-                message = cc_handle_api_error('cc.update_set',
-                                              cc_kwargs,
-                                              cc_result['message'])
-                data.set_outputs('ex_data', message)
-                return False
+        } for set_id in cc_set_select]
+        message = cc_batch_call(client, 'update_set', cc_kwargs_list)
+        host_index.invalidate(biz_cc_id)
+        if message:
+            data.set_outputs('ex_data', message)
+            return False
         return True
 
     def outputs_format(self):
@@ -544,22 +533,19 @@ class CCUpdateModuleService(Service):
         else:
             cc_module_prop_value = data.get_one_of_inputs('cc_module_prop_value')
 
-        for module_id in cc_module_select:
-            cc_kwargs = {
-                "bk_biz_id": biz_cc_id,
-                "bk_set_id": get_module_set_id(tree_data['data'], module_id),
-                "bk_module_id": module_id,
-                "data": {
-                    cc_module_property: cc_module_prop_value
-                }
+        cc_kwargs_list = [{
+            "bk_biz_id": biz_cc_id,
+            "bk_set_id": get_module_set_id(tree_data['data'], module_id),
+            "bk_module_id": module_id,
+            "data": {
+                cc_module_property: cc_module_prop_value
             }
-            cc_result = client.cc.update_module(cc_kwargs)
-            if not cc_result['result']:
-                message = cc_handle_api_error('cc.update_module',
-                                              cc_kwargs,
-                                              cc_result['message'])
-                data.set_outputs('ex_data', message)
-                return False
+        } for module_id in cc_module_select]
+        message = cc_batch_call(client, 'update_module', cc_kwargs_list)
+        host_index.invalidate(biz_cc_id)
+        if message:
+            data.set_outputs('ex_data', message)
+            return False
         return True
 
     def outputs_format(self):
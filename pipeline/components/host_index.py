@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+"""
+业务主机索引：按用户和业务缓存 IP 到主机 ID、集群、模块的映射，供配置平台相关原子和 IP 选择器使用
+    - 索引按用户区分，每个用户只能查到自己有权限的主机
+    - 查询时优先使用索引，索引中不存在的 IP 实时查询配置平台并写回索引
+    - 最近使用过的索引由周期任务定时增量刷新（last_time 晚于上次刷新时间的主机），并按更长的间隔全量刷新
+    - 主机转移模块等不会更新 last_time，修改主机、集群、模块的原子执行后调用 invalidate 使该业务的所有索引失效
+"""
+from __future__ import absolute_import
+
+import time
+import uuid
+import logging
+import datetime
+import threading
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.utils.translation import ugettext_lazy as _
+
+from blueapps.utils.esbclient import get_client_by_user
+from pipeline.conf import settings
+from pipeline.utils.pool import map_in_threads
+
+logger = logging.getLogger('root')
+
+HOST_FIELDS = ['bk_host_id', 'bk_host_innerip', 'bk_cloud_id']
+SET_FIELDS = ['bk_set_id', 'bk_set_name']
+MODULE_FIELDS = ['bk_module_id', 'bk_module_name', 'bk_set_id']
+
+# 增量刷新时向前多查询的时间(单位s)，避免主机更新时间和刷新时间交错时漏掉主机
+INCREMENTAL_OVERLAP = 60
+# 业务访问时间的最小更新间隔(单位s)
+TOUCH_INTERVAL = 60
+
+
+def format_host(item):
+    """
+    @summary: 将 cc.search_host 返回的主机信息转换为索引中的格式
+    """
+    host = item['host']
+    cloud_id = host.get('bk_cloud_id') or 0
+    # 部分版本的配置平台以关联实例列表的形式返回云区域
+    if isinstance(cloud_id, list):
+        cloud_id = cloud_id[0]['bk_inst_id'] if cloud_id else 0
+    return {
+        'bk_host_id': host['bk_host_id'],
+        'bk_host_innerip': host['bk_host_innerip'],
+        'bk_cloud_id': cloud_id,
+        'bk_set': [{'bk_set_id': _set['bk_set_id'], 'bk_set_name': _set['bk_set_name']}
+                   for _set in item.get('set', [])],
+        'bk_module': [{'bk_module_id': module['bk_module_id'],
+                       'bk_module_name': module['bk_module_name'],
+                       'bk_set_id': module.get('bk_set_id')}
+                      for module in item.get('module', [])],
+    }
+
+
+def merge_hosts(hosts, new_hosts):
+    merged = dict(hosts)
+    merged.update(new_hosts)
+    return merged
+
+
+class HostIndex(object):
+    active_key = 'pipeline_host_index_active_users'
+
+    def __init__(self):
+        # 当前进程中最近使用的索引 {缓存键: (index, hosts)}，索引版本不变时不需要重新从缓存中加载，
+        # 最多保留 PIPELINE_HOST_INDEX_LOCAL_SIZE 个
+        self._loaded = OrderedDict()
+        self._loaded_lock = threading.Lock()
+        self._touched = {}
+
+    @staticmethod
+    def _generation_key(biz_cc_id):
+        return 'pipeline_host_index_generation_%s' % biz_cc_id
+
+    def _generation(self, biz_cc_id):
+        """
+        @summary: 业务当前的索引代数，invalidate 后生成新的代数，旧代数的索引不再被读取；
+                  代数被缓存淘汰时同样生成新的代数，不会读到失效前的索引
+        """
+        key = self._generation_key(biz_cc_id)
+        generation = cache.get(key)
+        if generation is None:
+            cache.add(key, uuid.uuid4().hex, None)
+            generation = cache.get(key)
+        return generation
+
+    def _key(self, username, biz_cc_id):
+        return 'pipeline_host_index_%s_%s_%s' % (biz_cc_id, self._generation(biz_cc_id), username)
+
+    @staticmethod
+    def _version_key(key):
+        return '%s_version' % key
+
+    def search_hosts(self, username, biz_cc_id, ip_list=None, since=None):
+        """
+        @summary: 实时查询配置平台中的主机
+        @param username: 调用接口的用户
+        @param biz_cc_id: 业务ID
+        @param ip_list: 只查询这些 IP，为空时查询业务下所有主机
+        @param since: 只查询在该时间戳之后更新过的主机
+        @return: {'result': True, 'data': {ip: host}}
+        """
+        host_condition = {'bk_obj_id': 'host', 'fields': HOST_FIELDS}
+        if since:
+            host_condition['condition'] = [{
+                'field': 'last_time',
+                'operator': '$gte',
+                'value': datetime.datetime.fromtimestamp(since).strftime('%Y-%m-%d %H:%M:%S')
+            }]
+        cc_kwargs = {
+            'bk_biz_id': biz_cc_id,
+            'condition': [
+                host_condition,
+                {'bk_obj_id': 'set', 'fields': SET_FIELDS},
+                {'bk_obj_id': 'module', 'fields': MODULE_FIELDS},
+            ],
+        }
+        if ip_list:
+            cc_kwargs['ip'] = {
+                'data': ip_list,
+                'exact': 1,
+                'flag': 'bk_host_innerip'
+            }
+
+        client = get_client_by_user(username)
+        client.set_bk_api_ver('v2')
+        page_size = settings.PIPELINE_HOST_INDEX_PAGE_SIZE
+        cc_kwargs['page'] = {'start': 0, 'limit': page_size}
+        cc_result = client.cc.search_host(cc_kwargs)
+        results = [cc_result]
+        # 其余分页并发查询
+        if cc_result['result'] and cc_result['data']['count'] > page_size:
+            calls = []
+            for start in xrange(page_size, cc_result['data']['count'], page_size):
+                page_kwargs = dict(cc_kwargs, page={'start': start, 'limit': page_size})
+                calls.append((client.cc.search_host, page_kwargs))
+            results.extend(client.batch_call(calls))
+
+        hosts = {}
+        for result in results:
+            if not result['result']:
+                message = _(u"查询配置平台(CMDB)的业务[app_id=%s]接口cc.search_host返回失败: %s") % (
+                    biz_cc_id, result['message'])
+                logger.error(message)
+                return {'result': False, 'message': message}
+            for item in result['data']['info']:
+                host = format_host(item)
+                # 多IP主机的每个IP都可以定位到该主机
+                for ip in host['bk_host_innerip'].split(','):
+                    hosts[ip] = host
+        return {'result': True, 'data': hosts}
+
+    def _get_loaded(self, key):
+        with self._loaded_lock:
+            loaded = self._loaded.pop(key, None)
+            if loaded is not None:
+                self._loaded[key] = loaded
+            return loaded
+
+    def _set_loaded(self, key, index, hosts):
+        with self._loaded_lock:
+            self._loaded.pop(key, None)
+            self._loaded[key] = (index, hosts)
+            while len(self._loaded) > settings.PIPELINE_HOST_INDEX_LOCAL_SIZE:
+                self._loaded.popitem(last=False)
+
+    def load(self, username, biz_cc_id):
+        """
+        @summary: 获取用户在业务下的主机索引
+        @return: (索引信息, {ip: host})，索引不存在时返回 (None, {})
+        """
+        key = self._key(username, biz_cc_id)
+        version = cache.get(self._version_key(key))
+        if version is None:
+            return None, {}
+        loaded = self._get_loaded(key)
+        if loaded and loaded[0]['version'] == version:
+            return loaded
+        index = cache.get(key)
+        if not index or index['version'] != version:
+            return None, {}
+        hosts = index.pop('hosts')
+        self._set_loaded(key, index, hosts)
+        return index, hosts
+
+    def save(self, username, biz_cc_id, index, hosts):
+        key = self._key(username, biz_cc_id)
+        index = dict(index, version=uuid.uuid4().hex)
+        timeout = settings.PIPELINE_HOST_INDEX_TIMEOUT
+        cache.set(key, dict(index, hosts=hosts), timeout)
+        cache.set(self._version_key(key), index['version'], timeout)
+        self._set_loaded(key, index, hosts)
+
+    def invalidate(self, biz_cc_id):
+        """
+        @summary: 使业务下所有用户的索引失效，主机、集群、模块发生变化后调用
+        """
+        cache.set(self._generation_key(biz_cc_id), uuid.uuid4().hex, None)
+
+    def touch(self, username, biz_cc_id):
+        """
+        @summary: 记录用户最近一次访问业务索引的时间，周期任务只刷新最近访问过的索引
+        """
+        now = time.time()
+        if now - self._touched.get((username, biz_cc_id), 0) < TOUCH_INTERVAL:
+            return
+        self._touched[(username, biz_cc_id)] = now
+        active = cache.get(self.active_key) or {}
+        active[(username, biz_cc_id)] = now
+        cache.set(self.active_key, active, None)
+
+    def refresh(self, username, biz_cc_id, full=False):
+        """
+        @summary: 刷新用户在业务下的主机索引，索引不完整或距上次全量刷新超过 PIPELINE_HOST_INDEX_FULL_REFRESH_INTERVAL 时全量刷新
+        @param username: 调用接口的用户
+        @param biz_cc_id: 业务ID
+        @param full: 是否强制全量刷新
+        @return: {'result': True, 'data': {ip: host}}
+        """
+        now = time.time()
+        index, hosts = self.load(username, biz_cc_id)
+        full = full or not index or not index['complete'] or \
+            now - index['full_refresh_time'] >= settings.PIPELINE_HOST_INDEX_FULL_REFRESH_INTERVAL
+
+        if full:
+            result = self.search_hosts(username, biz_cc_id)
+            if not result['result']:
+                return result
+            hosts = result['data']
+            index = {'complete': True, 'full_refresh_time': now}
+        else:
+            result = self.search_hosts(username, biz_cc_id, since=index['refresh_time'] - INCREMENTAL_OVERLAP)
+            if not result['result']:
+                return result
+            hosts = merge_hosts(hosts, result['data'])
+
+        index['refresh_time'] = now
+        self.save(username, biz_cc_id, index, hosts)
+        return {'result': True, 'data': hosts}
+
+    def get_hosts(self, username, biz_cc_id, ip_list):
+        """
+        @summary: 根据 IP 获取主机信息，索引中不存在的 IP 实时查询配置平台
+        @param username: 调用接口的用户
+        @param biz_cc_id: 业务ID
+        @param ip_list: IP 列表
+        @return: {'result': True, 'data': {ip: host}}，不属于该业务的 IP 不在结果中
+        """
+        self.touch(username, biz_cc_id)
+        index, hosts = self.load(username, biz_cc_id)
+        found = {}
+        missing = []
+        for ip in ip_list:
+            if ip in hosts:
+                found[ip] = hosts[ip]
+            else:
+                missing.append(ip)
+        if not missing:
+            return {'result': True, 'data': found}
+
+        result = self.search_hosts(username, biz_cc_id, ip_list=missing)
+        if not result['result']:
+            return result
+        if result['data']:
+            # 新增的主机写回索引，尚未建立索引时记录为不完整的索引，由周期任务补全
+            index = index or {'complete': False, 'full_refresh_time': 0, 'refresh_time': time.time()}
+            self.save(username, biz_cc_id, index, merge_hosts(hosts, result['data']))
+        found.update(result['data'])
+        return {'result': True, 'data': found}
+
+    def get_all_hosts(self, username, biz_cc_id):
+        """
+        @summary: 获取业务下的所有主机，索引不完整时全量刷新
+        @return: {'result': True, 'data': {ip: host}}
+        """
+        self.touch(username, biz_cc_id)
+        index, hosts = self.load(username, biz_cc_id)
+        if index and index['complete']:
+            return {'result': True, 'data': hosts}
+        return self.refresh(username, biz_cc_id, full=True)
+
+    def refresh_active(self):
+        """
+        @summary: 以各自用户的权限刷新最近 PIPELINE_HOST_INDEX_ACTIVE_TIME 内访问过的索引
+        @return: 刷新成功的索引数量
+        """
+        now = time.time()
+        active = cache.get(self.active_key) or {}
+        active = {key: access_time for key, access_time in active.items()
+                  if now - access_time < settings.PIPELINE_HOST_INDEX_ACTIVE_TIME}
+        cache.set(self.active_key, active, None)
+
+        def refresh(key):
+            username, biz_cc_id = key
+            try:
+                return self.refresh(username, biz_cc_id)['result']
+            except Exception:
+                logger.exception(u"refresh host index of user[%s] biz[%s] error" % (username, biz_cc_id))
+                return False
+
+        return sum(map_in_threads(refresh, active.keys(), settings.PIPELINE_HOST_INDEX_REFRESH_POOL_SIZE))
+
+
+host_index = HostIndex()
@@ -1,98 +1,102 @@
 # -*- coding: utf-8 -*-
+from __future__ import absolute_import
 import json
 import re
 import logging
+from collections import namedtuple
 
-from django.core.cache import cache
 from django.utils.translation import ugettext_lazy as _
 
 from blueapps.utils.esbclient import get_client_by_user
 from pipeline.conf import settings
+from pipeline.components.host_index import host_index
+from pipeline.exceptions import ComponentApiException
 
 
-ip_re = r'(([12][0-9][0-9]|[1-9][0-9]|[0-9])\.){3,3}' \
-        r'([12][0-9][0-9]|[1-9][0-9]|[0-9])'
-ip_pattern = re.compile(ip_re)
+ip_pattern = re.compile(r'(?:(?:[12][0-9][0-9]|[1-9][0-9]|[0-9])\.){3}(?:[12][0-9][0-9]|[1-9][0-9]|[0-9])')
+# 一次扫描同时匹配 IP、平台ID:IP、集群名称|模块名称|IP 三种格式，集群和模块名称可以是中文字符或者其他字符
+ip_token_pattern = re.compile(
+    ur'(?:(?P<set_name>[\u4e00-\u9fa5\w]+)\|(?P<module_name>[\u4e00-\u9fa5\w]+)\||(?P<plat_id>\d+):)?'
+    ur'(?P<ip>' + ip_pattern.pattern + ur')'
+)
+
+IPToken = namedtuple('IPToken', 'ip plat_id set_name module_name')
 
 logger = logging.getLogger('root')
 
 
 def get_ip_by_regex(ip_str):
-    ip_str = "%s" % ip_str
-    ret = []
-    for match in ip_pattern.finditer(ip_str):
-        ret.append(match.group())
-    return ret
+    return ip_pattern.findall("%s" % ip_str)
 
 
-def cc_get_ips_info_by_str(username, biz_cc_id, ip_str):
+def iter_ip_tokens(ip_str, unique=True):
     """
-    @summary: 从ip_str中匹配出IP信息
-    @param username
-    @param biz_cc_id
-    @param ip_str
-    @note: 需要兼容的ip_str格式有
-        1： IP，IP  这种纯IP格式需要保证IP在业务中唯一，否则报错（需要注意一个IP
-            属于多个集群的情况，要根据平台和IP共同判断是否是同一个IP）
-        2： 集群名称|模块名称|IP，集群名称|模块名称|IP  这种格式可以唯一定位到一
-            个IP（如果业务把相同IP放到同一模块，还是有问题）
-        3： 平台ID:IP，平台ID:IP  这种格式可以唯一定位到一个IP，主要是兼容Job组件
-            传参需要和获取Job作业模板步骤参数
-    @return: {'result': True or False, 'data': [{'InnerIP': ,'HostID': ,
-        'Source': , 'SetID': , 'SetName': , 'ModuleID': , 'ModuleName': },{}]}
+    @summary: 逐个解析 ip_str 中的 IP，每种格式只需要扫描一次输入
+    @param ip_str: 包含 IP、平台ID:IP、集群名称|模块名称|IP 的字符串，多种格式可以混合
+    @param unique: 是否去掉重复的项
+    @return: IPToken 生成器，plat_id、set_name、module_name 在对应格式中才有值
     """
-    plat_ip_reg = re.compile(r'\d+:' + ip_re)
-    set_module_ip_reg = re.compile(
-        ur'[\u4e00-\u9fa5\w]+\|[\u4e00-\u9fa5\w]+\|' + ip_re
-    )  # 中文字符或者其他字符
-    ip_input_list = get_ip_by_regex(ip_str)
-    ip_result = []
-    # 如果是格式2，可以返回IP的集群、模块、平台信息
-    if set_module_ip_reg.match(ip_str):
-        set_module_ip = []
-        for match in set_module_ip_reg.finditer(ip_str):
-            set_module_ip.append(match.group())
-
-        ip_list = cc_get_ip_list_by_biz_and_user(username,
-                                                 biz_cc_id)
-        for _ip in ip_list:
-            if '%s|%s|%s' % (_ip['SetName'],
-                             _ip['ModuleName'],
-                             _ip['InnerIP']) in set_module_ip:
-                ip_result.append({'InnerIP': _ip['InnerIP'],
-                                  'HostID': _ip['HostID'],
-                                  'Source': _ip['Source'],
-                                  'SetID': _ip['SetID'],
-                                  'SetName': _ip['SetName'],
-                                  'ModuleID': _ip['ModuleID'],
-                                  'ModuleName': _ip['ModuleName'],
-                                  })
+    seen = set()
+    for match in ip_token_pattern.finditer(ip_str if isinstance(ip_str, basestring) else "%s" % ip_str):
+        token = IPToken(match.group('ip'), match.group('plat_id'),
+                        match.group('set_name'), match.group('module_name'))
+        if unique:
+            if token in seen:
+                continue
+            seen.add(token)
+        yield token
 
-    # 如果是格式3，返回IP的平台信息
-    elif plat_ip_reg.match(ip_str):
-        plat_ip = []
-        for match in plat_ip_reg.finditer(ip_str):
-            plat_ip.append(match.group())
 
-        ip_list = cc_get_ip_list_by_biz_and_user(username,
-                                                 biz_cc_id)
-        for _ip in ip_list:
-            if '%s:%s' % (_ip['Source'], _ip['InnerIP']) in plat_ip:
-                ip_result.append({'InnerIP': _ip['InnerIP'],
-                                  'HostID': _ip['HostID'],
-                                  'Source': _ip['Source'],
-                                  })
+def iter_ip_batches(ip_str, batch_size):
+    """
+    @summary: 按批次返回 ip_str 中去重后的 IP，供需要分批调用接口的原子流式处理大量 IP
+    @param ip_str: 同 iter_ip_tokens
+    @param batch_size: 每批的 IP 数量
+    @return: IP 列表生成器
+    """
+    seen = set()
+    batch = []
+    for token in iter_ip_tokens(ip_str, unique=False):
+        if token.ip in seen:
+            continue
+        seen.add(token.ip)
+        batch.append(token.ip)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
-    else:
-        ip = []
-        for match in ip_pattern.finditer(ip_str):
-            ip.append(match.group())
-
-        ip_list = cc_get_ip_list_by_biz_and_user(username,
-                                                 biz_cc_id)
-        host_id_list = []
-        for _ip in ip_list:
-            if _ip['InnerIP'] in ip and _ip['HostID'] not in host_id_list:
+
+def match_ips_info(tokens, ip_list):
+    """
+    @summary: 在业务主机列表中查找 tokens 对应的主机
+    @param tokens: IPToken 列表
+    @param ip_list: cc_get_ip_list_by_biz_and_user 返回的业务主机列表
+    @return: 同 cc_get_ips_info_by_str
+    """
+    plain_ips = set()
+    plat_ips = set()
+    set_module_ips = set()
+    input_ips = set()
+    for token in tokens:
+        input_ips.add(token.ip)
+        if token.set_name:
+            set_module_ips.add((token.set_name, token.module_name, token.ip))
+        elif token.plat_id:
+            plat_ips.add((unicode(token.plat_id), token.ip))
+        else:
+            plain_ips.add(token.ip)
+
+    ip_result = []
+    # 纯IP和平台ID:IP格式每台主机只返回一次，集群名称|模块名称|IP 格式每个模块返回一次
+    host_id_set = set()
+    set_module_host_set = set()
+    for _ip in ip_list:
+        if set_module_ips and (_ip['SetName'], _ip['ModuleName'], _ip['InnerIP']) in set_module_ips:
+            key = (_ip['HostID'], _ip['SetName'], _ip['ModuleName'])
+            if key not in set_module_host_set:
+                set_module_host_set.add(key)
                 ip_result.append({'InnerIP': _ip['InnerIP'],
                                   'HostID': _ip['HostID'],
                                   'Source': _ip['Source'],
@@ -100,11 +104,28 @@ def cc_get_ips_info_by_str(username, biz_cc_id, ip_str):
                                   'SetName': _ip['SetName'],
                                   'ModuleID': _ip['ModuleID'],
                                   'ModuleName': _ip['ModuleName'],
-                })
-                host_id_list.append(_ip['HostID'])
+                                  })
+        if _ip['HostID'] in host_id_set:
+            continue
+        if _ip['InnerIP'] in plain_ips:
+            host_id_set.add(_ip['HostID'])
+            ip_result.append({'InnerIP': _ip['InnerIP'],
+                              'HostID': _ip['HostID'],
+                              'Source': _ip['Source'],
+                              'SetID': _ip['SetID'],
+                              'SetName': _ip['SetName'],
+                              'ModuleID': _ip['ModuleID'],
+                              'ModuleName': _ip['ModuleName'],
+                              })
+        elif plat_ips and (unicode(_ip['Source']), _ip['InnerIP']) in plat_ips:
+            host_id_set.add(_ip['HostID'])
+            ip_result.append({'InnerIP': _ip['InnerIP'],
+                              'HostID': _ip['HostID'],
+                              'Source': _ip['Source'],
+                              })
 
-    valid_ip = [_ip['InnerIP'] for _ip in ip_result]
-    invalid_ip = list(set(ip_input_list) - set(valid_ip))
+    valid_ip = set([_ip['InnerIP'] for _ip in ip_result])
+    invalid_ip = list(input_ips - valid_ip)
     result = {
         'result': True,
         'ip_result': ip_result,
@@ -114,35 +135,62 @@ def cc_get_ips_info_by_str(username, biz_cc_id, ip_str):
     return result
 
 
-def cc_get_ip_list_by_biz_and_user(username, biz_cc_id):
+def cc_get_ips_info_by_str(username, biz_cc_id, ip_str, raise_exception=False):
+    """
+    @summary: 从ip_str中匹配出IP信息
+    @param username
+    @param biz_cc_id
+    @param ip_str
+    @param raise_exception: 查询配置平台失败时抛出 ComponentApiException，否则按没有匹配到主机处理
+    @note: 需要兼容的ip_str格式有
+        1： IP，IP  这种纯IP格式需要保证IP在业务中唯一，否则报错（需要注意一个IP
+            属于多个集群的情况，要根据平台和IP共同判断是否是同一个IP）
+        2： 集群名称|模块名称|IP，集群名称|模块名称|IP  这种格式可以唯一定位到一
+            个IP（如果业务把相同IP放到同一模块，还是有问题）
+        3： 平台ID:IP，平台ID:IP  这种格式可以唯一定位到一个IP，主要是兼容Job组件
+            传参需要和获取Job作业模板步骤参数
+        多种格式可以混合使用，每一项按照自身的格式匹配
+    @return: {'result': True or False, 'data': [{'InnerIP': ,'HostID': ,
+        'Source': , 'SetID': , 'SetName': , 'ModuleID': , 'ModuleName': },{}]}
+    """
+    tokens = list(iter_ip_tokens(ip_str))
+    ip_list = cc_get_ip_list_by_biz_and_user(username, biz_cc_id, raise_exception) if tokens else []
+    return match_ips_info(tokens, ip_list)
+
+
+def cc_get_ip_list_by_biz_and_user(username, biz_cc_id, raise_exception=False):
     """
     @summary：根据当前用户和业务ID获取IP
-    @note: 由于获取了全业务IP，接口会比较慢，需要加缓存
+    @note: 数据来自业务主机索引，不需要每次都查询全业务主机
     @note: 由于存在单主机多IP问题，需要取第一个IP作为实际值
+    @note: 主机属于多个模块时每个模块返回一条记录
     @param-username
     @param-biz_cc_id
+    @param-raise_exception: 查询失败时抛出 ComponentApiException，否则返回空列表
 
     """
-    cache_key = "cc_get_ip_list_by_biz_and_user_%s_%s" % (username, biz_cc_id)
-    data = cache.get(cache_key)
-    if not data:
-        client = get_client_by_user(username)
-        cc_result = client.cc.get_app_host_list({
-            'app_id': biz_cc_id
-        })
-        if cc_result['result']:
-            data = cc_result['data']
-            # 多IP主机处理，取第一个IP
-            for ip in data:
-                if ',' in ip['InnerIP']:
-                    ip['InnerIP'] = ip['InnerIP'].split(',')[0]
-            cache.set(cache_key, data, 60)
-        else:
-            logger.warning((u"get_app_host_list ERROR###biz_cc_id=%s"
-                            u"###cc_result=%s") % (biz_cc_id,
-                                                   json.dumps(cc_result)))
-    if not data:
+    host_result = host_index.get_all_hosts(username, biz_cc_id)
+    if not host_result['result']:
+        logger.warning((u"cc_get_ip_list_by_biz_and_user ERROR###biz_cc_id=%s"
+                        u"###message=%s") % (biz_cc_id, host_result['message']))
+        if raise_exception:
+            raise ComponentApiException(host_result['message'])
         return []
+
+    data = []
+    hosts = {host['bk_host_id']: host for host in host_result['data'].values()}
+    for host in hosts.values():
+        set_names = {_set['bk_set_id']: _set['bk_set_name'] for _set in host['bk_set']}
+        for module in host['bk_module']:
+            data.append({
+                'InnerIP': host['bk_host_innerip'].split(',')[0],
+                'HostID': host['bk_host_id'],
+                'Source': host['bk_cloud_id'],
+                'SetID': module['bk_set_id'],
+                'SetName': set_names.get(module['bk_set_id'], ''),
+                'ModuleID': module['bk_module_id'],
+                'ModuleName': module['bk_module_name'],
+            })
     return data
 
 
@@ -181,13 +229,14 @@ def cc_get_role_users(username, biz_cc_id, user_roles, more_users=''):
 
 
 def cc_get_ips_by_set_and_module(username, biz_cc_id, set_id_list, set_name_list,
-                                 module_name_list):
+                                 module_name_list, raise_exception=False):
     """
     @summary: 根据集群名和模块名获取IP
     :param username:
     :param biz_cc_id:
     :param set_name_list:
     :param module_name_list:
+    :param raise_exception: 查询配置平台失败时抛出 ComponentApiException，否则返回空列表
     :return:
     """
     client = get_client_by_user(username)
@@ -206,7 +255,8 @@ def cc_get_ips_by_set_and_module(username, biz_cc_id, set_id_list, set_name_list
         else:
             set_id_list = cc_get_set_ids_by_names(username,
                                                   biz_cc_id,
-                                                  set_name_list)
+                                                  set_name_list,
+                                                  raise_exception)
             if not set_id_list:
                 return []
 
@@ -225,15 +275,18 @@ def cc_get_ips_by_set_and_module(username, biz_cc_id, set_id_list, set_name_list
     else:
         logger.warning(u"client.cc.get_hosts_by_property ERROR###biz_cc_id=%s"
                        u"###cc_result=%s" % (biz_cc_id, json.dumps(cc_result)))
+        if raise_exception:
+            raise ComponentApiException(cc_result['message'])
     return result
 
 
-def cc_get_set_ids_by_names(username, biz_cc_id, set_names):
+def cc_get_set_ids_by_names(username, biz_cc_id, set_names, raise_exception=False):
     """
     @summary: 根据集群名称查询业务在配置平台的集群ID
     :param username:
     :param biz_cc_id:
     :param set_names:
+    :param raise_exception: 查询配置平台失败时抛出 ComponentApiException，否则按没有集群处理
     :return:
     """
     client = get_client_by_user(username)
@@ -244,6 +297,8 @@ def cc_get_set_ids_by_names(username, biz_cc_id, set_names):
     else:
         logger.warning(u"client.cc.get_sets_by_property ERROR###biz_cc_id=%s"
                        u"###cc_result=%s" % (biz_cc_id, json.dumps(cc_result)))
+        if raise_exception:
+            raise ComponentApiException(cc_result['message'])
     cc_set_names = [_set['SetName'] for _set in cc_sets]
     # 列表格式
     if isinstance(set_names, list):
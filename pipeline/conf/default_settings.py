@@ -17,3 +17,47 @@ pipeline default settings
 PIPELINE_TEMPLATE_CONTEXT = ''
 PIPELINE_INSTANCE_CONTEXT = ''
 PIPELINE_ENGINE_ADAPTER_API = 'pipeline.service.pipeline_engine_adapter.adapter_api'
+
+# compiled pipeline cache, keyed by md5sum of execution snapshot
+#   PIPELINE_PARSER_CACHE_SIZE: max count of validated and formatted pipeline trees kept in each process
+#   PIPELINE_PARSER_INPUTS_CACHE_TIMEOUT: seconds to keep resolved inputs of not started activities
+PIPELINE_PARSER_CACHE_SIZE = 256
+PIPELINE_PARSER_INPUTS_CACHE_TIMEOUT = 60
+
+# decoded snapshot data cache, keyed by md5sum of snapshot, used when unfolding subprocess
+#   PIPELINE_SNAPSHOT_CACHE_SIZE: max count of snapshots kept in each process
+PIPELINE_SNAPSHOT_CACHE_SIZE = 512
+
+# threads used to parse pipeline trees when starting pipeline instances in batch
+PIPELINE_BATCH_START_POOL_SIZE = 4
+
+# node state change feed, polled incrementally with a cursor instead of fetching the whole status tree
+#   PIPELINE_STATUS_CHANGE_LIMIT: max count of changes returned by each request
+#   PIPELINE_STATUS_CHANGE_MAX_WAIT: max seconds a long poll request waits for new changes
+#   PIPELINE_STATUS_CHANGE_POLL_INTERVAL: seconds between two checks while waiting
+#   PIPELINE_STATUS_CHANGE_SAFE_LAG: seconds a change is held back before it is returned, changes are
+#     recorded in concurrent transactions which may commit out of id order
+#   PIPELINE_STATUS_CHANGE_EXPIRE_DAYS: days to keep changes, older ones are removed periodically
+#   PIPELINE_STATUS_CHANGE_CLEAN_INTERVAL: seconds between two cleanups
+PIPELINE_STATUS_CHANGE_LIMIT = 500
+PIPELINE_STATUS_CHANGE_MAX_WAIT = 30
+PIPELINE_STATUS_CHANGE_POLL_INTERVAL = 0.5
+PIPELINE_STATUS_CHANGE_SAFE_LAG = 1
+PIPELINE_STATUS_CHANGE_EXPIRE_DAYS = 7
+PIPELINE_STATUS_CHANGE_CLEAN_INTERVAL = 60 * 60
+
+# per user and business index of hosts, used by cmdb atoms and ip picker to resolve ip to host id, set and module
+#   PIPELINE_HOST_INDEX_TIMEOUT: seconds to keep an index in cache
+#   PIPELINE_HOST_INDEX_REFRESH_INTERVAL: seconds between two incremental refreshes of recently used indexes
+#   PIPELINE_HOST_INDEX_FULL_REFRESH_INTERVAL: seconds between two full refreshes of an index
+#   PIPELINE_HOST_INDEX_ACTIVE_TIME: indexes not used in this many seconds are no longer refreshed
+#   PIPELINE_HOST_INDEX_REFRESH_POOL_SIZE: indexes refreshed concurrently
+#   PIPELINE_HOST_INDEX_PAGE_SIZE: hosts fetched by each cc.search_host request
+#   PIPELINE_HOST_INDEX_LOCAL_SIZE: indexes kept in the memory of each process, least recently used ones are dropped
+PIPELINE_HOST_INDEX_TIMEOUT = 86400
+PIPELINE_HOST_INDEX_REFRESH_INTERVAL = 60
+PIPELINE_HOST_INDEX_FULL_REFRESH_INTERVAL = 600
+PIPELINE_HOST_INDEX_ACTIVE_TIME = 3600
+PIPELINE_HOST_INDEX_REFRESH_POOL_SIZE = 4
+PIPELINE_HOST_INDEX_PAGE_SIZE = 500
+PIPELINE_HOST_INDEX_LOCAL_SIZE = 20
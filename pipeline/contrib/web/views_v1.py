@@ -247,9 +247,11 @@ def form_for_activity(form):
     except:
         subprocess_stack = form['subprocess_stack']
         act_id = form['act_id']
-        instance_data = PipelineInstance.objects.get(instance_id=form['instance_id']).execution_data
-        inputs = pipeline_parser.WebPipelineAdapter(instance_data).get_act_inputs(act_id=act_id,
-                                                                                  subprocess_stack=subprocess_stack)
+        execution_snapshot = PipelineInstance.objects.get(instance_id=form['instance_id']).execution_snapshot
+        inputs = pipeline_parser.WebPipelineAdapter(
+            execution_snapshot.data,
+            cache_key=execution_snapshot.md5sum
+        ).get_act_inputs(act_id=act_id, subprocess_stack=subprocess_stack)
         outputs = {}
 
     component = library.ComponentLibrary.get_component_class(form['component_code'])
@@ -11,7 +11,8 @@ from tastypie.validation import FormValidation
 from tastypie.exceptions import ImmediateHttpResponse
 
 from pipeline import exceptions
-from pipeline.models import PipelineTemplate, Snapshot, PipelineInstance, unfold_subprocess, TemplateScheme
+from pipeline.models import (PipelineTemplate, Snapshot, PipelineInstance, unfold_subprocess, TemplateScheme,
+                             get_snapshot_summary)
 from pipeline.utils.graph import Graph
 from pipeline.utils.uniqid import uniqid, node_uniqid
 from pipeline.component_framework.models import ComponentModel
@@ -40,12 +41,21 @@ class PipelineSerializer(Serializer):
 
 
 class SnapshotResource(ModelResource):
+    # raw_data 中的子流程可能以引用形式保存，对外返回展开后的 data
+    data = fields.DictField(attribute='data', readonly=True)
+
     class Meta:
         queryset = Snapshot.objects.all()
+        excludes = ['raw_data']
 
 
 class PipelineTemplateResource(ModelResource):
-    data = fields.ForeignKey(SnapshotResource, 'snapshot')
+    data = fields.ForeignKey(SnapshotResource, 'snapshot', use_in='detail')
+    # 列表中只返回流程树的摘要，不读取快照数据
+    node_count = fields.IntegerField(attribute='node_count', readonly=True)
+    subprocess_template_ids = fields.CharField(attribute='subprocess_template_ids', readonly=True)
+    constant_keys = fields.CharField(attribute='constant_keys', readonly=True)
+    form_keys = fields.CharField(attribute='form_keys', readonly=True)
 
     class Meta:
         queryset = PipelineTemplate.objects.filter(is_deleted=False)
@@ -86,6 +96,8 @@ class PipelineTemplateResource(ModelResource):
         self.gateway_validate(bundle, data)
 
         bundle.obj.snapshot, _ = Snapshot.objects.create_or_get_snapshot(data)
+        for key, value in get_snapshot_summary(data).iteritems():
+            setattr(bundle.obj, key, value)
         bundle.data.pop('data')
         return super(PipelineTemplateResource, self).obj_update(bundle, skip_errors=skip_errors, **kwargs)
 
@@ -102,6 +114,7 @@ class PipelineTemplateResource(ModelResource):
         snapshot, _ = Snapshot.objects.create_or_get_snapshot(data)
         kwargs['snapshot_id'] = snapshot.id
         kwargs['template_id'] = node_uniqid()
+        kwargs.update(get_snapshot_summary(data))
         # must pop data field after the creation of snapshot is finished.
         bundle.data.pop('data')
 
@@ -114,7 +127,6 @@ class PipelineTemplateResource(ModelResource):
     def alter_list_data_to_serialize(self, request, data):
         for bundle in data['objects']:
             bundle.data.pop('id')
-            bundle.data.pop('data')
             bundle.data.pop('description')
 
         return data
@@ -155,9 +167,14 @@ class PipelineTemplateResource(ModelResource):
 
 
 class PipelineInstanceResource(ModelResource):
-    data = fields.ForeignKey(SnapshotResource, 'snapshot')
-    exec_data = fields.ForeignKey(SnapshotResource, 'execution_snapshot')
+    data = fields.ForeignKey(SnapshotResource, 'snapshot', use_in='detail')
+    exec_data = fields.ForeignKey(SnapshotResource, 'execution_snapshot', use_in='detail')
     template = fields.ForeignKey(PipelineTemplateResource, 'template')
+    # 列表中只返回流程树的摘要，不读取快照数据
+    node_count = fields.IntegerField(attribute='node_count', readonly=True)
+    subprocess_template_ids = fields.CharField(attribute='subprocess_template_ids', readonly=True)
+    constant_keys = fields.CharField(attribute='constant_keys', readonly=True)
+    form_keys = fields.CharField(attribute='form_keys', readonly=True)
 
     pop_keys = ['is_deleted', 'edit_time', 'create_time', 'snapshot', 'template', 'is_finished', 'is_started',
                 'finish_time', 'start_time', 'instance_id', 'execution_snapshot']
@@ -192,8 +209,6 @@ class PipelineInstanceResource(ModelResource):
 
     def alter_list_data_to_serialize(self, request, data):
         for bundle in data['objects']:
-            bundle.data.pop('data')
-            bundle.data.pop('exec_data')
             bundle.data.pop('description')
             bundle.data.pop('template')
 
@@ -221,14 +236,15 @@ class PipelineInstanceResource(ModelResource):
                                    'instances', 'exec_data', _(u"JSON 格式不合法"))
 
         # unfold subprocess
-        unfold_subprocess(exec_data)
+        subprocess_refs = unfold_subprocess(exec_data)
         instance_id = node_uniqid()
         exec_data['id'] = instance_id
-        exec_snapshot, _ = Snapshot.objects.create_or_get_snapshot(exec_data)
+        exec_snapshot, _ = Snapshot.objects.create_or_get_snapshot(exec_data, subprocess_refs)
         kwargs['template_id'] = template.id
         kwargs['instance_id'] = instance_id
         kwargs['snapshot_id'] = template.snapshot.id
         kwargs['execution_snapshot_id'] = exec_snapshot.id
+        kwargs.update(get_snapshot_summary(exec_data))
         bundle.data.pop('exec_data')
         return super(PipelineInstanceResource, self).obj_create(bundle, **kwargs)
 
@@ -240,7 +256,10 @@ class PipelineInstanceResource(ModelResource):
             raise_validation_error(self, bundle,
                                    'instances', 'exec_data', _(u"JSON 格式不合法"))
 
-        bundle.obj.execution_snapshot, _ = Snapshot.objects.create_or_get_snapshot(data)
+        subprocess_refs = bundle.obj.execution_snapshot.subprocess_refs if bundle.obj.execution_snapshot else None
+        bundle.obj.execution_snapshot, _ = Snapshot.objects.create_or_get_snapshot(data, subprocess_refs)
+        for key, value in get_snapshot_summary(data).iteritems():
+            setattr(bundle.obj, key, value)
         bundle.data.pop('exec_data')
         bundle.data.pop('data')
         return super(PipelineInstanceResource, self).obj_update(bundle, skip_errors=skip_errors, **kwargs)
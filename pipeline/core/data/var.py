@@ -1,7 +1,11 @@
 import re
 import copy
+import json
+import hashlib
 from abc import abstractmethod
 
+from django.core.cache import cache
+
 from pipeline.core.data.context import OutputRef
 from pipeline import exceptions
 from pipeline.models import VariableModel
@@ -92,10 +96,12 @@ class SpliceVariable(Variable):
     def __init__(self, name, value, context):
         super(SpliceVariable, self).__init__(name, value)
         self._value = None
+        self._resolved = False
         self._build_reference(context)
 
     def get(self):
-        if not self._value:
+        # variables pickled by older versions have no _resolved attribute
+        if not getattr(self, '_resolved', False):
             self._resolve()
         return self._value
 
@@ -119,6 +125,7 @@ class SpliceVariable(Variable):
         val = resolve_data(self.value, maps)
 
         self._value = val
+        self._resolved = True
 
 
 class LazyVariableMeta(type):
@@ -154,15 +161,58 @@ class LazyVariableMeta(type):
 class LazyVariable(SpliceVariable):
     __metaclass__ = LazyVariableMeta
 
+    # seconds to share the value among pipelines with the same code, resolved value and cache_scope, 0 to disable
+    cache_ttl = 0
+    # keys of pipeline_data which get_value depends on, such as biz_cc_id
+    cache_scope = ()
+
     def __init__(self, name, value, context, pipeline_data):
         super(LazyVariable, self).__init__(name, value, context)
         self.context = context
         self.pipeline_data = pipeline_data
+        self._memo = None
+
+    def __getstate__(self):
+        # the memo only lives in memory, a retried node always computes the value again
+        state = self.__dict__.copy()
+        state['_memo'] = None
+        return state
 
     # variable reference resolve
     def get(self):
         self.value = super(LazyVariable, self).get()
-        return self.get_value()
+
+        # the value is computed once in a pipeline, until the resolved value changes;
+        # get_value raises instead of returning when it fails, so only successful values are memoized
+        memo_key = self._memo_key()
+        memo = getattr(self, '_memo', None)
+        if memo_key is not None and memo and memo[0] == memo_key:
+            return copy.deepcopy(memo[1])
+
+        shared_key = None
+        if self.cache_ttl and memo_key is not None:
+            shared_key = 'pipeline_lazy_variable_%s' % hashlib.md5(memo_key).hexdigest()
+            cached = cache.get(shared_key)
+            # value is wrapped in a tuple so that None and other falsy values can be cached
+            if cached is not None:
+                self._memo = (memo_key, cached[0])
+                return copy.deepcopy(cached[0])
+
+        value = self.get_value()
+        if memo_key is not None:
+            self._memo = (memo_key, copy.deepcopy(value))
+        if shared_key:
+            cache.set(shared_key, (value,), self.cache_ttl)
+        return value
+
+    def _memo_key(self):
+        scope = [self.pipeline_data.get(key) for key in self.cache_scope] if self.pipeline_data else []
+        try:
+            # use the standard encoder explicitly, json.dumps may be patched to stringify unknown objects
+            return json.dumps([self.code, self.value, scope], sort_keys=True, cls=json.JSONEncoder)
+        except (TypeError, ValueError):
+            # value can not be serialized, do not memoize
+            return None
 
     # get real value by user code
     @abstractmethod
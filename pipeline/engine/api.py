@@ -1,12 +1,21 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import
+import time
 import functools
 
+from django.db import transaction
+from django.db.models import Q
+
+from pipeline.conf import settings
 from pipeline.core.flow.activity import ServiceActivity
 from pipeline.core.flow.gateway import ExclusiveGateway, ParallelGateway
 from pipeline.engine import states, exceptions
 from pipeline.engine.models import (Status, PipelineModel, PipelineProcess, NodeRelationship, ScheduleService,
-                                    Data, SubProcessRelationship, ProcessCeleryTask, History, FunctionSwitch)
+                                    Data, SubProcessRelationship, ProcessCeleryTask, History, FunctionSwitch,
+                                    StatusChange)
+
+# max count of nodes whose status trees are fetched by one set of queries
+STATUS_TREE_CHUNK_SIZE = 500
 
 
 def _node_existence_check(func):
@@ -49,6 +58,28 @@ def start_pipeline(pipeline_instance):
     PipelineModel.objects.pipeline_ready(process_id=process.id)
 
 
+@_frozen_check
+def start_pipelines(pipeline_instances):
+    """
+    start pipelines in batch, prepare all of them first and then send ready signals together,
+    nothing is prepared if any of them fails to prepare
+    :param pipeline_instances:
+    :return:
+    """
+
+    process_ids = []
+    with transaction.atomic():
+        Status.objects.batch_prepare_for_pipelines(pipeline_instances)
+        for pipeline_instance in pipeline_instances:
+            process = PipelineProcess.objects.prepare_for_pipeline(pipeline_instance)
+            PipelineModel.objects.prepare_for_pipeline(pipeline_instance, process)
+            process_ids.append(process.id)
+
+    for process_id in process_ids:
+        PipelineModel.objects.pipeline_ready(process_id=process_id)
+    return True
+
+
 @_frozen_check
 def pause_pipeline(pipeline_id):
     """
@@ -263,33 +294,80 @@ def get_status_tree(node_id, max_depth=1):
     :param max_depth:
     :return:
     """
-    rel_qs = NodeRelationship.objects.filter(ancestor_id=node_id, distance__lte=max_depth)
-    if not rel_qs.exists():
+    status_trees = get_status_trees([node_id], max_depth=max_depth)
+    if node_id not in status_trees:
         raise exceptions.InvalidOperationException('node(%s) does not exist, may have not by executed' % node_id)
-    descendants = map(lambda rel: rel.descendant_id, rel_qs)
-    # remove root node
-    descendants.remove(node_id)
-
-    rel_qs = NodeRelationship.objects.filter(descendant_id__in=descendants, distance=1)
-    targets = map(lambda rel: rel.descendant_id, rel_qs)
-
-    root_status = Status.objects.filter(id=node_id).values().first()
-    status_qs = Status.objects.filter(id__in=targets).values()
-    status_map = {s['id']: s for s in status_qs}
-    status_map[node_id] = root_status
+    return status_trees[node_id]
 
-    relationships = [(s.ancestor_id, s.descendant_id) for s in rel_qs]
-    for (parent_id, child_id) in relationships:
-        if parent_id not in status_map:
-            return
 
-        parent_status = status_map[parent_id]
-        child_status = status_map[child_id]
-        child_status.setdefault('children', {})
-
-        parent_status.setdefault('children', {}).setdefault(child_id, child_status)
+def get_status_trees(node_ids, max_depth=1):
+    """
+    get state and children states for many nodes, the query count does not depend on the size of trees
+    nodes deeper than max_depth are not loaded, and nodes at max_depth have no children key
+    :param node_ids:
+    :param max_depth:
+    :return: {node_id: status tree}, nodes not exist are not included
+    """
+    status_trees = {}
+    node_ids = list(node_ids)
+    for i in xrange(0, len(node_ids), STATUS_TREE_CHUNK_SIZE):
+        status_trees.update(_get_status_trees(node_ids[i:i + STATUS_TREE_CHUNK_SIZE], max_depth))
+    return status_trees
+
+
+def _get_status_trees(node_ids, max_depth):
+    children_map = {}
+    status_qs = Status.objects.filter(id__in=node_ids)
+    if max_depth > 0:
+        descendants = NodeRelationship.objects.filter(ancestor_id__in=node_ids, distance__gte=1,
+                                                      distance__lte=max_depth).values('descendant_id')
+        rel_qs = NodeRelationship.objects.filter(descendant_id__in=descendants, distance=1)
+        for parent_id, child_id in rel_qs.values_list('ancestor_id', 'descendant_id'):
+            children_map.setdefault(parent_id, []).append(child_id)
+        status_qs = Status.objects.filter(Q(id__in=node_ids) | Q(id__in=descendants))
+    status_map = {s['id']: s for s in status_qs.values()}
+
+    def build(node_id, depth):
+        status = dict(status_map[node_id])
+        if depth < max_depth:
+            children = status['children'] = {}
+            for child_id in children_map.get(node_id, []):
+                if child_id in status_map:
+                    children[child_id] = build(child_id, depth + 1)
+        return status
+
+    return {node_id: build(node_id, 0) for node_id in node_ids if node_id in status_map}
+
+
+def get_status_changes(node_id, cursor=0, wait=0):
+    """
+    get state changes of a node and all its descendants after cursor,
+    wait at most wait seconds for new changes if there is none,
+    changes newer than PIPELINE_STATUS_CHANGE_SAFE_LAG seconds are held back
+    so the cursor never skips a change whose transaction commits later
+    :param node_id:
+    :param cursor: id of the last change client received, 0 means from the beginning
+    :param wait: seconds to wait, 0 means return immediately
+    :return: {'cursor': cursor for next request, 'changes': [change]}
+    """
+    wait = min(wait, settings.PIPELINE_STATUS_CHANGE_MAX_WAIT)
+    # a finished pipeline will not change any more
+    if wait > 0 and Status.objects.state_for(node_id, may_not_exist=True) in states.ARCHIVED_STATES:
+        wait = 0
+
+    deadline = time.time() + wait
+    while True:
+        changes = StatusChange.objects.changes_for(node_id, cursor,
+                                                   limit=settings.PIPELINE_STATUS_CHANGE_LIMIT,
+                                                   lag=settings.PIPELINE_STATUS_CHANGE_SAFE_LAG)
+        if changes or time.time() >= deadline:
+            break
+        time.sleep(settings.PIPELINE_STATUS_CHANGE_POLL_INTERVAL)
 
-    return status_map[node_id]
+    return {
+        'cursor': changes[-1]['id'] if changes else cursor,
+        'changes': changes
+    }
 
 
 def activity_callback(activity_id, callback_data):
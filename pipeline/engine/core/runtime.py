@@ -4,6 +4,8 @@ import logging
 import contextlib
 import traceback
 
+from django.db import transaction
+
 from pipeline.engine import states
 from pipeline.engine.models import Status, NodeRelationship, FunctionSwitch
 from pipeline.engine.core.handlers import FLOW_NODE_HANDLERS
@@ -59,9 +61,14 @@ def run_loop(process):
                 process.freeze()
                 return
 
-            # try to transit current node to running state
-            if not Status.objects.transit(id=current_node.id, to_state=states.RUNNING, start=True,
-                                          name=str(current_node.__class__)):
+            # try to transit current node to running state and build relationship in one transaction,
+            # so that the state change of a new node is visible together with its relationship
+            with transaction.atomic():
+                transited = Status.objects.transit(id=current_node.id, to_state=states.RUNNING, start=True,
+                                                   name=str(current_node.__class__))
+                if transited:
+                    NodeRelationship.objects.build_relationship(process.top_pipeline.id, current_node.id)
+            if not transited:
                 logger.info('can not transit node(%s) to running, pipeline(%s) turn to sleep.' % (
                     current_node.id, process.root_pipeline.id))
                 process.sleep(adjust_status=True)
@@ -69,9 +76,6 @@ def run_loop(process):
 
             # refresh current node
             process.refresh_current_node(current_node.id)
-
-            # build relationship
-            NodeRelationship.objects.build_relationship(process.top_pipeline.id, current_node.id)
             result = FLOW_NODE_HANDLERS[current_node.__class__](process, current_node)
 
             if result.should_return or result.should_sleep:
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('engine', '0008_schedulecelerytask'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatusChange',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('node_id', models.CharField(max_length=32, verbose_name='\u8282\u70b9 ID', db_index=True)),
+                ('from_state', models.CharField(default=b'', max_length=10, verbose_name='\u539f\u72b6\u6001')),
+                ('to_state', models.CharField(max_length=10, verbose_name='\u76ee\u6807\u72b6\u6001')),
+                ('created_time', models.DateTimeField(auto_now_add=True, verbose_name='\u53d8\u66f4\u65f6\u95f4')),
+            ],
+        ),
+    ]
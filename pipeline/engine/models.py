@@ -4,6 +4,7 @@ import zlib
 import logging
 import traceback
 import json
+import datetime
 
 try:
     import cPickle as pickle
@@ -550,6 +551,7 @@ class StatusManager(models.Manager):
 
         # reservation or first creation
         if created:
+            StatusChange.objects.record(id, '', to_state)
             return True
 
         with transaction.atomic():
@@ -578,13 +580,14 @@ class StatusManager(models.Manager):
                     if processes and processes[0].is_frozen:
                         return False
 
-                status.state = to_state
                 if name:
                     status.name = name
                 if start:
                     status.started_time = timezone.now()
                 if to_state in states.ARCHIVED_STATES:
                     status.archived_time = timezone.now()
+                StatusChange.objects.record(id, status.state, to_state)
+                status.state = to_state
                 status.save()
                 return True
             else:
@@ -609,7 +612,11 @@ class StatusManager(models.Manager):
         if from_state:
             kwargs['state'] = from_state
         with transaction.atomic():
-            self.select_for_update().filter(**kwargs).update(state=state)
+            changed = list(self.select_for_update().filter(**kwargs).values_list('id', 'state'))
+            if not changed:
+                return
+            self.filter(id__in=[status_id for status_id, __ in changed]).update(state=state)
+            StatusChange.objects.batch_record([(status_id, old_state, state) for status_id, old_state in changed])
 
     def state_for(self, id, may_not_exist=False, version=None):
         """
@@ -639,6 +646,12 @@ class StatusManager(models.Manager):
 
     def prepare_for_pipeline(self, pipeline):
         self.create(id=pipeline.id, state=states.READY, name=str(pipeline.__class__))
+        StatusChange.objects.record(pipeline.id, '', states.READY)
+
+    def batch_prepare_for_pipelines(self, pipelines):
+        self.bulk_create([self.model(id=pipeline.id, state=states.READY, name=str(pipeline.__class__))
+                          for pipeline in pipelines])
+        StatusChange.objects.batch_record([(pipeline.id, '', states.READY) for pipeline in pipelines])
 
     def fail(self, node, ex_data):
         Data.objects.write_node_data(node, ex_data)
@@ -719,6 +732,68 @@ class Status(models.Model):
         return self.name.endswith('SubProcess')
 
 
+class StatusChangeManager(models.Manager):
+    def record(self, node_id, from_state, to_state):
+        self.create(node_id=node_id, from_state=from_state, to_state=to_state)
+
+    def batch_record(self, changes):
+        self.bulk_create([self.model(node_id=node_id, from_state=from_state, to_state=to_state)
+                          for node_id, from_state, to_state in changes])
+
+    def changes_for(self, root_id, cursor=0, limit=None, lag=0):
+        """
+        获取某个节点及其所有后代节点在游标之后的状态变更记录
+        :param root_id: 节点 ID
+        :param cursor: 游标，即上次获取到的最后一条记录的 ID
+        :param limit: 最多返回的记录数
+        :param lag: 只返回 lag 秒之前的记录，ID 较小的记录所在的事务可能晚于 ID 较大的记录提交，
+                    立即返回最新的记录会让游标越过这些还未提交的记录
+        :return:
+        """
+        descendants = NodeRelationship.objects.filter(ancestor_id=root_id).values('descendant_id')
+        qs = self.filter(id__gt=cursor, node_id__in=descendants).order_by('id').values(
+            'id', 'node_id', 'from_state', 'to_state', 'created_time')
+        if limit:
+            qs = qs[:limit]
+        changes = list(qs)
+        if lag:
+            # 在第一条较新的记录处截断，保证游标不会越过之后才提交的记录
+            safe_time = timezone.now() - datetime.timedelta(seconds=lag)
+            for i, change in enumerate(changes):
+                if change['created_time'] > safe_time:
+                    return changes[:i]
+        return changes
+
+    def clean_expired(self, expire_days, batch_size=1000):
+        """
+        分批删除过期的状态变更记录
+        :param expire_days: 记录保留的天数
+        :param batch_size: 每批删除的记录数
+        :return: 删除的记录数
+        """
+        expire_time = timezone.now() - datetime.timedelta(days=expire_days)
+        count = 0
+        while True:
+            expired = self.filter(created_time__lt=expire_time).order_by('id')
+            ids = list(expired.values_list('id', flat=True)[:batch_size])
+            if not ids:
+                return count
+            self.filter(id__in=ids).delete()
+            count += len(ids)
+
+
+class StatusChange(models.Model):
+    """
+    节点状态变更记录，只追加不修改，ID 作为增量获取的游标，过期的记录由 clean_status_changes 定时清理
+    """
+    node_id = models.CharField(_(u"节点 ID"), max_length=32, db_index=True)
+    from_state = models.CharField(_(u"原状态"), max_length=10, default='')
+    to_state = models.CharField(_(u"目标状态"), max_length=10)
+    created_time = models.DateTimeField(_(u"变更时间"), auto_now_add=True)
+
+    objects = StatusChangeManager()
+
+
 class DataManager(models.Manager):
     def write_node_data(self, node, ex_data=None):
         data, created = self.get_or_create(id=node.id)
@@ -2,12 +2,15 @@
 
 from __future__ import absolute_import
 import logging
+import datetime
 
 from celery import task
+from celery.decorators import periodic_task
 
+from pipeline.conf import settings
 from pipeline.engine import states
 from pipeline.engine.core import runtime, schedule
-from pipeline.engine.models import PipelineProcess, Status, NodeRelationship, ProcessCeleryTask
+from pipeline.engine.models import PipelineProcess, Status, NodeRelationship, ProcessCeleryTask, StatusChange
 
 logger = logging.getLogger('celery')
 
@@ -106,3 +109,10 @@ def wake_from_schedule(process_id, service_act_id):
 @task(ignore_result=True)
 def service_schedule(process_id, schedule_id):
     schedule.schedule(process_id, schedule_id)
+
+
+@periodic_task(run_every=datetime.timedelta(seconds=settings.PIPELINE_STATUS_CHANGE_CLEAN_INTERVAL),
+               ignore_result=True)
+def clean_status_changes():
+    count = StatusChange.objects.clean_expired(settings.PIPELINE_STATUS_CHANGE_EXPIRE_DAYS)
+    logger.info('%s expired status changes cleaned' % count)
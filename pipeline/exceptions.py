@@ -87,6 +87,10 @@ class ComponentDataLackException(ComponentDataFormatException):
     pass
 
 
+class ComponentApiException(ComponentException):
+    pass
+
+
 #
 # tag exception
 #
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+import pipeline.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pipeline', '0004_auto_20180516_1708'),
+    ]
+
+    # 只修改字段名，数据库中的列仍为 data
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveField(
+                    model_name='snapshot',
+                    name='data',
+                ),
+                migrations.AddField(
+                    model_name='snapshot',
+                    name='raw_data',
+                    field=pipeline.models.CompressJSONField(null=True, db_column='data', blank=True),
+                ),
+            ]
+        ),
+    ]
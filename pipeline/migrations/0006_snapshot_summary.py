@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def fill_summary(apps, schema_editor):
+    from pipeline.models import get_snapshot_summary
+
+    # 摘要只统计最外层流程，直接使用快照中保存的数据即可，不需要展开以引用形式保存的子流程
+    PipelineTemplate = apps.get_model('pipeline', 'PipelineTemplate')
+    for template in PipelineTemplate.objects.select_related('snapshot').iterator():
+        PipelineTemplate.objects.filter(id=template.id).update(**get_snapshot_summary(template.snapshot.raw_data))
+
+    PipelineInstance = apps.get_model('pipeline', 'PipelineInstance')
+    for instance in PipelineInstance.objects.select_related('execution_snapshot').iterator():
+        if instance.execution_snapshot is None:
+            continue
+        PipelineInstance.objects.filter(id=instance.id).update(
+            **get_snapshot_summary(instance.execution_snapshot.raw_data))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pipeline', '0005_snapshot_raw_data'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pipelinetemplate',
+            name='node_count',
+            field=models.IntegerField(default=0, verbose_name='\u8282\u70b9\u6570\u91cf'),
+        ),
+        migrations.AddField(
+            model_name='pipelinetemplate',
+            name='subprocess_template_ids',
+            field=models.TextField(default=b'[]', verbose_name='\u5f15\u7528\u7684\u5b50\u6d41\u7a0b\u6a21\u677fID'),
+        ),
+        migrations.AddField(
+            model_name='pipelinetemplate',
+            name='constant_keys',
+            field=models.TextField(default=b'[]', verbose_name='\u5168\u5c40\u53d8\u91cfKEY'),
+        ),
+        migrations.AddField(
+            model_name='pipelinetemplate',
+            name='form_keys',
+            field=models.TextField(default=b'[]', verbose_name='\u8868\u5355\u53d8\u91cfKEY'),
+        ),
+        migrations.AddField(
+            model_name='pipelineinstance',
+            name='node_count',
+            field=models.IntegerField(default=0, verbose_name='\u8282\u70b9\u6570\u91cf'),
+        ),
+        migrations.AddField(
+            model_name='pipelineinstance',
+            name='subprocess_template_ids',
+            field=models.TextField(default=b'[]', verbose_name='\u5f15\u7528\u7684\u5b50\u6d41\u7a0b\u6a21\u677fID'),
+        ),
+        migrations.AddField(
+            model_name='pipelineinstance',
+            name='constant_keys',
+            field=models.TextField(default=b'[]', verbose_name='\u5168\u5c40\u53d8\u91cfKEY'),
+        ),
+        migrations.AddField(
+            model_name='pipelineinstance',
+            name='form_keys',
+            field=models.TextField(default=b'[]', verbose_name='\u8868\u5355\u53d8\u91cfKEY'),
+        ),
+        migrations.RunPython(fill_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def fill_references(apps, schema_editor):
+    from pipeline.models import get_ref_md5sums
+
+    # 引用关系只在快照写入时记录，这里补全已有快照的引用关系
+    Snapshot = apps.get_model('pipeline', 'Snapshot')
+    SnapshotReference = apps.get_model('pipeline', 'SnapshotReference')
+    for snapshot in Snapshot.objects.only('id', 'raw_data').iterator():
+        SnapshotReference.objects.bulk_create([SnapshotReference(referrer_id=snapshot.id, md5sum=md5sum)
+                                               for md5sum in get_ref_md5sums(snapshot.raw_data)])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pipeline', '0006_snapshot_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnapshotReference',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('md5sum', models.CharField(max_length=32, verbose_name='\u88ab\u5f15\u7528\u5feb\u7167\u7684md5sum', db_index=True)),
+                ('referrer', models.ForeignKey(related_name='references', verbose_name='\u5f15\u7528\u65b9\u5feb\u7167', to='pipeline.Snapshot')),
+            ],
+            options={
+                'verbose_name': '\u5feb\u7167\u5f15\u7528',
+                'verbose_name_plural': '\u5feb\u7167\u5f15\u7528',
+            },
+        ),
+        migrations.RunPython(fill_references, migrations.RunPython.noop),
+    ]
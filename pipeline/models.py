@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+import copy
 import Queue
 import ujson as json
 import zlib
@@ -9,12 +10,19 @@ from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 from django.db import models, transaction
 
+from pipeline.conf import settings
+from pipeline.exceptions import InvalidOperationException
+from pipeline.utils.cache import LRUCache
+from pipeline.utils.pool import map_in_threads
 from pipeline.utils.uniqid import uniqid, node_uniqid
 from pipeline.parser.utils import replace_all_id
 
 MAX_LEN_OF_NAME = 64
 logger = logging.getLogger('root')
 
+# 快照按内容寻址，同一个 md5sum 的数据不会变化，解压后的数据可以在进程内复用
+snapshot_data_cache = LRUCache(settings.PIPELINE_SNAPSHOT_CACHE_SIZE)
+
 
 class CompressJSONField(models.BinaryField):
     def __init__(self, compress_level=6, *args, **kwargs):
@@ -33,21 +41,45 @@ class CompressJSONField(models.BinaryField):
         return self.to_python(value)
 
 
+# 快照中以引用形式保存的子流程
+SUBPROCESS_REF = 'subprocess_ref'
+
+
+def get_md5sum(data):
+    """
+    @summary: 计算数据的 md5sum，dict 的 key 按顺序序列化，内容相同的数据总是得到同样的结果
+    """
+    h = hashlib.md5()
+    h.update(json.dumps(data, sort_keys=True))
+    return h.hexdigest()
+
+
 class SnapshotManager(models.Manager):
-    def create_or_get_snapshot(self, data):
-        h = hashlib.md5()
-        h.update(json.dumps(data))
-        snapshot, created = self.get_or_create(md5sum=h.hexdigest())
+    def create_or_get_snapshot(self, data, subprocess_refs=None):
+        """
+        @summary: 按内容获取或创建快照
+        @param data: 快照数据
+        @param subprocess_refs: unfold_subprocess 返回的子流程引用信息，展开后没有被修改过的子流程会以引用的形式保存
+        @return:
+        """
+        snapshot, created = self.get_or_create(md5sum=get_md5sum(data))
         if created:
-            snapshot.data = data
+            snapshot.set_data(data, subprocess_refs)
             snapshot.save()
+            SnapshotReference.objects.record([snapshot])
         return snapshot, created
 
 
 class Snapshot(models.Model):
+    """
+    快照按内容寻址，其他快照会通过 md5sum 引用子流程的快照（见 subprocess_refs），引用关系在写入快照时记录到 SnapshotReference，
+    被引用的快照删除后引用方将无法展开，因此 delete 会拒绝删除被引用的快照；
+    QuerySet.delete 不会经过这里的检查，请不要批量删除快照
+    """
     md5sum = models.CharField(_(u"快照字符串的md5sum"), max_length=32, unique=True)
     create_time = models.DateTimeField(_(u"创建时间"), auto_now_add=True)
-    data = CompressJSONField(null=True, blank=True)  # 前端画布数据
+    # 前端画布数据，展开的子流程可能以引用的形式保存，读取时请使用 data
+    raw_data = CompressJSONField(null=True, blank=True, db_column='data')
 
     objects = SnapshotManager()
 
@@ -60,12 +92,186 @@ class Snapshot(models.Model):
     def __unicode__(self):
         return unicode(self.md5sum)
 
+    @property
+    def data(self):
+        if not hasattr(self, '_data'):
+            self._data = expand_subprocess_refs(self.raw_data)
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self.set_data(value)
+
+    def set_data(self, data, subprocess_refs=None):
+        self._data = data
+        self.raw_data = compact_subprocess(data, subprocess_refs) if subprocess_refs else data
+
+    @property
+    def subprocess_refs(self):
+        """
+        @summary: 以引用形式保存的子流程 {子流程节点 ID: 引用信息}
+        """
+        if not isinstance(self.raw_data, dict):
+            return {}
+        activities = self.raw_data.get('activities', {})
+        return {act_id: act['pipeline'][SUBPROCESS_REF] for act_id, act in activities.iteritems()
+                if SUBPROCESS_REF in act.get('pipeline', {})}
+
     def has_change(self, data):
-        h = hashlib.md5()
-        h.update(json.dumps(data))
-        md5 = h.hexdigest()
+        md5 = get_md5sum(data)
         return md5, self.md5sum != md5
 
+    def is_referenced(self):
+        """
+        @summary: 快照是否被其他快照以子流程引用的形式使用（包括嵌套子流程的间接引用）
+        """
+        return SnapshotReference.objects.filter(md5sum=self.md5sum).exists()
+
+    def delete(self, *args, **kwargs):
+        if self.is_referenced():
+            raise InvalidOperationException('snapshot(%s) is referenced by other snapshots' % self.md5sum)
+        return super(Snapshot, self).delete(*args, **kwargs)
+
+
+class SnapshotReferenceManager(models.Manager):
+    def record(self, snapshots):
+        """
+        @summary: 记录快照直接或间接引用的子流程快照，在快照写入数据库后调用
+        @param snapshots: 新创建的快照列表
+        @return:
+        """
+        self.bulk_create([self.model(referrer_id=snapshot.id, md5sum=md5sum)
+                          for snapshot in snapshots for md5sum in get_ref_md5sums(snapshot.raw_data)])
+
+
+class SnapshotReference(models.Model):
+    """
+    快照之间的子流程引用关系，删除快照时不需要读取其他快照的数据就能判断快照是否被引用
+    """
+    referrer = models.ForeignKey(Snapshot, verbose_name=_(u"引用方快照"), related_name='references',
+                                 on_delete=models.CASCADE)
+    md5sum = models.CharField(_(u"被引用快照的md5sum"), max_length=32, db_index=True)
+
+    objects = SnapshotReferenceManager()
+
+    class Meta:
+        verbose_name = _(u"快照引用")
+        verbose_name_plural = _(u"快照引用")
+        app_label = 'pipeline'
+
+
+def compact_subprocess(data, subprocess_refs):
+    """
+    @summary: 将展开后没有被修改过的子流程替换为引用信息，不会修改 data
+    @param data: 流程树
+    @param subprocess_refs: {子流程节点 ID: 引用信息}
+    @return: 压缩后的流程树
+    """
+    activities = data.get('activities', {})
+    compacted = {}
+    for act_id, ref in subprocess_refs.iteritems():
+        act = activities.get(act_id)
+        if not act or 'pipeline' not in act or get_md5sum(act['pipeline']) != ref['md5sum']:
+            continue
+        act = dict(act)
+        act['pipeline'] = {SUBPROCESS_REF: ref}
+        compacted[act_id] = act
+
+    if not compacted:
+        return data
+    data = dict(data)
+    data['activities'] = dict(activities, **compacted)
+    return data
+
+
+def expand_subprocess_refs(raw_data):
+    """
+    @summary: 展开快照中以引用形式保存的子流程，不会修改 raw_data
+    """
+    if not isinstance(raw_data, dict):
+        return raw_data
+    activities = raw_data.get('activities', {})
+    refs = {act_id: act['pipeline'][SUBPROCESS_REF] for act_id, act in activities.iteritems()
+            if SUBPROCESS_REF in act.get('pipeline', {})}
+    if not refs:
+        return raw_data
+
+    md5sums = set()
+    for ref in refs.itervalues():
+        _collect_ref_snapshots(ref, md5sums)
+    snapshots = get_snapshots_data(md5sums)
+
+    data = dict(raw_data)
+    data['activities'] = dict(activities)
+    for act_id, ref in refs.iteritems():
+        act = dict(activities[act_id])
+        act['constants'] = copy.deepcopy(ref['constants'])
+        _expand_subprocess(act_id, act, ref, snapshots)
+        data['activities'][act_id] = act
+    return data
+
+
+def _collect_ref_snapshots(ref, md5sums):
+    md5sums.add(ref['snapshot'])
+    for sub_ref in ref['subprocess'].itervalues():
+        _collect_ref_snapshots(sub_ref, md5sums)
+
+
+def get_ref_md5sums(raw_data):
+    """
+    @summary: 获取快照中以引用形式保存的子流程（包括嵌套的子流程）的快照 md5sum
+    @param raw_data: 快照中保存的数据
+    @return: md5sum 集合
+    """
+    md5sums = set()
+    if not isinstance(raw_data, dict):
+        return md5sums
+    for act in raw_data.get('activities', {}).itervalues():
+        if SUBPROCESS_REF in act.get('pipeline', {}):
+            _collect_ref_snapshots(act['pipeline'][SUBPROCESS_REF], md5sums)
+    return md5sums
+
+
+def get_snapshots_data(md5sums):
+    """
+    @summary: 批量获取快照数据，优先读取进程内缓存，缓存中没有的快照通过一次查询获取
+    @param md5sums: 快照的 md5sum 集合
+    @return: {md5sum: data}，每次返回的数据都是新的拷贝
+    """
+    snapshots = {}
+    missing = []
+    for md5sum in md5sums:
+        data = snapshot_data_cache.get(md5sum)
+        if data is None:
+            missing.append(md5sum)
+        else:
+            snapshots[md5sum] = data
+    if missing:
+        for snapshot in Snapshot.objects.filter(md5sum__in=missing):
+            snapshot_data_cache.set(snapshot.md5sum, snapshot.data)
+            snapshots[snapshot.md5sum] = snapshot.data
+    return snapshots
+
+
+def get_snapshot_summary(data):
+    """
+    @summary: 计算流程树的摘要信息，在写入快照时保存到模板和实例中，列表展示时不需要读取并解压整个流程树
+    @param data: 流程树
+    @return: 摘要字段 {字段名: 值}
+    """
+    activities = data.get('activities', {})
+    constants = data.get('constants', {})
+    subprocess_template_ids = set([act['template_id'] for act in activities.itervalues()
+                                   if act.get('type') == 'SubProcess' and 'template_id' in act])
+    form_keys = [key for key, info in constants.iteritems() if info.get('show_type') == 'show']
+    return {
+        # 只统计最外层流程的节点，不包括子流程中的节点
+        'node_count': len(activities) + len(data.get('gateways', {})) + 2,
+        'subprocess_template_ids': json.dumps(sorted(subprocess_template_ids)),
+        'constant_keys': json.dumps(sorted(constants.keys())),
+        'form_keys': json.dumps(sorted(form_keys)),
+    }
+
 
 def get_subprocess_act_list(pipeline_data):
     activities = pipeline_data['activities']
@@ -78,6 +284,7 @@ class TemplateManager(models.Manager):
         snapshot, _ = Snapshot.objects.create_or_get_snapshot(structure_data)
         kwargs['snapshot'] = snapshot
         kwargs['template_id'] = node_uniqid()
+        kwargs.update(get_snapshot_summary(structure_data))
         return self.create(**kwargs)
 
     def delete_model(self, template_ids):
@@ -133,6 +340,11 @@ class PipelineTemplate(models.Model):
         default=False,
         help_text=_(u'表示当前模板是否删除')
     )
+    # 流程树摘要，写入快照时更新
+    node_count = models.IntegerField(_(u'节点数量'), default=0)
+    subprocess_template_ids = models.TextField(_(u'引用的子流程模板ID'), default='[]')
+    constant_keys = models.TextField(_(u'全局变量KEY'), default='[]')
+    form_keys = models.TextField(_(u'表单变量KEY'), default='[]')
 
     objects = TemplateManager()
 
@@ -158,6 +370,7 @@ class PipelineTemplate(models.Model):
         snapshot, _ = Snapshot.objects.create_or_get_snapshot(structure_data)
         kwargs['snapshot'] = snapshot
         kwargs['edit_time'] = timezone.now()
+        kwargs.update(get_snapshot_summary(structure_data))
         exclude_keys = ['template_id', 'creator', 'create_time', 'is_deleted']
         for key in exclude_keys:
             kwargs.pop(key, None)
@@ -191,37 +404,239 @@ class TemplateScheme(models.Model):
     data = CompressJSONField(verbose_name=_(u"方案数据"))
 
 
-def unfold_subprocess(pipeline_data):
+def unfold_subprocess(pipeline_data, prefetched=None):
+    """
+    @summary: 展开流程树中的子流程，并替换所有节点的 ID
+    @param pipeline_data: 流程树
+    @param prefetched: 批量展开多个流程树时，由 _prefetch_subprocess_templates 预先获取的子流程模板及快照数据
+    @return: 子流程引用信息 {子流程节点 ID: 引用信息}，保存快照时用于以引用的形式保存展开的子流程
+    """
     replace_all_id(pipeline_data)
     activities = pipeline_data['activities']
+    template_snapshots, snapshots = prefetched or _prefetch_subprocess_templates(
+        [act['template_id'] for act in activities.itervalues() if act['type'] == 'SubProcess']
+    )
+    refs = {}
     for act_id, act in activities.iteritems():
         if act['type'] == 'SubProcess':
-            subproc_data = PipelineTemplate.objects.get(template_id=act['template_id']).data
-            constants_inputs = act.pop('constants')
-            # replace show constants with inputs
-            for key, info in constants_inputs.iteritems():
-                if 'form' in info:
-                    info.pop('form')
-                subproc_data['constants'][key] = info
-            unfold_subprocess(subproc_data)
+            ref = _create_subprocess_ref(act['template_id'], template_snapshots, snapshots)
+            ref['constants'] = copy.deepcopy(act['constants'])
+            _expand_subprocess(act_id, act, ref, snapshots)
+            ref['md5sum'] = get_md5sum(act['pipeline'])
+            refs[act_id] = ref
+    return refs
 
-            subproc_data['id'] = act_id
-            act['pipeline'] = subproc_data
+
+def _prefetch_subprocess_templates(template_ids, ignore_missing=False):
+    """
+    @summary: 逐层获取子流程模板及其快照数据，每一层只查询一次，同一个模板只获取一次
+    @param template_ids: 最外层流程引用的子流程模板 ID
+    @param ignore_missing: 忽略不存在的模板，在展开引用了该模板的流程树时再报错
+    @return: {模板 ID: 快照 md5sum}, {md5sum: 快照数据}
+    @raise PipelineTemplate.DoesNotExist: 引用的子流程模板不存在
+    """
+    template_snapshots = {}
+    snapshots = {}
+    level = set(template_ids)
+    while level:
+        template_snapshots.update(PipelineTemplate.objects.filter(template_id__in=level)
+                                                          .values_list('template_id', 'snapshot__md5sum'))
+        not_exist = level.difference(template_snapshots)
+        if not_exist and not ignore_missing:
+            raise PipelineTemplate.DoesNotExist('PipelineTemplate[template_id=%s] does not exist' %
+                                                ','.join(sorted(not_exist)))
+
+        md5sums = set([template_snapshots[template_id] for template_id in level
+                       if template_id in template_snapshots]).difference(snapshots)
+        level_snapshots = get_snapshots_data(md5sums)
+        snapshots.update(level_snapshots)
+
+        level = set()
+        for data in level_snapshots.itervalues():
+            for act in data['activities'].itervalues():
+                if act['type'] == 'SubProcess' and act['template_id'] not in template_snapshots:
+                    level.add(act['template_id'])
+    return template_snapshots, snapshots
+
+
+def _create_subprocess_ref(template_id, template_snapshots, snapshots):
+    """
+    @summary: 生成子流程的引用信息：子流程模板的快照、节点 ID 的种子以及子流程中子流程的引用信息
+    @param template_snapshots: {模板 ID: 快照 md5sum}
+    @param snapshots: 已经获取的快照数据 {md5sum: data}
+    @raise PipelineTemplate.DoesNotExist: 引用的子流程模板不存在
+    """
+    if template_id not in template_snapshots:
+        raise PipelineTemplate.DoesNotExist('PipelineTemplate[template_id=%s] does not exist' % template_id)
+    md5sum = template_snapshots[template_id]
+    ref = {
+        'snapshot': md5sum,
+        'id_seed': uniqid(),
+        'subprocess': {},
+    }
+    for act_id, act in snapshots[md5sum]['activities'].iteritems():
+        if act['type'] == 'SubProcess':
+            ref['subprocess'][act_id] = _create_subprocess_ref(act['template_id'], template_snapshots, snapshots)
+    return ref
+
+
+def _expand_subprocess(act_id, act, ref, snapshots):
+    """
+    @summary: 根据引用信息展开子流程节点，同样的引用信息总是展开为同样的子流程
+    @param act_id: 子流程节点 ID
+    @param act: 子流程节点，constants 为子流程节点传入的参数
+    @param ref: 引用信息
+    @param snapshots: 引用的快照数据 {md5sum: data}
+    """
+    subproc_data = copy.deepcopy(snapshots[ref['snapshot']])
+    constants_inputs = act.pop('constants')
+    # replace show constants with inputs
+    for key, info in constants_inputs.iteritems():
+        if 'form' in info:
+            info.pop('form')
+        subproc_data['constants'][key] = info
+
+    sub_acts = [(sub_act, ref['subprocess'][sub_act_id])
+                for sub_act_id, sub_act in subproc_data['activities'].iteritems()
+                if sub_act['type'] == 'SubProcess']
+    replace_all_id(subproc_data, id_seed=ref['id_seed'])
+    for sub_act, sub_ref in sub_acts:
+        _expand_subprocess(sub_act['id'], sub_act, sub_ref, snapshots)
+
+    subproc_data['id'] = act_id
+    act['pipeline'] = subproc_data
 
 
 class InstanceManager(models.Manager):
 
     def create_instance(self, template, exec_data, **kwargs):
-        unfold_subprocess(exec_data)
+        subprocess_refs = unfold_subprocess(exec_data)
         instance_id = node_uniqid()
         exec_data['id'] = instance_id
-        exec_snapshot, _ = Snapshot.objects.create_or_get_snapshot(exec_data)
+        exec_snapshot, _ = Snapshot.objects.create_or_get_snapshot(exec_data, subprocess_refs)
         kwargs['template'] = template
         kwargs['instance_id'] = instance_id
         kwargs['snapshot_id'] = template.snapshot.id
         kwargs['execution_snapshot_id'] = exec_snapshot.id
+        kwargs.update(get_snapshot_summary(exec_data))
         return self.create(**kwargs)
 
+    def bulk_create_instances(self, template, instances):
+        """
+        @summary: 用同一个模板批量创建实例，子流程模板只获取一次，快照和实例分别通过一次 bulk_create 写入
+        @param template: 模板
+        @param instances: [{'exec_data': 流程树, 'name': '', 'creator': '', 'description': ''}]
+        @return: 与 instances 一一对应的创建结果 [(True, 实例) 或 (False, 错误信息)]，
+                 某个实例的子流程展开失败不影响其他实例
+        """
+        template_ids = set()
+        for item in instances:
+            template_ids.update([act['template_id'] for act in item['exec_data']['activities'].itervalues()
+                                 if act['type'] == 'SubProcess'])
+        prefetched = _prefetch_subprocess_templates(template_ids, ignore_missing=True)
+
+        results = [None] * len(instances)
+        snapshots = {}
+        objs = []
+        for index, item in enumerate(instances):
+            kwargs = dict(item)
+            exec_data = kwargs.pop('exec_data')
+            try:
+                subprocess_refs = unfold_subprocess(exec_data, prefetched)
+            except Exception as e:
+                logger.exception(u'unfold subprocess of pipeline instance[%s] error: %s' % (kwargs.get('name'), e))
+                results[index] = (False, u'unfold subprocess error: %s' % e)
+                continue
+            instance_id = node_uniqid()
+            exec_data['id'] = instance_id
+            md5sum = get_md5sum(exec_data)
+            if md5sum not in snapshots:
+                snapshots[md5sum] = Snapshot(md5sum=md5sum)
+                snapshots[md5sum].set_data(exec_data, subprocess_refs)
+            kwargs.update(get_snapshot_summary(exec_data))
+            objs.append((index, md5sum, self.model(template=template,
+                                                   instance_id=instance_id,
+                                                   snapshot_id=template.snapshot_id,
+                                                   **kwargs)))
+        if not objs:
+            return results
+
+        with transaction.atomic():
+            # bulk_create 不会回填主键，写入后按唯一字段查询 ID
+            existing = set(Snapshot.objects.filter(md5sum__in=snapshots.keys()).values_list('md5sum', flat=True))
+            created = [snapshot for snapshot_md5sum, snapshot in snapshots.iteritems()
+                       if snapshot_md5sum not in existing]
+            Snapshot.objects.bulk_create(created)
+            snapshot_ids = dict(Snapshot.objects.filter(md5sum__in=snapshots.keys()).values_list('md5sum', 'id'))
+            for snapshot in created:
+                snapshot.id = snapshot_ids[snapshot.md5sum]
+            SnapshotReference.objects.record(created)
+            for __, md5sum, instance in objs:
+                instance.execution_snapshot_id = snapshot_ids[md5sum]
+            self.bulk_create([instance for __, __, instance in objs])
+            instance_ids = dict(self.filter(instance_id__in=[instance.instance_id for __, __, instance in objs])
+                                .values_list('instance_id', 'id'))
+
+        for index, __, instance in objs:
+            instance.id = instance_ids[instance.instance_id]
+            instance._state.adding = False
+            results[index] = (True, instance)
+        return results
+
+    def batch_start(self, instances, executor, pool_size=None):
+        """
+        @summary: 批量启动实例：在线程池中解析流程树，一次加锁检查并标记启动状态，然后一起启动，启动失败时撤销启动标记
+        @param instances: 实例列表
+        @param executor: 执行者
+        @param pool_size: 解析流程树的线程数，默认为 PIPELINE_BATCH_START_POOL_SIZE
+        @return: {实例 ID: (是否启动成功, 数据或错误信息)}，某个实例启动失败不影响其他实例
+        """
+        from pipeline.engine import api
+
+        results = {}
+        pending = []
+        for instance in instances:
+            if instance.is_started:
+                results[instance.id] = (False, 'pipeline instance already started.')
+            else:
+                # 解析时的上下文需要用到执行者
+                instance.executor = executor
+                pending.append(instance)
+
+        pipelines = {}
+        parsed = map_in_threads(_parse_instance, pending, pool_size or settings.PIPELINE_BATCH_START_POOL_SIZE)
+        for instance, (success, data) in zip(pending, parsed):
+            if success:
+                pipelines[instance.id] = data
+            else:
+                results[instance.id] = (False, data)
+        if not pipelines:
+            return results
+
+        with transaction.atomic():
+            to_start = list(self.select_for_update()
+                            .filter(id__in=pipelines.keys(), is_started=False)
+                            .values_list('id', flat=True))
+            self.filter(id__in=to_start).update(start_time=timezone.now(), is_started=True, executor=executor)
+        for instance_id in set(pipelines).difference(to_start):
+            results[instance_id] = (False, 'pipeline instance already started.')
+        if not to_start:
+            return results
+
+        try:
+            started = api.start_pipelines([pipelines[instance_id] for instance_id in to_start])
+            message = u'pipeline start error: function switch is frozen'
+        except Exception as e:
+            logger.exception(u'batch start pipelines error: %s' % e)
+            started = False
+            message = u'pipeline start error: %s' % e
+        if not started:
+            # 启动失败时撤销启动标记，实例可以再次启动
+            self.filter(id__in=to_start).update(start_time=None, is_started=False, executor='')
+        for instance_id in to_start:
+            results[instance_id] = (True, {}) if started else (False, message)
+        return results
+
     def delete_model(self, instance_ids):
         if not isinstance(instance_ids, list):
             instance_ids = [instance_ids]
@@ -254,6 +669,19 @@ class InstanceManager(models.Manager):
         return instance
 
 
+def _parse_instance(instance):
+    from pipeline.parser import pipeline_parser
+    from pipeline.utils.context import get_pipeline_context
+
+    try:
+        parser = pipeline_parser.WebPipelineAdapter(instance.execution_data,
+                                                    cache_key=instance.execution_snapshot.md5sum)
+        return True, parser.parser(get_pipeline_context(instance, 'instance'))
+    except Exception as e:
+        logger.exception(u'pipeline instance[id=%s] parse error: %s' % (instance.id, e))
+        return False, u'pipeline instance parse error: %s' % e
+
+
 class PipelineInstance(models.Model):
     template = models.ForeignKey(PipelineTemplate, verbose_name=_(u'Pipeline模板'))
     instance_id = models.CharField(_(u'实例ID'), max_length=32, unique=True)
@@ -281,6 +709,11 @@ class PipelineInstance(models.Model):
         related_name='execution_snapshot',
         verbose_name=_(u'用于实例执行的结构数据')
     )
+    # 流程树摘要，写入执行快照时更新
+    node_count = models.IntegerField(_(u'节点数量'), default=0)
+    subprocess_template_ids = models.TextField(_(u'引用的子流程模板ID'), default='[]')
+    constant_keys = models.TextField(_(u'全局变量KEY'), default='[]')
+    form_keys = models.TextField(_(u'表单变量KEY'), default='[]')
 
     objects = InstanceManager()
 
@@ -302,8 +735,12 @@ class PipelineInstance(models.Model):
         return self.execution_snapshot.data
 
     def set_execution_data(self, data):
-        self.execution_snapshot.data = data
-        self.execution_snapshot.save()
+        # 快照按内容寻址，数据变更后指向新的快照，保证 md5sum 始终与数据一致
+        subprocess_refs = self.execution_snapshot.subprocess_refs if self.execution_snapshot else None
+        self.execution_snapshot, __ = Snapshot.objects.create_or_get_snapshot(data, subprocess_refs)
+        for key, value in get_snapshot_summary(data).iteritems():
+            setattr(self, key, value)
+        self.save()
 
     def _replace_id(self, exec_data):
         replace_all_id(exec_data)
@@ -327,7 +764,7 @@ class PipelineInstance(models.Model):
         return self.__class__.objects.create(template=self.template, instance_id=instance_id,
                                              name=name, creator=creator,
                                              description=self.description, snapshot=self.snapshot,
-                                             execution_snapshot=new_snapshot)
+                                             execution_snapshot=new_snapshot, **get_snapshot_summary(exec_data))
 
     def start(self, executor):
         from pipeline.parser import pipeline_parser
@@ -343,7 +780,8 @@ class PipelineInstance(models.Model):
             instance.executor = executor
 
             pipeline_data = instance.execution_data
-            parser = pipeline_parser.WebPipelineAdapter(pipeline_data)
+            parser = pipeline_parser.WebPipelineAdapter(pipeline_data,
+                                                        cache_key=instance.execution_snapshot.md5sum)
             pipeline = parser.parser(get_pipeline_context(instance, 'instance'))
 
             instance.save()
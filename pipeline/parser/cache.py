@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+import hashlib
+
+import ujson as json
+
+from pipeline.conf import settings
+from pipeline.utils.cache import LRUCache
+
+# 校验并格式化后的流程树，key 为执行快照的 md5sum
+pipeline_tree_cache = LRUCache(settings.PIPELINE_PARSER_CACHE_SIZE)
+
+# 未执行节点的输入参数渲染结果
+act_inputs_cache = LRUCache(settings.PIPELINE_PARSER_CACHE_SIZE * 8,
+                            timeout=settings.PIPELINE_PARSER_INPUTS_CACHE_TIMEOUT)
+
+
+def act_inputs_cache_key(cache_key, act_id, subprocess_stack, root_pipeline_data):
+    h = hashlib.md5()
+    h.update(json.dumps(root_pipeline_data, sort_keys=True))
+    return '%s:%s:%s:%s' % (cache_key, '.'.join(subprocess_stack), act_id, h.hexdigest())
@@ -5,15 +5,21 @@ from pipeline import exceptions
 from pipeline.core.data import var, library
 from pipeline.component_framework.constant import ConstantPool
 
+# 会被校验或解析过程修改的节点（如写入 converge_gateway_id），需要浅拷贝；flows 只读，直接共享
+NODE_FIELDS = ['start_event', 'end_event', 'gateways']
+
 
 def format_web_data_to_pipeline(web_pipeline):
     """
-    @summary:
+    @summary: 将前端画布数据转换为引擎可以解析的流程树，一次遍历完成
+              不会修改 web_pipeline，也不会深拷贝其中的数据：节点结构为浅拷贝，无需渲染的参数值与 web_pipeline 共享
     @param web_pipeline:
     @return:
     """
-    pipeline_tree = copy.deepcopy(web_pipeline)
-    constants = pipeline_tree.pop('constants')
+    return _format_pipeline(web_pipeline, web_pipeline['constants'])
+
+
+def _format_pipeline(web_pipeline, constants):
     constant_pool = {}
     data_inputs = {}
     acts_outputs = {}
@@ -45,51 +51,116 @@ def format_web_data_to_pipeline(web_pipeline):
             constant_pool[key] = info
 
     pool_obj = ConstantPool(constant_pool)
-    resolved_constants = pool_obj.pool
-    data_inputs = calculate_constants_type(resolved_constants, data_inputs)
+    for key, info in pool_obj.pool.iteritems():
+        data_inputs.setdefault(key, get_constant_type(info))
+
+    pipeline_tree = dict(web_pipeline)
+    pipeline_tree.pop('constants')
     pipeline_tree['data'] = {
         'inputs': data_inputs,
         'outputs': {key: key for key in pipeline_tree.pop('outputs')},
     }
+    for field in NODE_FIELDS:
+        if field in ['start_event', 'end_event']:
+            pipeline_tree[field] = dict(web_pipeline[field])
+        else:
+            pipeline_tree[field] = {node_id: dict(node) for node_id, node in web_pipeline[field].iteritems()}
 
-    for act_id, act in pipeline_tree['activities'].iteritems():
+    activities = {}
+    for act_id, web_act in web_pipeline['activities'].iteritems():
+        act = dict(web_act)
         if act['type'] == 'ServiceActivity':
-            act_data = act['component'].pop('data')
+            component = dict(act['component'])
+            act_data = component.pop('data')
+            inputs = {}
             for key, info in act_data.iteritems():
-                info['value'] = pool_obj.resolve_value(info['value'])
-
-            all_inputs = calculate_constants_type(act_data,
-                                                  data_inputs)
-            act['component']['inputs'] = {
-                key: value for key, value in all_inputs.iteritems()
-                if key in act_data
-            }
-            act['component']['global_outputs'] = acts_outputs.get(act_id, {})
+                if key in data_inputs:
+                    inputs[key] = dict(data_inputs[key])
+                else:
+                    inputs[key] = get_constant_type(info, _resolve_value(pool_obj, info['value']))
+            component['inputs'] = inputs
+            component['global_outputs'] = acts_outputs.get(act_id, {})
+            act['component'] = component
         elif act['type'] == 'SubProcess':
             act_data = {}
             act_constants = {}
             for key, info in act['pipeline']['constants'].iteritems():
                 if info['show_type'] == 'show':
-                    info['value'] = pool_obj.resolve_value(info['value'])
-                    act_constants[key] = info
+                    info = dict(info)
+                    info['value'] = _resolve_value(pool_obj, info['value'])
                     act_data[key] = info
-                else:
-                    act_constants[key] = info
-            act['pipeline']['constants'] = act_constants
+                act_constants[key] = info
             act['exposed_constants'] = act_data.keys()
-            all_inputs = calculate_constants_type(act_data,
-                                                  data_inputs)
 
-            act['pipeline'] = format_web_data_to_pipeline(act['pipeline'])
-            for key in act['exposed_constants']:
-                act['pipeline']['data']['inputs'][key] = all_inputs[key]
+            sub_pipeline = _format_pipeline(act['pipeline'], act_constants)
+            sub_inputs = sub_pipeline['data']['inputs']
+            for key, info in act_data.iteritems():
+                if key in data_inputs:
+                    sub_inputs[key] = dict(data_inputs[key])
+                else:
+                    sub_inputs[key] = get_constant_type(info)
+            act['pipeline'] = sub_pipeline
         else:
             raise exceptions.FlowTypeError(u"Unknown Activity type: %s" %
                                            act['type'])
+        activities[act_id] = act
+    pipeline_tree['activities'] = activities
 
     return pipeline_tree
 
 
+def _resolve_value(pool_obj, value):
+    """
+    @summary: 用常量池渲染参数值，不包含变量引用的值原样返回，需要渲染时只拷贝最外层容器
+    """
+    if not _may_have_reference(value, pool_obj.standard_keys):
+        return value
+    if isinstance(value, (dict, list)):
+        # resolve_data 会就地修改最外层容器，内层数据在渲染前会被深拷贝
+        value = copy.copy(value)
+    return pool_obj.resolve_value(value)
+
+
+def _may_have_reference(data, standard_keys):
+    if not standard_keys:
+        # 常量 key 不全是 ${xxx} 的形式时无法快速判断，总是渲染
+        return True
+    if isinstance(data, basestring):
+        return '${' in data
+    if isinstance(data, (list, tuple)):
+        return any(_may_have_reference(item, standard_keys) for item in data)
+    if isinstance(data, dict):
+        return any(_may_have_reference(item, standard_keys) for item in data.itervalues())
+    return False
+
+
+def get_constant_type(info, value=None):
+    """
+    @summary: 根据参数值计算参数类型
+    @param info: 参数信息
+    @param value: 参数值，默认为 info['value']
+    @return:
+    """
+    if value is None:
+        value = info['value']
+    ref = var.get_data_reference(var.CONSTANT_EXP, value)
+    if ref:
+        return {
+            'type': 'splice',
+            'value': value,
+        }
+    elif info.get('type', 'plain') != 'plain':
+        return {
+            'type': info['type'],
+            'value': value,
+        }
+    else:
+        return {
+            'type': 'plain',
+            'value': value,
+        }
+
+
 def calculate_constants_type(input_constants, output_constants):
     """
     @summary:
@@ -99,21 +170,6 @@ def calculate_constants_type(input_constants, output_constants):
     """
     data = copy.deepcopy(output_constants)
     for key, info in input_constants.iteritems():
-        ref = var.get_data_reference(var.CONSTANT_EXP, info['value'])
-        if ref:
-            data.setdefault(key, {
-                'type': 'splice',
-                'value': info['value'],
-            })
-        elif info.get('type', 'plain') != 'plain':
-            data.setdefault(key, {
-                'type': info['type'],
-                'value': info['value'],
-            })
-        else:
-            data.setdefault(key, {
-                'type': 'plain',
-                'value': info['value'],
-            })
+        data.setdefault(key, get_constant_type(info))
 
     return data
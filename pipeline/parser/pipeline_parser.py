@@ -1,4 +1,9 @@
 # -*- coding: utf-8 -*-
+from pipeline.parser.cache import (
+    pipeline_tree_cache,
+    act_inputs_cache,
+    act_inputs_cache_key,
+)
 from pipeline.parser.format import format_web_data_to_pipeline
 from pipeline import exceptions
 from pipeline.core.flow import base, activity, gateway, event
@@ -6,6 +11,7 @@ from pipeline.core.pipeline import PipelineSpec, Pipeline
 from pipeline.core.data.base import DataObject
 from pipeline.core.data.context import Context
 from pipeline.core.data.converter import get_variable
+from pipeline.core.data.var import CONSTANT_EXP, get_data_reference
 from pipeline.component_framework.library import ComponentLibrary
 from pipeline.validators.base import (
     validate_web_pipeline_tree,
@@ -13,18 +19,35 @@ from pipeline.validators.base import (
 )
 
 
-class PipelineParser(object):
+def validate_pipeline_tree_recursively(pipeline_tree):
+    validate_pipeline_tree(pipeline_tree)
+    for act in pipeline_tree['activities'].values():
+        if act['type'] == 'SubProcess':
+            validate_pipeline_tree_recursively(act['pipeline'])
 
-    def __init__(self, pipeline_tree):
 
-        validate_pipeline_tree(pipeline_tree)
-        self.pipeline_tree = pipeline_tree
+class PipelineParser(object):
 
-    def parser(self, root_pipeline_data=None):
-        if root_pipeline_data is None:
-            root_pipeline_data = {}
+    def __init__(self, pipeline_tree, validated=False):
+        """
+        @param pipeline_tree:
+        @param validated: 流程树（包括所有子流程）是否已经校验过，为 True 时不再重复校验
+        """
+        if not validated:
+            validate_pipeline_tree(pipeline_tree)
+        self.pipeline_tree = pipeline_tree
+        self.validated = validated
 
-        pipeline_inputs = self.pipeline_tree['data']['inputs']
+    @staticmethod
+    def _parse_context(pipeline_tree, root_pipeline_data, refer_data=None):
+        """
+        @summary: 构造流程的上下文
+        @param pipeline_tree:
+        @param root_pipeline_data:
+        @param refer_data: 传入时只构造 refer_data 直接或间接引用到的全局变量
+        @return:
+        """
+        pipeline_inputs = pipeline_tree['data']['inputs']
         act_outputs = {}
         scope_info = {}
         for key, info in pipeline_inputs.iteritems():
@@ -33,11 +56,30 @@ class PipelineParser(object):
                                        {}).update({info['source_key']: key})
             else:
                 scope_info.update({key: info})
-        output_keys = self.pipeline_tree['data']['outputs'].keys()
+        output_keys = pipeline_tree['data']['outputs'].keys()
         context = Context(act_outputs, output_keys)
+
+        if refer_data is not None:
+            referenced = set()
+            refs = get_data_reference(CONSTANT_EXP, refer_data)
+            while refs:
+                key = refs.pop()
+                if key in referenced or key not in scope_info:
+                    continue
+                referenced.add(key)
+                refs.extend(get_data_reference(CONSTANT_EXP, scope_info[key]['value']))
+            scope_info = {key: scope_info[key] for key in referenced}
+
         for key, info in scope_info.iteritems():
             value = get_variable(key, info, context, root_pipeline_data)
             context.set_global_var(key, value)
+        return context
+
+    def parser(self, root_pipeline_data=None):
+        if root_pipeline_data is None:
+            root_pipeline_data = {}
+
+        context = self._parse_context(self.pipeline_tree, root_pipeline_data)
 
         start = self.pipeline_tree['start_event']
         start_cls = getattr(event, start['type'])
@@ -66,7 +108,7 @@ class PipelineParser(object):
                                         error_ignorable=act.get('error_ignorable', False)))
             elif act['type'] == 'SubProcess':
                 pipeline_info = act['pipeline']
-                sub_parser = PipelineParser(pipeline_info)
+                sub_parser = PipelineParser(pipeline_info, validated=self.validated)
                 act_objs.append(act_cls(id=act['id'],
                                         pipeline=sub_parser.parser(root_pipeline_data),
                                         name=act['name']))
@@ -91,20 +133,20 @@ class PipelineParser(object):
                 raise exceptions.FlowTypeError(u"Unknown Gateway type: %s" %
                                                gw['type'])
 
+        # index all flow nodes by id, so that each flow resolves its source
+        # and target in constant time
+        flow_nodes = {
+            start_event.id: start_event,
+            end_event.id: end_event,
+        }
+        for node in act_objs + gateway_objs:
+            flow_nodes[node.id] = node
+
         flow_objs_dict = {}
         for fl in flows.values():
-            flow_nodes = act_objs + gateway_objs
-            if fl['source'] == start['id']:
-                source = start_event
-            else:
-                source = filter(lambda x: x.id == fl['source'], flow_nodes)[0]
-            if fl['target'] == end['id']:
-                target = end_event
-            else:
-                target = filter(lambda x: x.id == fl['target'], flow_nodes)[0]
             flow_objs_dict[fl['id']] = base.SequenceFlow(fl['id'],
-                                                         source,
-                                                         target)
+                                                         flow_nodes[fl['source']],
+                                                         flow_nodes[fl['target']])
         flow_objs = flow_objs_dict.values()
 
         # add incoming and outgoing flow to acts
@@ -168,22 +210,73 @@ class PipelineParser(object):
 
         subprocess = self.parser(root_pipeline_data).spec
         for sub_id in subprocess_stack:
-            subprocess = filter(lambda x: x.id == sub_id,
-                                subprocess.activities)[0].pipeline.spec
-        act = filter(lambda x: x.id == act_id, subprocess.activities)[0]
+            subprocess = subprocess.objects[sub_id].pipeline.spec
+        act = subprocess.objects[act_id]
         return act
 
     def get_act_inputs(self, act_id, subprocess_stack=None, root_pipeline_data=None):
-        act = self.get_act(act_id, subprocess_stack, root_pipeline_data)
+        """
+        @summary: 获取节点的输入参数，只解析节点所在的（子）流程层级，以及节点输入参数引用到的全局变量
+        @param act_id:
+        @param subprocess_stack:
+        @param root_pipeline_data:
+        @return:
+        """
+        if subprocess_stack is None:
+            subprocess_stack = []
+        if root_pipeline_data is None:
+            root_pipeline_data = {}
+
+        pipeline_tree = self.pipeline_tree
+        for sub_id in subprocess_stack:
+            pipeline_tree = self._get_act_tree(pipeline_tree, sub_id)['pipeline']
+        act = self._get_act_tree(pipeline_tree, act_id)
+        if act['type'] != 'ServiceActivity':
+            raise exceptions.FlowTypeError(u"Activity %s is not a ServiceActivity" % act_id)
+
+        act_inputs = act['component']['inputs']
+        context = self._parse_context(pipeline_tree,
+                                      root_pipeline_data,
+                                      refer_data=[info['value'] for info in act_inputs.values()])
+        component = ComponentLibrary.get_component(act['component']['code'], act_inputs)
+        data = component.data_for_execution(context, root_pipeline_data)
         inputs = {key: info.get()
-                  for key, info in act.data.inputs.iteritems()}
+                  for key, info in data.inputs.iteritems()}
         return inputs
 
+    @staticmethod
+    def _get_act_tree(pipeline_tree, act_id):
+        try:
+            return pipeline_tree['activities'][act_id]
+        except KeyError:
+            raise exceptions.NodeNotExistException(u"Activity %s does not exist in pipeline %s" %
+                                                   (act_id, pipeline_tree.get('id')))
+
 
 class WebPipelineAdapter(PipelineParser):
 
-    def __init__(self, web_pipeline_tree):
+    def __init__(self, web_pipeline_tree, cache_key=None):
+        """
+        @param web_pipeline_tree:
+        @param cache_key: 流程树内容的唯一标识（如执行快照的 md5sum），传入时会复用已校验并格式化过的流程树
+        """
+        self.cache_key = cache_key
+        pipeline_tree = pipeline_tree_cache.get(cache_key) if cache_key else None
+        if pipeline_tree is None:
+            validate_web_pipeline_tree(web_pipeline_tree)
+            pipeline_tree = format_web_data_to_pipeline(web_pipeline_tree)
+            validate_pipeline_tree_recursively(pipeline_tree)
+            if cache_key:
+                pipeline_tree_cache.set(cache_key, pipeline_tree)
+        super(WebPipelineAdapter, self).__init__(pipeline_tree, validated=True)
 
-        validate_web_pipeline_tree(web_pipeline_tree)
-        pipeline_tree = format_web_data_to_pipeline(web_pipeline_tree)
-        super(WebPipelineAdapter, self).__init__(pipeline_tree)
+    def get_act_inputs(self, act_id, subprocess_stack=None, root_pipeline_data=None):
+        if not self.cache_key:
+            return super(WebPipelineAdapter, self).get_act_inputs(act_id, subprocess_stack, root_pipeline_data)
+
+        key = act_inputs_cache_key(self.cache_key, act_id, subprocess_stack or [], root_pipeline_data or {})
+        inputs = act_inputs_cache.get(key)
+        if inputs is None:
+            inputs = super(WebPipelineAdapter, self).get_act_inputs(act_id, subprocess_stack, root_pipeline_data)
+            act_inputs_cache.set(key, inputs)
+        return inputs
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+import hashlib
 import logging
 
 from pipeline.utils.uniqid import uniqid, node_uniqid, line_uniqid
@@ -11,7 +12,14 @@ ID = 'id'
 CVG_GW_ID = 'converge_gateway_id'
 
 
-def replace_all_id(pipeline_data):
+def replace_all_id(pipeline_data, id_seed=None):
+    """
+    @summary: 替换流程树中所有节点和连线的 ID
+    @param pipeline_data:
+    @param id_seed: 不为空时新 ID 由 id_seed 和原 ID 计算得到，同样的 id_seed 和流程树总是替换为同样的 ID
+    """
+    new_node_id = _id_generator(id_seed, 'node', node_uniqid)
+    new_line_id = _id_generator(id_seed, 'line', line_uniqid)
     flows = pipeline_data['flows']
     node_map = {}
     flow_map = {}
@@ -19,8 +27,8 @@ def replace_all_id(pipeline_data):
     # step.1 replace nodes id
 
     # replace events id
-    start_event_id = node_uniqid()
-    end_event_id = node_uniqid()
+    start_event_id = new_node_id(pipeline_data[PE.start_event][ID])
+    end_event_id = new_node_id(pipeline_data[PE.end_event][ID])
     node_map[pipeline_data[PE.start_event][ID]] = start_event_id
     node_map[pipeline_data[PE.end_event][ID]] = end_event_id
 
@@ -29,24 +37,24 @@ def replace_all_id(pipeline_data):
 
     # replace activities id
     activities = pipeline_data[PE.activities]
-    keys = activities.keys()
+    keys = _id_keys(activities, id_seed)
     for old_id in keys:
-        substituted_id = node_uniqid()
+        substituted_id = new_node_id(old_id)
         node_map[old_id] = substituted_id
         _replace_activity_id(flows, activities, old_id, substituted_id)
 
     # replace gateways id
     gateways = pipeline_data[PE.gateways]
-    keys = gateways.keys()
+    keys = _id_keys(gateways, id_seed)
     for old_id in keys:
-        substituted_id = node_uniqid()
+        substituted_id = new_node_id(old_id)
         node_map[old_id] = substituted_id
         _replace_gateway_id(flows, gateways, old_id, substituted_id)
 
     # step.2 replace flows id
-    keys = flows.keys()
+    keys = _id_keys(flows, id_seed)
     for old_id in keys:
-        substituted_id = line_uniqid()
+        substituted_id = new_line_id(old_id)
         flow_map[old_id] = substituted_id
         _replace_flow_id(flows, old_id, substituted_id, pipeline_data)
 
@@ -54,6 +62,18 @@ def replace_all_id(pipeline_data):
     _replace_front_end_data_id(pipeline_data, node_map, flow_map)
 
 
+def _id_generator(id_seed, prefix, uniqid_func):
+    if not id_seed:
+        return lambda old_id: uniqid_func()
+    # 与 node_uniqid/line_uniqid 生成的 ID 格式、长度一致
+    return lambda old_id: ('%s%s' % (prefix, hashlib.md5('%s%s' % (id_seed, old_id)).hexdigest()))[:32]
+
+
+def _id_keys(nodes, id_seed):
+    # 替换顺序会影响网关 incoming/outgoing 列表的顺序，指定 id_seed 时按固定顺序替换
+    return sorted(nodes.keys()) if id_seed else nodes.keys()
+
+
 def _replace_front_end_data_id(pipeline_data, node_map, flow_map):
     if PE.line in pipeline_data:
         for line in pipeline_data[PE.line]:
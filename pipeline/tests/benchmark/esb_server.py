@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+本地 ESB 替身服务，用于在离线环境中对组件调用进行基准测试：
+    with LocalESBServer(latency=0.05) as server:
+        client = server.get_client()
+        client.cc.update_set({...})
+"""
+import json
+import time
+import threading
+
+from blueking.component.base import ComponentAPI
+from blueking.component.client import ComponentClient
+from blueking.tests.utils import ThreadingHTTPServer, StubHandler
+
+
+class ESBHandler(StubHandler):
+    def handle_request(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else ''
+        path = self.path.split('?')[0]
+        self.server.record(path)
+        time.sleep(self.server.latency)
+
+        api_name = path.rstrip('/').rsplit('/', 1)[-1]
+        if api_name in self.server.failed_apis:
+            result = {'result': False, 'code': 1306000, 'message': 'stand-in failure', 'data': None}
+        else:
+            result = {'result': True, 'code': 0, 'message': 'success',
+                      'data': json.loads(body) if body else None}
+        self.send_body(json.dumps(result))
+
+
+class LocalESBServer(object):
+    """
+    对所有组件接口返回成功并回显请求数据，每个请求耗时 latency 秒，failed_apis 中的接口返回失败
+    """
+
+    def __init__(self, latency=0.05, failed_apis=None):
+        self.server = ThreadingHTTPServer(ESBHandler)
+        self.server.latency = latency
+        self.server.failed_apis = set(failed_apis or [])
+        self.server.requests = []
+        self.server.lock = threading.Lock()
+        self.server.record = self._record
+
+    def _record(self, path):
+        with self.server.lock:
+            self.server.requests.append(path)
+
+    @property
+    def host(self):
+        return self.server.host
+
+    @property
+    def requests(self):
+        return self.server.requests
+
+    def get_client(self, **kwargs):
+        """
+        @summary: 获取一个所有接口都指向当前服务的 client
+        """
+        client = ComponentClient(bk_app_code='benchmark', bk_app_secret='benchmark',
+                                 common_args={'bk_username': 'admin'}, **kwargs)
+        for name in client.available_collections:
+            collection = getattr(client, name)
+            for api in collection.__dict__.values():
+                if isinstance(api, ComponentAPI):
+                    api.host = self.host
+        return client
+
+    def start(self):
+        self.server.start()
+        return self
+
+    def stop(self):
+        self.server.stop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+未执行节点输入参数获取耗时基准测试，在 python manage.py shell 中执行：
+    from pipeline.tests.benchmark.manual_benchmark_act_inputs import main_test
+    main_test()
+"""
+from pipeline.core.constants import PE
+from pipeline.parser.pipeline_parser import WebPipelineAdapter
+from pipeline.tests.benchmark.utils import (
+    generate_nested_web_pipeline_tree,
+    node_count,
+    timeit,
+    print_table,
+)
+
+
+def get_act_inputs_by_full_parse(parser, act_id, subprocess_stack):
+    act = parser.get_act(act_id, subprocess_stack)
+    return {key: info.get() for key, info in act.data.inputs.iteritems()}
+
+
+def benchmark_act_inputs(act_count, sub_depth, sub_count):
+    web_tree, subprocess_stack = generate_nested_web_pipeline_tree(act_count, sub_depth, sub_count,
+                                                                   constants_count=act_count)
+    parser = WebPipelineAdapter(web_tree)
+
+    sub_tree = parser.pipeline_tree
+    for sub_id in subprocess_stack:
+        sub_tree = sub_tree[PE.activities][sub_id][PE.pipeline]
+    act_id = [act_id for act_id, act in sub_tree[PE.activities].items()
+              if act['type'] == PE.ServiceActivity][-1]
+
+    full_inputs, full_cost = timeit(lambda: get_act_inputs_by_full_parse(parser, act_id, subprocess_stack))
+    inputs, cost = timeit(lambda: parser.get_act_inputs(act_id, subprocess_stack))
+    assert inputs == full_inputs
+    return node_count(web_tree), full_cost, cost
+
+
+def main_test(cases=None):
+    rows = []
+    for act_count, sub_depth, sub_count in cases or [(50, 1, 2), (50, 2, 3), (100, 3, 3), (200, 3, 3)]:
+        nodes, full_cost, cost = benchmark_act_inputs(act_count, sub_depth, sub_count)
+        rows.append([nodes, sub_depth, full_cost, cost])
+    print_table('get_act_inputs benchmark',
+                ['nodes', 'subprocess depth', 'full parse(s)', 'targeted(s)'],
+                rows)
+    return rows
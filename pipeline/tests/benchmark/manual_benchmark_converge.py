@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+汇聚网关匹配耗时基准测试，流程树为多层嵌套的 并行/分支 网关，在 python manage.py shell 中执行：
+    from pipeline.tests.benchmark.manual_benchmark_converge import main_test
+    main_test()
+"""
+from pipeline.parser.format import format_web_data_to_pipeline
+from pipeline.validators.utils import validate_converge_gateway
+from pipeline.tests.benchmark.utils import (
+    generate_deep_web_pipeline_tree,
+    timeit,
+    print_table,
+)
+
+# (嵌套层数, 每个网关的分支数, 最外层网关第一个分支上串联的嵌套块数量, 串联的最外层块数量)
+BENCHMARK_CASES = [
+    (10, 2, 1, 100),
+    (50, 2, 1, 20),
+    (50, 3, 10, 2),
+    (200, 2, 1, 5),
+    (200, 2, 5, 1),
+    (400, 2, 1, 2),
+    (5000, 2, 1, 1),
+]
+
+
+def benchmark_converge(depth, branch_width, chain_count, block_count):
+    web_tree = generate_deep_web_pipeline_tree(depth, branch_width, chain_count, block_count)
+    pipeline_tree = format_web_data_to_pipeline(web_tree)
+    __, cost = timeit(lambda: validate_converge_gateway(pipeline_tree))
+    return len(pipeline_tree['gateways']), cost
+
+
+def main_test(cases=None):
+    rows = []
+    for depth, branch_width, chain_count, block_count in cases or BENCHMARK_CASES:
+        gateways, cost = benchmark_converge(depth, branch_width, chain_count, block_count)
+        rows.append([depth, branch_width, chain_count, block_count, gateways, cost])
+    print_table('converge gateway match benchmark',
+                ['depth', 'branches', 'chain', 'blocks', 'gateways', 'match(s)'],
+                rows)
+    return rows
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+ESB 组件并发调用基准测试，使用本地 ESB 替身服务模拟接口耗时，在 python manage.py shell 中执行：
+    from pipeline.tests.benchmark.manual_benchmark_esb_batch import main_test
+    main_test()
+"""
+from pipeline.tests.benchmark.esb_server import LocalESBServer
+from pipeline.tests.benchmark.utils import timeit, print_table
+
+# (调用次数, 接口耗时(秒), 并发数)
+BENCHMARK_CASES = [
+    (10, 0.05, 10),
+    (50, 0.05, 10),
+    (50, 0.05, 25),
+    (200, 0.02, 10),
+]
+
+
+def call_one_by_one(client, kwargs_list):
+    return [client.cc.update_set(kwargs) for kwargs in kwargs_list]
+
+
+def batch_call(client, kwargs_list, pool_size):
+    return client.batch_call([(client.cc.update_set, kwargs) for kwargs in kwargs_list], pool_size=pool_size)
+
+
+def benchmark_esb_batch(count, latency, pool_size):
+    kwargs_list = [{'bk_biz_id': 1, 'bk_set_id': set_id, 'data': {'bk_service_status': '1'}}
+                   for set_id in xrange(count)]
+    with LocalESBServer(latency=latency) as server:
+        client = server.get_client()
+        sequential_results, sequential_cost = timeit(lambda: call_one_by_one(client, kwargs_list), repeat=1)
+        batch_results, batch_cost = timeit(lambda: batch_call(client, kwargs_list, pool_size), repeat=1)
+    assert [result['data'] for result in batch_results] == [result['data'] for result in sequential_results]
+    return sequential_cost, batch_cost
+
+
+def main_test(cases=None):
+    rows = []
+    for count, latency, pool_size in cases or BENCHMARK_CASES:
+        sequential_cost, batch_cost = benchmark_esb_batch(count, latency, pool_size)
+        rows.append([count, latency, pool_size, sequential_cost, batch_cost])
+    print_table('esb batch call benchmark',
+                ['calls', 'latency(s)', 'pool size', 'one by one(s)', 'batch_call(s)'],
+                rows)
+    return rows
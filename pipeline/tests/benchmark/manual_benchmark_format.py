@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+format_web_data_to_pipeline 耗时及内存基准测试，在 python manage.py shell 中执行：
+    from pipeline.tests.benchmark.manual_benchmark_format import main_test
+    main_test()
+
+retained(KB) 为格式化结果新占用的内存，即不计与输入的 web 流程树共享的对象
+"""
+from pipeline.parser.format import format_web_data_to_pipeline
+from pipeline.tests.benchmark.utils import (
+    generate_web_pipeline_tree,
+    generate_nested_web_pipeline_tree,
+    deep_sizeof,
+    object_ids,
+    node_count,
+    timeit,
+    print_table,
+)
+
+
+def benchmark_format(web_tree):
+    pipeline_tree, cost = timeit(lambda: format_web_data_to_pipeline(web_tree))
+    web_size = deep_sizeof(web_tree)
+    retained_size = deep_sizeof(pipeline_tree, object_ids(web_tree))
+    return cost, web_size, retained_size
+
+
+def main_test():
+    cases = [
+        ('300 acts, 200 constants', generate_web_pipeline_tree(300, constants_count=200)),
+        ('1000 acts, 200 constants', generate_web_pipeline_tree(1000, constants_count=200)),
+        ('3000 acts, 500 constants', generate_web_pipeline_tree(3000, constants_count=500)),
+        ('nested 3 levels, 50 constants each', generate_nested_web_pipeline_tree(50, 3, 3, constants_count=50)[0]),
+    ]
+    rows = []
+    for name, web_tree in cases:
+        cost, web_size, retained_size = benchmark_format(web_tree)
+        rows.append([name, node_count(web_tree), cost, web_size / 1024, retained_size / 1024])
+    print_table('format_web_data_to_pipeline benchmark',
+                ['case', 'nodes', 'format(s)', 'web tree(KB)', 'retained(KB)'],
+                rows)
+    return rows
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+IP 输入解析基准测试，对比原有的多次正则扫描 + 列表查找与单次扫描的 iter_ip_tokens + match_ips_info，
+业务主机列表在内存中生成，不调用配置平台，在 python manage.py shell 中执行：
+    from pipeline.tests.benchmark.manual_benchmark_ip_parser import main_test
+    main_test()
+"""
+import re
+
+from pipeline.components.utils import ip_pattern, iter_ip_tokens, match_ips_info
+from pipeline.tests.benchmark.utils import timeit, print_table
+
+# (IP 数量, 输入格式)
+BENCHMARK_CASES = [
+    (10000, 'ip'),
+    (100000, 'ip'),
+    (100000, 'plat'),
+    (100000, 'set_module'),
+    (100000, 'mixed'),
+]
+
+
+def generate_hosts(count):
+    return [{
+        'InnerIP': '10.%s.%s.%s' % (index / 65536, index / 256 % 256, index % 256),
+        'HostID': index,
+        'Source': 0,
+        'SetID': index % 10,
+        'SetName': 'set%s' % (index % 10),
+        'ModuleID': index % 100,
+        'ModuleName': 'module%s' % (index % 100),
+    } for index in xrange(count)]
+
+
+def generate_ip_str(hosts, ip_format):
+    items = []
+    for index, host in enumerate(hosts):
+        item_format = ip_format if ip_format != 'mixed' else ('ip', 'plat', 'set_module')[index % 3]
+        if item_format == 'plat':
+            items.append('%s:%s' % (host['Source'], host['InnerIP']))
+        elif item_format == 'set_module':
+            items.append('%s|%s|%s' % (host['SetName'], host['ModuleName'], host['InnerIP']))
+        else:
+            items.append(host['InnerIP'])
+    return '\n'.join(items)
+
+
+def legacy_match_ips_info(ip_str, ip_list):
+    """
+    原有实现：按输入开头的格式选择一种解析方式，多次扫描输入，并在列表中查找每个 IP
+    """
+    ip_re = r'(([12][0-9][0-9]|[1-9][0-9]|[0-9])\.){3,3}([12][0-9][0-9]|[1-9][0-9]|[0-9])'
+    plat_ip_reg = re.compile(r'\d+:' + ip_re)
+    set_module_ip_reg = re.compile(ur'[\u4e00-\u9fa5\w]+\|[\u4e00-\u9fa5\w]+\|' + ip_re)
+    ip_input_list = [match.group() for match in ip_pattern.finditer(ip_str)]
+    ip_result = []
+    if set_module_ip_reg.match(ip_str):
+        set_module_ip = [match.group() for match in set_module_ip_reg.finditer(ip_str)]
+        for _ip in ip_list:
+            if '%s|%s|%s' % (_ip['SetName'], _ip['ModuleName'], _ip['InnerIP']) in set_module_ip:
+                ip_result.append(_ip)
+    elif plat_ip_reg.match(ip_str):
+        plat_ip = [match.group() for match in plat_ip_reg.finditer(ip_str)]
+        for _ip in ip_list:
+            if '%s:%s' % (_ip['Source'], _ip['InnerIP']) in plat_ip:
+                ip_result.append(_ip)
+    else:
+        ip = [match.group() for match in ip_pattern.finditer(ip_str)]
+        host_id_list = []
+        for _ip in ip_list:
+            if _ip['InnerIP'] in ip and _ip['HostID'] not in host_id_list:
+                ip_result.append(_ip)
+                host_id_list.append(_ip['HostID'])
+    valid_ip = [_ip['InnerIP'] for _ip in ip_result]
+    return {'ip_result': ip_result, 'invalid_ip': list(set(ip_input_list) - set(valid_ip))}
+
+
+def benchmark_ip_parser(count, ip_format, legacy=True):
+    hosts = generate_hosts(count)
+    ip_str = generate_ip_str(hosts, ip_format)
+    result, cost = timeit(lambda: match_ips_info(list(iter_ip_tokens(ip_str)), hosts), repeat=1)
+    assert result['ip_count'] == count and not result['invalid_ip']
+    legacy_cost = None
+    if legacy:
+        __, legacy_cost = timeit(lambda: legacy_match_ips_info(ip_str, hosts), repeat=1)
+    return cost, legacy_cost
+
+
+def main_test(cases=None, legacy_max_count=10000):
+    """
+    @param legacy_max_count: 原有实现的耗时随 IP 数量平方增长，超过该数量时不执行
+    """
+    rows = []
+    for count, ip_format in cases or BENCHMARK_CASES:
+        cost, legacy_cost = benchmark_ip_parser(count, ip_format, legacy=count <= legacy_max_count)
+        rows.append([count, ip_format, legacy_cost if legacy_cost is not None else '-', cost])
+    print_table('ip parser benchmark',
+                ['ips', 'format', 'legacy(s)', 'single pass(s)'],
+                rows)
+    return rows
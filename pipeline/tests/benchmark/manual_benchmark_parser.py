@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+PipelineParser 解析耗时基准测试，在 python manage.py shell 中执行：
+    from pipeline.tests.benchmark.manual_benchmark_parser import main_test
+    main_test()
+"""
+import copy
+
+from pipeline.parser.cache import pipeline_tree_cache
+from pipeline.parser.format import format_web_data_to_pipeline
+from pipeline.parser.pipeline_parser import PipelineParser, WebPipelineAdapter
+from pipeline.validators.base import validate_web_pipeline_tree
+from pipeline.tests.benchmark.utils import (
+    BENCHMARK_SIZES,
+    generate_web_pipeline_tree,
+    node_count,
+    timeit,
+    print_table,
+)
+
+
+def benchmark_parser(act_count):
+    web_tree = generate_web_pipeline_tree(act_count)
+    validate_web_pipeline_tree(web_tree)
+    pipeline_tree = format_web_data_to_pipeline(web_tree)
+    parser = PipelineParser(copy.deepcopy(pipeline_tree))
+
+    pipeline, parse_cost = timeit(parser.parser)
+    act_id = pipeline_tree['activities'].keys()[-1]
+    __, get_act_cost = timeit(lambda: parser.get_act(act_id))
+    return node_count(web_tree), parse_cost, get_act_cost
+
+
+def benchmark_adapter(act_count):
+    web_tree = generate_web_pipeline_tree(act_count)
+    cache_key = 'benchmark_%s' % act_count
+    pipeline_tree_cache.delete(cache_key)
+
+    __, adapter_cost = timeit(lambda: WebPipelineAdapter(web_tree), repeat=1)
+    WebPipelineAdapter(web_tree, cache_key=cache_key)
+    __, cached_adapter_cost = timeit(lambda: WebPipelineAdapter(web_tree, cache_key=cache_key))
+    pipeline_tree_cache.delete(cache_key)
+    return adapter_cost, cached_adapter_cost
+
+
+def main_test(sizes=None):
+    rows = []
+    for act_count in sizes or BENCHMARK_SIZES:
+        nodes, parse_cost, get_act_cost = benchmark_parser(act_count)
+        adapter_cost, cached_adapter_cost = benchmark_adapter(act_count)
+        rows.append([nodes, parse_cost, parse_cost / nodes * 1000, get_act_cost, adapter_cost, cached_adapter_cost])
+    print_table('PipelineParser benchmark',
+                ['nodes', 'parser(s)', 'ms/node', 'get_act(s)', 'adapter(s)', 'cached adapter(s)'],
+                rows)
+    return rows
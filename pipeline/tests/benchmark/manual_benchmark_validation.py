@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""
+流程树校验耗时基准测试，在 python manage.py shell 中执行：
+    from pipeline.tests.benchmark.manual_benchmark_validation import main_test
+    main_test()
+"""
+from pipeline.parser.format import format_web_data_to_pipeline
+from pipeline.validators.base import validate_web_pipeline_tree, validate_pipeline_tree
+from pipeline.tests.benchmark.utils import (
+    BENCHMARK_SIZES,
+    generate_web_pipeline_tree,
+    node_count,
+    timeit,
+    print_table,
+)
+
+
+def benchmark_validation(act_count):
+    web_tree = generate_web_pipeline_tree(act_count, block_size=30, depth=4)
+    pipeline_tree = format_web_data_to_pipeline(web_tree)
+
+    __, schema_cost = timeit(lambda: validate_web_pipeline_tree(web_tree))
+    __, graph_cost = timeit(lambda: validate_pipeline_tree(pipeline_tree))
+    return node_count(web_tree), schema_cost, graph_cost
+
+
+def main_test(sizes=None):
+    rows = []
+    for act_count in sizes or BENCHMARK_SIZES:
+        nodes, schema_cost, graph_cost = benchmark_validation(act_count)
+        rows.append([nodes, schema_cost, graph_cost, schema_cost + graph_cost])
+    print_table('pipeline tree validation benchmark',
+                ['nodes', 'schema(s)', 'graph(s)', 'total(s)'],
+                rows)
+    return rows
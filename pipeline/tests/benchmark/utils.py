@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+"""
+生成大规模 web 流程树以及计时工具，供 manual_benchmark_* 脚本使用
+"""
+import gc
+import sys
+import time
+
+from pipeline.core.constants import PE
+from pipeline.utils.uniqid import node_uniqid, line_uniqid
+
+BENCHMARK_COMPONENT_CODE = 'sleep_timer'
+BENCHMARK_SIZES = [50, 500, 1000, 2000, 5000]
+
+
+class WebPipelineTreeGenerator(object):
+    """
+    生成与前端画布结构一致的流程树：
+    由 block 串联而成，每个 block 是一组嵌套 depth 层的 并行/分支 网关，网关每个分支上挂载若干任务节点
+    """
+
+    def __init__(self, constants_count=0):
+        self.start_id = node_uniqid()
+        self.end_id = node_uniqid()
+        self.tree = {
+            'id': node_uniqid(),
+            'name': 'benchmark',
+            PE.start_event: {
+                'id': self.start_id,
+                'name': '',
+                'type': PE.EmptyStartEvent,
+                PE.incoming: '',
+                PE.outgoing: '',
+            },
+            PE.end_event: {
+                'id': self.end_id,
+                'name': '',
+                'type': PE.EmptyEndEvent,
+                PE.incoming: '',
+                PE.outgoing: '',
+            },
+            PE.activities: {},
+            PE.gateways: {},
+            PE.flows: {},
+            PE.constants: {},
+            'outputs': [],
+        }
+        self.constant_keys = []
+        for index in xrange(constants_count):
+            key = '${c_%s}' % index
+            self.constant_keys.append(key)
+            # 一部分变量引用前一个变量，模拟真实模板中的变量引用链
+            if index and index % 3 == 0:
+                value = 'ref_${c_%s}' % (index - 1)
+            else:
+                value = 'value_%s' % index
+            self.tree[PE.constants][key] = {
+                'name': 'c_%s' % index,
+                'key': key,
+                'desc': '',
+                'validation': '',
+                'show_type': 'show' if index % 2 else 'hide',
+                'value': value,
+                'source_type': 'custom',
+                'source_tag': '',
+                'source_info': {},
+                'custom_type': 'input',
+                'index': index,
+            }
+
+    def _node(self, node_id):
+        if node_id == self.start_id:
+            return self.tree[PE.start_event]
+        if node_id == self.end_id:
+            return self.tree[PE.end_event]
+        if node_id in self.tree[PE.activities]:
+            return self.tree[PE.activities][node_id]
+        return self.tree[PE.gateways][node_id]
+
+    def connect(self, source_id, target_id):
+        flow_id = line_uniqid()
+        self.tree[PE.flows][flow_id] = {
+            'id': flow_id,
+            'source': source_id,
+            'target': target_id,
+            'is_default': False,
+        }
+        for node_id, field in [(source_id, PE.outgoing), (target_id, PE.incoming)]:
+            node = self._node(node_id)
+            if isinstance(node[field], list):
+                node[field].append(flow_id)
+            else:
+                node[field] = flow_id
+
+        source = self._node(source_id)
+        if source['type'] == PE.ExclusiveGateway:
+            source['conditions'][flow_id] = {
+                'evaluate': '1 == %s' % len(source['conditions']),
+                'tag': 'branch_%s' % len(source['conditions']),
+            }
+        return flow_id
+
+    def add_activity(self, prev_id):
+        act_id = node_uniqid()
+        index = len(self.tree[PE.activities])
+        if self.constant_keys:
+            value = self.constant_keys[index % len(self.constant_keys)]
+        else:
+            value = str(index)
+        self.tree[PE.activities][act_id] = {
+            'id': act_id,
+            'type': PE.ServiceActivity,
+            'name': 'act_%s' % index,
+            PE.incoming: '',
+            PE.outgoing: '',
+            'optional': False,
+            'error_ignorable': False,
+            'component': {
+                'code': BENCHMARK_COMPONENT_CODE,
+                'data': {
+                    'bk_timing': {
+                        'hook': bool(self.constant_keys),
+                        'value': value,
+                    }
+                }
+            }
+        }
+        self.connect(prev_id, act_id)
+        return act_id
+
+    def add_gateway(self, gw_type, prev_id=None):
+        gw_id = node_uniqid()
+        gw = {
+            'id': gw_id,
+            'type': gw_type,
+            'name': '',
+            PE.incoming: [] if gw_type == PE.ConvergeGateway else '',
+            PE.outgoing: '' if gw_type == PE.ConvergeGateway else [],
+        }
+        if gw_type == PE.ExclusiveGateway:
+            gw['conditions'] = {}
+        self.tree[PE.gateways][gw_id] = gw
+        if prev_id:
+            self.connect(prev_id, gw_id)
+        return gw_id
+
+    def add_subprocess(self, prev_id, pipeline_tree):
+        act_id = node_uniqid()
+        self.tree[PE.activities][act_id] = {
+            'id': act_id,
+            'type': PE.SubProcess,
+            'name': 'subprocess_%s' % len(self.tree[PE.activities]),
+            PE.incoming: '',
+            PE.outgoing: '',
+            'optional': False,
+            'template_id': node_uniqid(),
+            'pipeline': pipeline_tree,
+            'hooked_constants': [],
+        }
+        self.connect(prev_id, act_id)
+        return act_id
+
+    def add_chain(self, prev_id, act_count):
+        for __ in xrange(act_count):
+            prev_id = self.add_activity(prev_id)
+        return prev_id
+
+    def add_block(self, prev_id, act_count, depth, branch_width=2):
+        """
+        添加一个嵌套 depth 层网关的块，块内共 act_count 个任务节点（每个分支至少一个），返回块的最后一个节点
+        """
+        if depth <= 0 or act_count < branch_width:
+            return self.add_chain(prev_id, max(act_count, 1))
+
+        gw_type = PE.ParallelGateway if depth % 2 else PE.ExclusiveGateway
+        gw_id = self.add_gateway(gw_type, prev_id)
+        converge_id = self.add_gateway(PE.ConvergeGateway)
+        # 第一个分支继续向下嵌套，其他分支平铺任务节点
+        branch_count = act_count // branch_width
+        first_count = act_count - branch_count * (branch_width - 1)
+        tail = self.add_block(gw_id, first_count, depth - 1, branch_width)
+        self.connect(tail, converge_id)
+        for __ in xrange(branch_width - 1):
+            tail = self.add_chain(gw_id, max(branch_count, 1))
+            self.connect(tail, converge_id)
+        return converge_id
+
+    def add_nested_block(self, prev_id, depth, branch_width=2, chain_count=1):
+        """
+        添加一个嵌套 depth 层网关的块：最外层网关的第一个分支上串联 chain_count 个 depth - 1 层的嵌套块，
+        内层网关的第一个分支继续向下嵌套，所有网关的其他分支各挂载一个任务节点
+        """
+        if depth <= 0:
+            return self.add_activity(prev_id)
+
+        gw_id, converge_id = self._add_gateway_pair(prev_id, depth)
+        tail = gw_id
+        for __ in xrange(chain_count):
+            tail = self._add_nested_chain(tail, depth - 1, branch_width)
+        return self._close_gateway_pair(gw_id, converge_id, tail, branch_width)
+
+    def _add_nested_chain(self, prev_id, depth, branch_width):
+        # 嵌套层数可能超过递归深度限制，逐层展开
+        opened = []
+        for level in xrange(depth, 0, -1):
+            prev_id, converge_id = self._add_gateway_pair(prev_id, level)
+            opened.append((prev_id, converge_id))
+        tail = self.add_activity(prev_id)
+        for gw_id, converge_id in reversed(opened):
+            tail = self._close_gateway_pair(gw_id, converge_id, tail, branch_width)
+        return tail
+
+    def _add_gateway_pair(self, prev_id, level):
+        gw_type = PE.ParallelGateway if level % 2 else PE.ExclusiveGateway
+        return self.add_gateway(gw_type, prev_id), self.add_gateway(PE.ConvergeGateway)
+
+    def _close_gateway_pair(self, gw_id, converge_id, tail, branch_width):
+        self.connect(tail, converge_id)
+        for __ in xrange(branch_width - 1):
+            self.connect(self.add_activity(gw_id), converge_id)
+        return converge_id
+
+    def generate(self, act_count, block_size=10, depth=1, branch_width=2):
+        prev_id = self.start_id
+        remain = act_count
+        while remain > 0:
+            size = min(block_size, remain)
+            prev_id = self.add_block(prev_id, size, depth, branch_width)
+            remain -= size
+        self.connect(prev_id, self.end_id)
+        return self.tree
+
+
+def generate_web_pipeline_tree(act_count, block_size=10, depth=1, branch_width=2, constants_count=0):
+    return WebPipelineTreeGenerator(constants_count).generate(act_count, block_size, depth, branch_width)
+
+
+def generate_deep_web_pipeline_tree(depth, branch_width=2, chain_count=1, block_count=1):
+    """
+    生成由 block_count 个嵌套 depth 层网关的块串联而成的流程树
+    """
+    generator = WebPipelineTreeGenerator()
+    prev_id = generator.start_id
+    for __ in xrange(block_count):
+        prev_id = generator.add_nested_block(prev_id, depth, branch_width, chain_count)
+    generator.connect(prev_id, generator.end_id)
+    return generator.tree
+
+
+def generate_nested_web_pipeline_tree(act_count, sub_depth, sub_count=2, constants_count=0):
+    """
+    生成每一层都包含 act_count 个任务节点以及 sub_count 个子流程、嵌套 sub_depth 层的流程树
+    @return: 流程树，以及最内层某个子流程的 subprocess_stack
+    """
+    generator = WebPipelineTreeGenerator(constants_count)
+    prev_id = generator.add_block(generator.start_id, act_count, depth=1)
+    stack = []
+    if sub_depth > 0:
+        for __ in xrange(sub_count):
+            sub_tree, sub_stack = generate_nested_web_pipeline_tree(act_count, sub_depth - 1,
+                                                                   sub_count, constants_count)
+            prev_id = generator.add_subprocess(prev_id, sub_tree)
+            stack = [prev_id] + sub_stack
+    generator.connect(prev_id, generator.end_id)
+    return generator.tree, stack
+
+
+def node_count(tree):
+    count = len(tree[PE.gateways]) + 2
+    for act in tree[PE.activities].values():
+        count += 1
+        if act['type'] == PE.SubProcess:
+            count += node_count(act['pipeline'])
+    return count
+
+
+def deep_sizeof(obj, seen=None):
+    """
+    计算对象及其引用的所有 dict/list/字符串 占用的内存（字节），seen 中已有的对象不重复计算
+    """
+    if seen is None:
+        seen = set()
+    size = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.iterkeys())
+            stack.extend(item.itervalues())
+        elif isinstance(item, (list, tuple)):
+            stack.extend(item)
+    return size
+
+
+def object_ids(obj):
+    """
+    获取对象及其引用的所有对象的 id
+    """
+    seen = set()
+    deep_sizeof(obj, seen)
+    return seen
+
+
+def timeit(func, repeat=3):
+    """
+    执行 func repeat 次，返回最后一次的结果以及最短耗时（秒）
+    """
+    best = None
+    result = None
+    for __ in xrange(repeat):
+        gc.collect()
+        start = time.time()
+        result = func()
+        cost = time.time() - start
+        if best is None or cost < best:
+            best = cost
+    return result, best
+
+
+def print_table(title, headers, rows):
+    print title
+    print '\t'.join(headers)
+    for row in rows:
+        print '\t'.join([('%.4f' % col) if isinstance(col, float) else str(col) for col in row])
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+import time
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from pipeline.components.host_index import HostIndex, format_host
+
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
+def host(host_id, ip, module_id=1):
+    return format_host({
+        'host': {'bk_host_id': host_id, 'bk_host_innerip': ip, 'bk_cloud_id': [{'bk_inst_id': 0}]},
+        'set': [{'bk_set_id': 1, 'bk_set_name': 'set'}],
+        'module': [{'bk_module_id': module_id, 'bk_module_name': 'module%s' % module_id, 'bk_set_id': 1}],
+    })
+
+
+class FakeHostIndex(HostIndex):
+    """
+    使用内存中的主机代替配置平台查询
+    """
+
+    def __init__(self, hosts):
+        super(FakeHostIndex, self).__init__()
+        self.hosts = hosts
+        self.searches = []
+        self.usernames = []
+        self.result = True
+
+    def search_hosts(self, username, biz_cc_id, ip_list=None, since=None):
+        self.searches.append((ip_list, since))
+        self.usernames.append(username)
+        if not self.result:
+            return {'result': False, 'message': 'error'}
+        hosts = {}
+        for item in self.hosts:
+            if username in item.get('hidden_from', []):
+                continue
+            if ip_list and item['bk_host_innerip'] not in ip_list:
+                continue
+            if since and item.get('last_time', 0) < since:
+                continue
+            hosts[item['bk_host_innerip']] = item
+        return {'result': True, 'data': hosts}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TestHostIndex(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.index = FakeHostIndex([host(1, '1.1.1.1'), host(2, '2.2.2.2'), host(3, '3.3.3.3')])
+
+    def test_format_host(self):
+        item = host(1, '1.1.1.1,1.1.1.2')
+        self.assertEqual(item['bk_cloud_id'], 0)
+        self.assertEqual(item['bk_module'], [{'bk_module_id': 1, 'bk_module_name': 'module1', 'bk_set_id': 1}])
+
+    def test_get_hosts_fallback_to_search(self):
+        result = self.index.get_hosts('admin', 1, ['1.1.1.1', '4.4.4.4'])
+        self.assertEqual(result['data'].keys(), ['1.1.1.1'])
+        self.assertEqual(self.index.searches, [(['1.1.1.1', '4.4.4.4'], None)])
+
+        # 已查询到的主机写回索引，只需要再查询不存在的 IP
+        result = self.index.get_hosts('admin', 1, ['1.1.1.1', '4.4.4.4'])
+        self.assertEqual(result['data']['1.1.1.1']['bk_host_id'], 1)
+        self.assertEqual(self.index.searches[-1], (['4.4.4.4'], None))
+
+        self.index.searches = []
+        self.index.get_hosts('admin', 1, ['1.1.1.1'])
+        self.assertEqual(self.index.searches, [])
+
+        # 其他进程从缓存中加载同一个索引
+        other = FakeHostIndex([])
+        self.assertEqual(other.get_hosts('admin', 1, ['1.1.1.1'])['data']['1.1.1.1']['bk_host_id'], 1)
+        self.assertEqual(other.searches, [])
+
+    def test_search_error(self):
+        self.index.result = False
+        self.assertFalse(self.index.get_hosts('admin', 1, ['1.1.1.1'])['result'])
+        self.assertFalse(self.index.get_all_hosts('admin', 1)['result'])
+
+    def test_get_all_hosts(self):
+        self.index.get_hosts('admin', 1, ['1.1.1.1'])
+        # 部分写回的索引不完整，需要全量刷新
+        result = self.index.get_all_hosts('admin', 1)
+        self.assertEqual(len(result['data']), 3)
+        self.assertEqual(self.index.searches[-1], (None, None))
+
+        self.index.searches = []
+        self.assertEqual(len(self.index.get_all_hosts('admin', 1)['data']), 3)
+        self.assertEqual(self.index.searches, [])
+
+    def test_incremental_refresh(self):
+        self.index.refresh('admin', 1)
+        refresh_time = self.index.load('admin', 1)[0]['refresh_time']
+
+        changed = host(2, '2.2.2.2', module_id=2)
+        changed['last_time'] = time.time()
+        self.index.hosts = [changed, host(4, '4.4.4.4')]
+        self.index.refresh('admin', 1)
+        self.assertEqual(self.index.searches[-1][1], refresh_time - 60)
+
+        hosts = self.index.get_all_hosts('admin', 1)['data']
+        self.assertEqual(sorted(hosts.keys()), ['1.1.1.1', '2.2.2.2', '3.3.3.3'])
+        self.assertEqual(hosts['2.2.2.2']['bk_module'][0]['bk_module_id'], 2)
+
+        # 全量刷新后移除已不属于该业务的主机
+        self.index.refresh('admin', 1, full=True)
+        self.assertEqual(sorted(self.index.get_all_hosts('admin', 1)['data'].keys()), ['2.2.2.2', '4.4.4.4'])
+
+    def test_refresh_active(self):
+        self.index.get_hosts('admin', 1, ['1.1.1.1'])
+        self.index.get_hosts('admin', 2, ['2.2.2.2'])
+        self.assertEqual(self.index.refresh_active(), 2)
+        self.assertTrue(self.index.load('admin', 1)[0]['complete'])
+        self.assertTrue(self.index.load('admin', 2)[0]['complete'])
+
+    def test_index_per_user(self):
+        hidden = host(4, '4.4.4.4')
+        hidden['hidden_from'] = ['guest']
+        self.index.hosts.append(hidden)
+        self.assertEqual(len(self.index.get_all_hosts('admin', 1)['data']), 4)
+        self.assertEqual(len(self.index.get_all_hosts('guest', 1)['data']), 3)
+        self.assertEqual(self.index.get_hosts('guest', 1, ['4.4.4.4'])['data'], {})
+
+        # 周期任务以各自用户的权限刷新
+        self.index.usernames = []
+        self.assertEqual(self.index.refresh_active(), 2)
+        self.assertEqual(sorted(self.index.usernames), ['admin', 'guest'])
+        self.assertEqual(len(self.index.get_all_hosts('guest', 1)['data']), 3)
+
+    def test_invalidate(self):
+        self.index.get_all_hosts('admin', 1)
+        self.index.get_all_hosts('admin', 2)
+        self.index.hosts = [host(1, '1.1.1.1', module_id=2)]
+        self.index.invalidate(1)
+        self.assertEqual(self.index.load('admin', 1), (None, {}))
+        self.assertIsNotNone(self.index.load('admin', 2)[0])
+        hosts = self.index.get_all_hosts('admin', 1)['data']
+        self.assertEqual(hosts.keys(), ['1.1.1.1'])
+        self.assertEqual(hosts['1.1.1.1']['bk_module'][0]['bk_module_id'], 2)
+
+    def test_generation_evicted(self):
+        self.index.get_all_hosts('admin', 1)
+        # 代数被缓存淘汰后不会读到之前的索引
+        cache.delete(self.index._generation_key(1))
+        self.assertEqual(self.index.load('admin', 1), (None, {}))
+
+    @override_settings(PIPELINE_HOST_INDEX_LOCAL_SIZE=2)
+    def test_local_size(self):
+        for biz_cc_id in xrange(5):
+            self.index.get_all_hosts('admin', biz_cc_id)
+        self.assertEqual(len(self.index._loaded), 2)
+        # 被淘汰的索引仍然可以从缓存中加载
+        self.index.searches = []
+        self.assertEqual(len(self.index.get_all_hosts('admin', 0)['data']), 3)
+        self.assertEqual(self.index.searches, [])
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+from django.test import TestCase
+
+from pipeline.components.utils import (
+    get_ip_by_regex,
+    iter_ip_tokens,
+    iter_ip_batches,
+    match_ips_info,
+)
+
+
+def host_row(host_id, ip, source=0, set_name='set', module_name='module'):
+    return {
+        'InnerIP': ip,
+        'HostID': host_id,
+        'Source': source,
+        'SetID': 1,
+        'SetName': set_name,
+        'ModuleID': 2,
+        'ModuleName': module_name,
+    }
+
+
+class TestIPParser(TestCase):
+    def test_get_ip_by_regex(self):
+        self.assertEqual(get_ip_by_regex('1.1.1.1,2.2.2.2\n1.1.1.1;0:3.3.3.3 a|b|4.4.4.4'),
+                         ['1.1.1.1', '2.2.2.2', '1.1.1.1', '3.3.3.3', '4.4.4.4'])
+
+    def test_iter_ip_tokens(self):
+        tokens = list(iter_ip_tokens(u'1.1.1.1,2:1.1.1.1\n集群|模块|1.1.1.1,1.1.1.1 2:1.1.1.1'))
+        self.assertEqual([tuple(token) for token in tokens], [
+            ('1.1.1.1', None, None, None),
+            ('1.1.1.1', '2', None, None),
+            ('1.1.1.1', None, u'集群', u'模块'),
+        ])
+        self.assertEqual(len(list(iter_ip_tokens('1.1.1.1,1.1.1.1', unique=False))), 2)
+
+    def test_iter_ip_batches(self):
+        ip_str = ','.join(['10.0.%s.%s' % (index / 100, index % 100) for index in xrange(250)] + ['0:10.0.0.0'])
+        batches = list(iter_ip_batches(ip_str, 100))
+        self.assertEqual([len(batch) for batch in batches], [100, 100, 50])
+        self.assertEqual(batches[0][0], '10.0.0.0')
+
+    def test_match_ips_info(self):
+        ip_list = [
+            host_row(1, '1.1.1.1'),
+            host_row(1, '1.1.1.1', module_name='module2'),
+            host_row(2, '2.2.2.2', source=3),
+            host_row(3, '3.3.3.3', set_name=u'集群', module_name=u'模块'),
+        ]
+        result = match_ips_info(list(iter_ip_tokens(u'1.1.1.1 3:2.2.2.2 集群|模块|3.3.3.3 5.5.5.5 0:2.2.2.2')),
+                                ip_list)
+        self.assertEqual([(item['HostID'], item['InnerIP']) for item in result['ip_result']],
+                         [(1, '1.1.1.1'), (2, '2.2.2.2'), (3, '3.3.3.3')])
+        self.assertEqual(result['ip_result'][1], {'InnerIP': '2.2.2.2', 'HostID': 2, 'Source': 3})
+        self.assertEqual(result['ip_result'][2]['ModuleName'], u'模块')
+        self.assertEqual(result['ip_count'], 3)
+        self.assertEqual(result['invalid_ip'], ['5.5.5.5'])
+
+    def test_match_ips_info_empty(self):
+        self.assertEqual(match_ips_info([], []),
+                         {'result': True, 'ip_result': [], 'ip_count': 0, 'invalid_ip': []})
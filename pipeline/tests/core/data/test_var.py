@@ -1,7 +1,16 @@
+# -*- coding: utf-8 -*-
+from django.core.cache import cache
 from django.test import TestCase
+from django.test.utils import override_settings
 from pipeline.core.data import var, context, base
 from pipeline import exceptions
 
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
 
 class TestPlainVariable(TestCase):
     def test_get(self):
@@ -74,3 +83,101 @@ class TestLazyVariable(TestCase):
         self.assertEqual(v.k1, 'v1')
         self.assertEqual(v.k2, 'v2')
         self.assertEqual(v.k3, 'v3')
+
+    def test_falsy_value_resolved_once(self):
+        ctx = context.Context({})
+        ctx.variables['${key}'] = ''
+        sv = var.SpliceVariable(name='name', value='${key}', context=ctx)
+        self.assertEqual(sv.get(), '')
+        ctx.variables['${key}'] = 'changed'
+        self.assertEqual(sv.get(), '')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TestLazyVariableMemo(TestCase):
+    def setUp(self):
+        cache.clear()
+        calls = self.calls = []
+
+        class CountVar(var.LazyVariable):
+            code = 'test_count_var'
+            cache_scope = ('biz_cc_id',)
+
+            def get_value(self):
+                calls.append(self.value)
+                if self.value == 'error':
+                    raise exceptions.VariableHydrateException('error')
+                return [] if self.value == 'empty' else [self.value]
+
+        class SharedCountVar(CountVar):
+            code = 'test_shared_count_var'
+            cache_ttl = 60
+
+        self.var_cls = CountVar
+        self.shared_var_cls = SharedCountVar
+
+    def new_var(self, var_cls, value, biz_cc_id=1):
+        return var_cls('name', value, context.Context({}), {'biz_cc_id': biz_cc_id})
+
+    def test_memo_in_pipeline(self):
+        v = self.new_var(self.var_cls, 'value')
+        self.assertEqual(v.get(), ['value'])
+        v.get().append('modified')
+        self.assertEqual(v.get(), ['value'])
+        self.assertEqual(len(self.calls), 1)
+
+        empty = self.new_var(self.var_cls, 'empty')
+        self.assertEqual(empty.get(), [])
+        self.assertEqual(empty.get(), [])
+        self.assertEqual(len(self.calls), 2)
+
+        # 未声明 cache_ttl 时不在流程之间共享
+        self.new_var(self.var_cls, 'value').get()
+        self.assertEqual(len(self.calls), 3)
+
+    def test_pickled_by_older_version(self):
+        v = self.new_var(self.var_cls, 'value')
+        del v._memo
+        del v._resolved
+        self.assertEqual(v.get(), ['value'])
+        self.assertEqual(v.get(), ['value'])
+        self.assertEqual(len(self.calls), 1)
+
+    def test_shared_cache(self):
+        self.assertEqual(self.new_var(self.shared_var_cls, 'value').get(), ['value'])
+        self.assertEqual(self.new_var(self.shared_var_cls, 'value').get(), ['value'])
+        self.assertEqual(len(self.calls), 1)
+
+        self.new_var(self.shared_var_cls, 'empty').get()
+        self.assertEqual(self.new_var(self.shared_var_cls, 'empty').get(), [])
+        self.assertEqual(len(self.calls), 2)
+
+        # 不同业务不共享
+        self.new_var(self.shared_var_cls, 'value', biz_cc_id=2).get()
+        self.assertEqual(len(self.calls), 3)
+
+    def test_unserializable_value_not_memoized(self):
+        v = self.new_var(self.shared_var_cls, object())
+        v.get()
+        v.get()
+        self.assertEqual(len(self.calls), 2)
+
+    def test_failed_value_not_memoized(self):
+        v = self.new_var(self.shared_var_cls, 'error')
+        self.assertRaises(exceptions.VariableHydrateException, v.get)
+        self.assertRaises(exceptions.VariableHydrateException, v.get)
+        self.assertRaises(exceptions.VariableHydrateException, self.new_var(self.shared_var_cls, 'error').get)
+        self.assertEqual(len(self.calls), 3)
+
+    def test_memo_not_pickled(self):
+        v = self.new_var(self.var_cls, 'value')
+        v.get()
+        state = v.__getstate__()
+        self.assertIsNone(state['_memo'])
+        self.assertIsNotNone(v._memo)
+
+        # 重试节点时从 pickle 恢复的变量重新计算
+        restored = self.var_cls.__new__(self.var_cls)
+        restored.__dict__.update(state)
+        self.assertEqual(restored.get(), ['value'])
+        self.assertEqual(len(self.calls), 2)
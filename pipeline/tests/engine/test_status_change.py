@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+import datetime
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from pipeline.engine import api, states
+from pipeline.engine.models import Status, StatusChange, NodeRelationship
+
+
+@override_settings(PIPELINE_STATUS_CHANGE_SAFE_LAG=0)
+class TestStatusChange(TestCase):
+    def setUp(self):
+        self.root_id = 'root'
+        self.sub_id = 'sub'
+        Status.objects.create(id=self.root_id, state=states.READY, version='v')
+        NodeRelationship.objects.build_relationship(self.root_id, self.root_id)
+        NodeRelationship.objects.build_relationship(self.root_id, self.sub_id)
+
+    def transitions(self, changes):
+        return [(change['node_id'], change['from_state'], change['to_state']) for change in changes]
+
+    def test_transit_records_changes(self):
+        Status.objects.transit(self.root_id, states.RUNNING, is_pipeline=True)
+        Status.objects.transit(self.sub_id, states.RUNNING)
+        # 不能转换的状态不会被记录
+        Status.objects.transit(self.sub_id, states.READY)
+        Status.objects.transit(self.sub_id, states.BLOCKED, is_pipeline=True)
+        Status.objects.batch_transit([self.sub_id], states.RUNNING, from_state=states.BLOCKED)
+        Status.objects.batch_transit([self.sub_id], states.RUNNING, from_state=states.BLOCKED)
+
+        changes = StatusChange.objects.changes_for(self.root_id)
+        self.assertEqual(self.transitions(changes), [
+            (self.root_id, states.READY, states.RUNNING),
+            (self.sub_id, '', states.RUNNING),
+            (self.sub_id, states.RUNNING, states.BLOCKED),
+            (self.sub_id, states.BLOCKED, states.RUNNING),
+        ])
+        self.assertEqual(self.transitions(StatusChange.objects.changes_for(self.sub_id)),
+                         self.transitions(changes[1:]))
+
+    def test_get_status_changes(self):
+        Status.objects.transit(self.root_id, states.RUNNING, is_pipeline=True)
+        Status.objects.transit('other', states.RUNNING)
+        result = api.get_status_changes(self.root_id)
+        self.assertEqual(self.transitions(result['changes']), [(self.root_id, states.READY, states.RUNNING)])
+
+        # 没有新的变更时游标保持不变
+        cursor = result['cursor']
+        self.assertEqual(api.get_status_changes(self.root_id, cursor=cursor), {'cursor': cursor, 'changes': []})
+
+        Status.objects.transit(self.sub_id, states.RUNNING)
+        result = api.get_status_changes(self.root_id, cursor=cursor, wait=1)
+        self.assertEqual(self.transitions(result['changes']), [(self.sub_id, '', states.RUNNING)])
+        self.assertGreater(result['cursor'], cursor)
+
+    def test_finished_pipeline_does_not_wait(self):
+        Status.objects.transit(self.root_id, states.RUNNING, is_pipeline=True)
+        Status.objects.transit(self.root_id, states.FINISHED, is_pipeline=True)
+        cursor = api.get_status_changes(self.root_id)['cursor']
+        with self.settings(PIPELINE_STATUS_CHANGE_POLL_INTERVAL=10):
+            result = api.get_status_changes(self.root_id, cursor=cursor, wait=10)
+        self.assertEqual(result['changes'], [])
+
+    def test_recent_changes_held_back(self):
+        Status.objects.transit(self.root_id, states.RUNNING, is_pipeline=True)
+        Status.objects.transit(self.sub_id, states.RUNNING)
+        changes = StatusChange.objects.changes_for(self.root_id)
+        StatusChange.objects.filter(id=changes[0]['id']).update(
+            created_time=timezone.now() - datetime.timedelta(seconds=10))
+
+        # 在第一条较新的记录处截断
+        changes = StatusChange.objects.changes_for(self.root_id, lag=5)
+        self.assertEqual(self.transitions(changes), [(self.root_id, states.READY, states.RUNNING)])
+        with self.settings(PIPELINE_STATUS_CHANGE_SAFE_LAG=5):
+            result = api.get_status_changes(self.root_id)
+        self.assertEqual(result['cursor'], changes[0]['id'])
+        self.assertEqual(len(result['changes']), 1)
+
+    def test_clean_expired(self):
+        Status.objects.transit(self.root_id, states.RUNNING, is_pipeline=True)
+        Status.objects.transit(self.sub_id, states.RUNNING)
+        Status.objects.transit(self.sub_id, states.FINISHED)
+        expired = [change['id'] for change in StatusChange.objects.changes_for(self.root_id)[:2]]
+        StatusChange.objects.filter(id__in=expired).update(created_time=timezone.now() - datetime.timedelta(days=8))
+
+        self.assertEqual(StatusChange.objects.clean_expired(7, batch_size=1), 2)
+        self.assertEqual(self.transitions(StatusChange.objects.changes_for(self.root_id)),
+                         [(self.sub_id, states.RUNNING, states.FINISHED)])
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+from django.test import TestCase
+
+from pipeline.engine import api, states, exceptions
+from pipeline.engine.models import Status, NodeRelationship
+
+
+class TestStatusTrees(TestCase):
+    def setUp(self):
+        # root_n -> [act_n, sub_n -> [sub_act_n]]
+        self.roots = []
+        for i in xrange(3):
+            root_id, act_id, sub_id, sub_act_id = ['root_%s' % i, 'act_%s' % i, 'sub_%s' % i, 'sub_act_%s' % i]
+            for node_id in [root_id, act_id, sub_id, sub_act_id]:
+                Status.objects.create(id=node_id, state=states.RUNNING, version='v')
+            NodeRelationship.objects.build_relationship(root_id, root_id)
+            NodeRelationship.objects.build_relationship(root_id, act_id)
+            NodeRelationship.objects.build_relationship(root_id, sub_id)
+            NodeRelationship.objects.build_relationship(sub_id, sub_act_id)
+            self.roots.append(root_id)
+
+    def test_get_status_trees(self):
+        trees = api.get_status_trees(self.roots + ['not_exist'], max_depth=99)
+        self.assertEqual(sorted(trees.keys()), self.roots)
+        tree = trees['root_0']
+        self.assertEqual(sorted(tree['children'].keys()), ['act_0', 'sub_0'])
+        self.assertEqual(tree['children']['act_0']['children'], {})
+        self.assertEqual(tree['children']['sub_0']['children'].keys(), ['sub_act_0'])
+        self.assertEqual(tree, api.get_status_tree('root_0', max_depth=99))
+
+    def test_max_depth(self):
+        trees = api.get_status_trees(self.roots, max_depth=0)
+        self.assertNotIn('children', trees['root_0'])
+
+        trees = api.get_status_trees(self.roots, max_depth=1)
+        tree = trees['root_0']
+        self.assertEqual(sorted(tree['children'].keys()), ['act_0', 'sub_0'])
+        # 超过深度的节点不加载子节点
+        self.assertNotIn('children', tree['children']['sub_0'])
+
+    def test_query_count(self):
+        with self.assertNumQueries(1):
+            api.get_status_trees(self.roots, max_depth=0)
+        with self.assertNumQueries(2):
+            api.get_status_trees(self.roots, max_depth=99)
+
+    def test_node_not_exist(self):
+        self.assertRaises(exceptions.InvalidOperationException, api.get_status_tree, 'not_exist')
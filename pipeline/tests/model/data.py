@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+from pipeline.utils.uniqid import node_uniqid, line_uniqid
+
+
+def constant(index, show_type='hide', value=''):
+    key = '${c_%s}' % index
+    return key, {
+        'name': 'c_%s' % index,
+        'key': key,
+        'desc': '',
+        'validation': '',
+        'show_type': show_type,
+        'value': value or 'value_%s' % index,
+        'source_type': 'custom',
+        'source_tag': '',
+        'source_info': {},
+        'custom_type': 'input',
+        'index': index,
+    }
+
+
+def service_activity(code='sleep_timer', value='1'):
+    return {
+        'type': 'ServiceActivity',
+        'name': 'sleep',
+        'optional': False,
+        'error_ignorable': False,
+        'component': {
+            'code': code,
+            'data': {
+                'bk_timing': {
+                    'hook': value.startswith('${'),
+                    'value': value,
+                }
+            }
+        }
+    }
+
+
+def subprocess_activity(template_id, constants=None):
+    return {
+        'type': 'SubProcess',
+        'name': 'subprocess',
+        'optional': False,
+        'template_id': template_id,
+        'constants': constants or {},
+        'hooked_constants': [],
+    }
+
+
+def web_pipeline_tree(activities, constants=None):
+    """
+    @summary: 生成 开始节点 -> activities -> 结束节点 依次相连的 web 流程树，每次调用生成的 ID 都不相同
+    @param activities: 不带 id、incoming、outgoing 的节点数据列表
+    @param constants: 全局变量列表 [(key, constant)]
+    """
+    start_id = node_uniqid()
+    end_id = node_uniqid()
+    tree = {
+        'id': node_uniqid(),
+        'name': 'name',
+        'start_event': {'id': start_id, 'name': '', 'type': 'EmptyStartEvent', 'incoming': '', 'outgoing': ''},
+        'end_event': {'id': end_id, 'name': '', 'type': 'EmptyEndEvent', 'incoming': '', 'outgoing': ''},
+        'activities': {},
+        'gateways': {},
+        'flows': {},
+        'constants': dict(constants or []),
+        'outputs': [],
+    }
+    nodes = [tree['start_event']]
+    for act in activities:
+        act_id = node_uniqid()
+        tree['activities'][act_id] = dict(act, id=act_id)
+        nodes.append(tree['activities'][act_id])
+    nodes.append(tree['end_event'])
+
+    for source, target in zip(nodes[:-1], nodes[1:]):
+        flow_id = line_uniqid()
+        tree['flows'][flow_id] = {'id': flow_id, 'source': source['id'], 'target': target['id'], 'is_default': False}
+        source['outgoing'] = flow_id
+        target['incoming'] = flow_id
+    return tree
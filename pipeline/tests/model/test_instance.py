@@ -1,6 +1,17 @@
+# -*- coding: utf-8 -*-
+import copy
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
-from pipeline.models import PipelineInstance, PipelineTemplate
+from pipeline import models
+from pipeline.engine import api, signals
+from pipeline.engine.models import Status, PipelineModel, StatusChange, FunctionSwitch
+from pipeline.engine.signals import handlers
+from pipeline.core.pipeline import Pipeline
+from pipeline.models import PipelineInstance, PipelineTemplate, Snapshot, snapshot_data_cache
+from pipeline.tests.model.data import constant, service_activity, subprocess_activity, web_pipeline_tree
 
 
 class TestPipelineInstance(TestCase):
@@ -42,3 +53,149 @@ class TestPipelineInstance(TestCase):
         self.assertTrue(i3.is_deleted)
 
 
+class TestBulkCreateInstances(TestCase):
+    def setUp(self):
+        sub_tree = web_pipeline_tree([service_activity() for __ in xrange(5)])
+        self.sub_template = PipelineTemplate.objects.create_model(sub_tree, creator='tester')
+        activities = [service_activity(value='${c_0}')]
+        activities.extend([subprocess_activity(self.sub_template.template_id) for __ in xrange(3)])
+        self.tree = web_pipeline_tree(activities, [constant(0), constant(1, show_type='show')])
+        self.template = PipelineTemplate.objects.create_model(self.tree, creator='tester')
+
+    def bulk_create(self, count):
+        items = []
+        for index in xrange(count):
+            exec_data = copy.deepcopy(self.tree)
+            exec_data['constants']['${c_0}']['value'] = index
+            items.append({'exec_data': exec_data, 'name': 'task_%s' % index, 'creator': 'tester'})
+        snapshot_data_cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            results = PipelineInstance.objects.bulk_create_instances(self.template, items)
+        self.assertTrue(all([result for result, __ in results]))
+        return [instance for __, instance in results], len(context.captured_queries)
+
+    def test_bulk_create_queries(self):
+        # 查询次数与创建的实例数量无关
+        __, queries = self.bulk_create(2)
+        __, more_queries = self.bulk_create(20)
+        self.assertEqual(queries, more_queries)
+
+    def test_bulk_create_instances(self):
+        instances, __ = self.bulk_create(10)
+        self.assertEqual(len(instances), 10)
+        node_ids = set()
+        for index, instance in enumerate(instances):
+            instance = PipelineInstance.objects.get(id=instance.id)
+            self.assertEqual(instance.name, 'task_%s' % index)
+            self.assertEqual(instance.snapshot_id, self.template.snapshot_id)
+            self.assertEqual(instance.node_count, 6)
+            exec_data = instance.execution_data
+            self.assertEqual(exec_data['id'], instance.instance_id)
+            self.assertEqual(exec_data['constants']['${c_0}']['value'], index)
+            self.assertEqual(len(instance.execution_snapshot.subprocess_refs), 3)
+            for act in exec_data['activities'].values():
+                if act['type'] == 'SubProcess':
+                    self.assertEqual(len(act['pipeline']['activities']), 5)
+            node_ids.update(exec_data['activities'].keys())
+        self.assertEqual(len(node_ids), 40)
+        self.assertEqual(Snapshot.objects.filter(execution_snapshot__in=instances).count(), 10)
+
+    def test_bulk_create_subprocess_not_exist(self):
+        missing = copy.deepcopy(self.tree)
+        for act in missing['activities'].values():
+            if act['type'] == 'SubProcess':
+                act['template_id'] = 'not_exist'
+                break
+        items = [{'exec_data': copy.deepcopy(self.tree), 'name': 'task_0', 'creator': 'tester'},
+                 {'exec_data': missing, 'name': 'task_1', 'creator': 'tester'}]
+        results = PipelineInstance.objects.bulk_create_instances(self.template, items)
+        self.assertTrue(results[0][0])
+        self.assertFalse(results[1][0])
+        self.assertIn('not_exist', results[1][1])
+        self.assertEqual(PipelineInstance.objects.filter(template=self.template).count(), 1)
+
+
+class TestBatchStart(TestCase):
+    def setUp(self):
+        tree = web_pipeline_tree([service_activity(code='not_exist') for __ in xrange(3)])
+        self.template = PipelineTemplate.objects.create_model(tree, creator='tester')
+        self.instances = [PipelineInstance.objects.create_instance(self.template, copy.deepcopy(tree), creator='tester')
+                          for __ in xrange(3)]
+
+    def test_batch_start_failures(self):
+        PipelineInstance.objects.set_started(self.instances[0].instance_id, 'tester')
+        started = PipelineInstance.objects.get(id=self.instances[0].id)
+        instances = [started] + self.instances[1:]
+        results = PipelineInstance.objects.batch_start(instances, 'tester', pool_size=1)
+        self.assertEqual(results[started.id], (False, 'pipeline instance already started.'))
+        for instance in self.instances[1:]:
+            success, message = results[instance.id]
+            self.assertFalse(success)
+            self.assertTrue(message.startswith('pipeline instance parse error'))
+        # 解析失败的实例不会被标记为已启动
+        self.assertEqual(PipelineInstance.objects.filter(is_started=True).count(), 1)
+
+    def batch_start_with(self, start_pipelines):
+        # 跳过解析，只验证启动失败时对启动标记的处理
+        origin_parse, origin_start = models._parse_instance, api.start_pipelines
+        models._parse_instance = lambda instance: (True, instance.instance_id)
+        api.start_pipelines = start_pipelines
+        try:
+            return PipelineInstance.objects.batch_start(self.instances, 'tester', pool_size=1)
+        finally:
+            models._parse_instance, api.start_pipelines = origin_parse, origin_start
+
+    def test_batch_start_frozen(self):
+        results = self.batch_start_with(lambda pipelines: False)
+        for instance in self.instances:
+            self.assertEqual(results[instance.id], (False, 'pipeline start error: function switch is frozen'))
+        self.assertEqual(PipelineInstance.objects.filter(is_started=True).count(), 0)
+
+    def test_batch_start_error(self):
+        def start_pipelines(pipelines):
+            raise ValueError('start error')
+
+        results = self.batch_start_with(start_pipelines)
+        for instance in self.instances:
+            self.assertEqual(results[instance.id], (False, 'pipeline start error: start error'))
+        self.assertEqual(PipelineInstance.objects.filter(is_started=True).count(), 0)
+
+    def test_batch_start(self):
+        started = []
+        results = self.batch_start_with(lambda pipelines: started.extend(pipelines) or True)
+        self.assertEqual(sorted(started), sorted([instance.instance_id for instance in self.instances]))
+        for instance in self.instances:
+            self.assertEqual(results[instance.id], (True, {}))
+        self.assertEqual(PipelineInstance.objects.filter(is_started=True, executor='tester').count(), 3)
+
+
+class TestBatchStartPipelines(TestCase):
+    def setUp(self):
+        FunctionSwitch.objects.init_db()
+        tree = web_pipeline_tree([])
+        self.template = PipelineTemplate.objects.create_model(tree, creator='tester')
+        self.instances = [PipelineInstance.objects.create_instance(self.template, copy.deepcopy(tree), creator='tester')
+                          for __ in xrange(3)]
+        # 只拦截向 celery 投递任务的 pipeline_ready 处理函数，解析和引擎数据的写入都实际执行
+        self.ready = []
+        signals.pipeline_ready.disconnect(sender=Pipeline, dispatch_uid='_pipeline_ready')
+        signals.pipeline_ready.connect(self.pipeline_ready, sender=Pipeline, dispatch_uid='_test_pipeline_ready')
+
+    def tearDown(self):
+        signals.pipeline_ready.disconnect(sender=Pipeline, dispatch_uid='_test_pipeline_ready')
+        signals.pipeline_ready.connect(handlers.pipeline_ready_handler, sender=Pipeline, dispatch_uid='_pipeline_ready')
+
+    def pipeline_ready(self, sender, process_id, **kwargs):
+        self.ready.append(process_id)
+
+    def test_batch_start(self):
+        results = PipelineInstance.objects.batch_start(self.instances, 'tester', pool_size=1)
+        for instance in self.instances:
+            self.assertEqual(results[instance.id], (True, {}))
+        self.assertEqual(PipelineInstance.objects.filter(is_started=True, executor='tester').count(), 3)
+
+        instance_ids = [instance.instance_id for instance in self.instances]
+        self.assertEqual(Status.objects.filter(id__in=instance_ids).count(), 3)
+        self.assertEqual(StatusChange.objects.filter(node_id__in=instance_ids).count(), 3)
+        models = PipelineModel.objects.filter(id__in=instance_ids)
+        self.assertEqual(sorted(self.ready), sorted([model.process_id for model in models]))
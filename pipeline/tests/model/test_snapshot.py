@@ -1,6 +1,13 @@
+# -*- coding: utf-8 -*-
 from django.test import TestCase
 
-from pipeline.models import Snapshot
+from pipeline.exceptions import InvalidOperationException
+from pipeline.parser.format import format_web_data_to_pipeline
+from pipeline.parser.pipeline_parser import validate_pipeline_tree_recursively
+from pipeline.validators.base import validate_web_pipeline_tree
+from pipeline.models import (Snapshot, PipelineTemplate, PipelineInstance, get_md5sum, unfold_subprocess,
+                             snapshot_data_cache, SUBPROCESS_REF, SnapshotReference)
+from pipeline.tests.model.data import constant, service_activity, subprocess_activity, web_pipeline_tree
 
 
 class TestSnapshot(TestCase):
@@ -24,3 +31,129 @@ class TestSnapshot(TestCase):
         md5, changed = snapshot.has_change(data)
         self.assertTrue(changed)
         self.assertNotEqual(md5, snapshot.md5sum)
+
+    def test_canonical_md5sum(self):
+        data = {'a': 1, 'b': [1, 2, 3], 'c': {'d': 'd', 'e': 'e'}}
+        same_data = {'c': {'e': 'e', 'd': 'd'}, 'b': [1, 2, 3], 'a': 1}
+        self.assertEqual(get_md5sum(data), get_md5sum(same_data))
+        snapshot, created = Snapshot.objects.create_or_get_snapshot(data)
+        self.assertTrue(created)
+        same_snapshot, created = Snapshot.objects.create_or_get_snapshot(same_data)
+        self.assertFalse(created)
+        self.assertEqual(snapshot.id, same_snapshot.id)
+
+
+class TestSubprocessSnapshot(TestCase):
+    def setUp(self):
+        sub_tree = web_pipeline_tree([service_activity() for __ in xrange(5)],
+                                     [constant(0), constant(1, show_type='show')])
+        self.sub_template = PipelineTemplate.objects.create_model(sub_tree, creator='tester')
+
+    def parent_tree(self, sub_template=None):
+        sub_template = sub_template or self.sub_template
+        sub_constants = {'${c_1}': dict(self.sub_template.data['constants']['${c_1}'], value='input')}
+        activities = [service_activity(value='${c_0}')]
+        activities.extend([subprocess_activity(sub_template.template_id, dict(sub_constants)) for __ in xrange(2)])
+        return web_pipeline_tree(activities, [constant(0)])
+
+    def test_subprocess_stored_as_reference(self):
+        instance = PipelineInstance.objects.create_instance(self.sub_template, self.parent_tree(), creator='tester')
+        snapshot = Snapshot.objects.get(id=instance.execution_snapshot_id)
+        refs = snapshot.subprocess_refs
+        self.assertEqual(len(refs), 2)
+        for act_id, ref in refs.iteritems():
+            self.assertEqual(ref['snapshot'], self.sub_template.snapshot.md5sum)
+            self.assertEqual(snapshot.raw_data['activities'][act_id]['pipeline'], {SUBPROCESS_REF: ref})
+
+        data = snapshot.data
+        self.assertEqual(get_md5sum(data), snapshot.md5sum)
+        for act_id in refs:
+            sub_pipeline = data['activities'][act_id]['pipeline']
+            self.assertEqual(sub_pipeline['id'], act_id)
+            self.assertEqual(sub_pipeline['constants']['${c_1}']['value'], 'input')
+            self.assertEqual(len(sub_pipeline['activities']), 5)
+
+    def test_modified_subprocess_stored_in_full(self):
+        instance = PipelineInstance.objects.create_instance(self.sub_template, self.parent_tree(), creator='tester')
+        data = instance.execution_data
+        act_id = instance.execution_snapshot.subprocess_refs.keys()[0]
+        data['activities'][act_id]['pipeline']['constants']['${c_1}']['value'] = 'modified'
+        instance.set_execution_data(data)
+
+        snapshot = Snapshot.objects.get(id=instance.execution_snapshot_id)
+        self.assertEqual(len(snapshot.subprocess_refs), 1)
+        self.assertNotIn(act_id, snapshot.subprocess_refs)
+        self.assertEqual(snapshot.data, data)
+
+    def test_nested_subprocess(self):
+        nested_template = PipelineTemplate.objects.create_model(self.parent_tree(), creator='tester')
+        exec_data = self.parent_tree(nested_template)
+        instance = PipelineInstance.objects.create_instance(self.sub_template, exec_data, creator='tester')
+
+        snapshot = Snapshot.objects.get(id=instance.execution_snapshot_id)
+        self.assertEqual(len(snapshot.subprocess_refs), 2)
+        self.assertEqual(snapshot.data, exec_data)
+        validate_web_pipeline_tree(snapshot.data)
+        validate_pipeline_tree_recursively(format_web_data_to_pipeline(snapshot.data))
+
+        # 各层子流程展开后节点和连线的 ID 互不相同
+        ids = []
+        pipelines = [snapshot.data]
+        while pipelines:
+            pipeline = pipelines.pop()
+            ids.extend(pipeline['activities'].keys() + pipeline['flows'].keys() + pipeline['gateways'].keys())
+            ids.extend([pipeline['start_event']['id'], pipeline['end_event']['id']])
+            pipelines.extend([act['pipeline'] for act in pipeline['activities'].values() if 'pipeline' in act])
+        self.assertEqual(len(ids), len(set(ids)))
+
+    def test_unfold_subprocess_queries(self):
+        nested_template = PipelineTemplate.objects.create_model(self.parent_tree(), creator='tester')
+        snapshot_data_cache.clear()
+
+        # 每一层子流程查询一次模板、一次快照，同一个模板只获取一次
+        with self.assertNumQueries(4):
+            refs = unfold_subprocess(self.parent_tree(nested_template))
+        self.assertEqual(len(refs), 2)
+        for ref in refs.itervalues():
+            self.assertEqual(ref['snapshot'], nested_template.snapshot.md5sum)
+            self.assertEqual(len(ref['subprocess']), 2)
+
+        # 快照数据已经缓存，只需要查询模板
+        with self.assertNumQueries(2):
+            unfold_subprocess(self.parent_tree(nested_template))
+
+    def test_unfold_subprocess_template_not_exist(self):
+        tree = self.parent_tree()
+        for act in tree['activities'].values():
+            if act['type'] == 'SubProcess':
+                act['template_id'] = 'not_exist'
+        self.assertRaises(PipelineTemplate.DoesNotExist, unfold_subprocess, tree)
+
+    def test_referenced_snapshot_not_deleted(self):
+        nested_template = PipelineTemplate.objects.create_model(self.parent_tree(), creator='tester')
+        instance = PipelineInstance.objects.create_instance(self.sub_template, self.parent_tree(nested_template),
+                                                            creator='tester')
+        # 嵌套的子流程快照也被实例快照间接引用
+        self.assertTrue(self.sub_template.snapshot.is_referenced())
+        self.assertRaises(InvalidOperationException, self.sub_template.snapshot.delete)
+        self.assertRaises(InvalidOperationException, nested_template.snapshot.delete)
+
+        snapshot = Snapshot.objects.get(id=instance.execution_snapshot_id)
+        self.assertFalse(snapshot.is_referenced())
+        # 只查询引用关系，不读取其他快照
+        with self.assertNumQueries(1):
+            self.assertTrue(nested_template.snapshot.is_referenced())
+
+        # 引用方删除后，被引用的快照可以删除
+        snapshot.delete()
+        self.assertFalse(nested_template.snapshot.is_referenced())
+        nested_template.snapshot.delete()
+
+    def test_bulk_create_records_references(self):
+        items = [{'exec_data': self.parent_tree(), 'name': 'task_%s' % index, 'creator': 'tester'}
+                 for index in xrange(2)]
+        results = PipelineInstance.objects.bulk_create_instances(self.sub_template, items)
+        for __, instance in results:
+            references = SnapshotReference.objects.filter(referrer_id=instance.execution_snapshot_id)
+            self.assertEqual([ref.md5sum for ref in references], [self.sub_template.snapshot.md5sum])
+        self.assertTrue(self.sub_template.snapshot.is_referenced())
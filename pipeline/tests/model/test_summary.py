@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+import ujson as json
+
+from django.test import TestCase
+
+from pipeline.models import PipelineTemplate, PipelineInstance, get_snapshot_summary
+from pipeline.tests.model.data import constant, service_activity, subprocess_activity, web_pipeline_tree
+
+
+class TestSnapshotSummary(TestCase):
+    def setUp(self):
+        sub_tree = web_pipeline_tree([service_activity() for __ in xrange(3)])
+        self.sub_template = PipelineTemplate.objects.create_model(sub_tree, creator='tester')
+
+    def parent_tree(self):
+        constants = [constant(index, show_type='show' if index % 2 else 'hide') for index in xrange(4)]
+        return web_pipeline_tree([service_activity(value='${c_0}'), subprocess_activity(self.sub_template.template_id)],
+                                 constants)
+
+    def test_get_snapshot_summary(self):
+        summary = get_snapshot_summary(self.parent_tree())
+        self.assertEqual(summary['node_count'], 4)
+        self.assertEqual(json.loads(summary['subprocess_template_ids']), [self.sub_template.template_id])
+        self.assertEqual(json.loads(summary['constant_keys']), ['${c_0}', '${c_1}', '${c_2}', '${c_3}'])
+        self.assertEqual(json.loads(summary['form_keys']), ['${c_1}', '${c_3}'])
+
+    def test_template_summary(self):
+        template = PipelineTemplate.objects.create_model(self.parent_tree(), creator='tester')
+        template = PipelineTemplate.objects.get(id=template.id)
+        self.assertEqual(template.node_count, 4)
+        self.assertEqual(json.loads(template.subprocess_template_ids), [self.sub_template.template_id])
+
+        template.update_template(web_pipeline_tree([service_activity() for __ in xrange(3)], [constant(0)]))
+        template = PipelineTemplate.objects.get(id=template.id)
+        self.assertEqual(template.node_count, 5)
+        self.assertEqual(json.loads(template.subprocess_template_ids), [])
+        self.assertEqual(json.loads(template.constant_keys), ['${c_0}'])
+        self.assertEqual(json.loads(template.form_keys), [])
+
+    def test_instance_summary(self):
+        instance = PipelineInstance.objects.create_instance(self.sub_template, self.parent_tree(), creator='tester')
+        instance = PipelineInstance.objects.get(id=instance.id)
+        self.assertEqual(instance.node_count, 4)
+        self.assertEqual(json.loads(instance.form_keys), ['${c_1}', '${c_3}'])
+
+        data = instance.execution_data
+        data['constants'].pop('${c_3}')
+        instance.set_execution_data(data)
+        instance = PipelineInstance.objects.get(id=instance.id)
+        self.assertEqual(json.loads(instance.constant_keys), ['${c_0}', '${c_1}', '${c_2}'])
+        self.assertEqual(json.loads(instance.form_keys), ['${c_1}'])
+
+        clone = PipelineInstance.objects.get(id=instance.clone(creator='tester').id)
+        self.assertEqual(clone.node_count, 4)
+        self.assertEqual(clone.form_keys, instance.form_keys)
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+import ujson as json
+
+from pipeline.parser.format import format_web_data_to_pipeline
+from .new_data_for_test import (
+    WEB_PIPELINE_DATA,
+    WEB_PIPELINE_WITH_SUB_PROCESS2,
+    id_list2,
+)
+
+
+class TestFormat(unittest.TestCase):
+    def test_format_not_modify_web_pipeline(self):
+        for web_pipeline in [WEB_PIPELINE_DATA, WEB_PIPELINE_WITH_SUB_PROCESS2]:
+            before = json.dumps(web_pipeline, sort_keys=True)
+            pipeline_tree = format_web_data_to_pipeline(web_pipeline)
+            self.assertEqual(json.dumps(web_pipeline, sort_keys=True), before)
+            self.assertNotIn('constants', pipeline_tree)
+            self.assertIn('constants', web_pipeline)
+
+    def test_format_subprocess(self):
+        pipeline_tree = format_web_data_to_pipeline(WEB_PIPELINE_WITH_SUB_PROCESS2)
+        subprocess = pipeline_tree['activities'][id_list2[10]]
+        self.assertIn('exposed_constants', subprocess)
+        self.assertNotIn('constants', subprocess['pipeline'])
+        for key in subprocess['exposed_constants']:
+            self.assertIn(key, subprocess['pipeline']['data']['inputs'])
+        self.assertIsNot(pipeline_tree['start_event'], WEB_PIPELINE_WITH_SUB_PROCESS2['start_event'])
@@ -6,6 +6,8 @@ from pipeline.parser.pipeline_parser import (
     WebPipelineAdapter,
 )
 from pipeline.core.pipeline import Pipeline
+from pipeline.exceptions import NodeNotExistException, FlowTypeError
+from pipeline.parser.cache import pipeline_tree_cache
 from .new_data_for_test import (
     PIPELINE_DATA,
     PIPELINE_WITH_SUB_PROCESS,
@@ -47,3 +49,20 @@ class TestPipelineParser(unittest.TestCase):
                 'radio_test': '1',
             }
         )
+
+    def test_pipeline_get_act_inputs_with_invalid_node(self):
+        parser_obj = WebPipelineAdapter(WEB_PIPELINE_WITH_SUB_PROCESS2)
+        self.assertRaises(NodeNotExistException, parser_obj.get_act_inputs, 'not_exist_act', [id_list2[10]])
+        self.assertRaises(NodeNotExistException, parser_obj.get_act_inputs, id_list2[3], ['not_exist_subprocess'])
+        self.assertRaises(FlowTypeError, parser_obj.get_act_inputs, id_list2[10])
+
+    def test_web_pipeline_adapter_cache(self):
+        cache_key = 'test_web_pipeline_adapter_cache'
+        pipeline_tree_cache.delete(cache_key)
+        parser_obj = WebPipelineAdapter(WEB_PIPELINE_WITH_SUB_PROCESS2, cache_key=cache_key)
+        self.assertEqual(pipeline_tree_cache.get(cache_key), parser_obj.pipeline_tree)
+
+        # formatted pipeline tree is reused, web pipeline tree will not be validated again
+        cached_parser_obj = WebPipelineAdapter({}, cache_key=cache_key)
+        self.assertEqual(cached_parser_obj.pipeline_tree, parser_obj.pipeline_tree)
+        pipeline_tree_cache.delete(cache_key)
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import time
+
+from django.test import TestCase
+
+from pipeline.utils.cache import LRUCache
+
+
+class TestLRUCache(TestCase):
+    def test_get_and_set(self):
+        cache = LRUCache(max_size=2)
+        self.assertIsNone(cache.get('key'))
+        self.assertEqual(cache.get('key', 'default'), 'default')
+        cache.set('key', {'a': [1, 2]})
+        self.assertEqual(cache.get('key'), {'a': [1, 2]})
+
+    def test_get_returns_copy(self):
+        cache = LRUCache(max_size=2)
+        cache.set('key', {'a': [1, 2]})
+        value = cache.get('key')
+        value['a'].append(3)
+        self.assertEqual(cache.get('key'), {'a': [1, 2]})
+
+        # set 之后修改原数据也不会影响缓存
+        origin = {'a': [1, 2]}
+        cache.set('key', origin)
+        origin['a'].append(3)
+        self.assertEqual(cache.get('key'), {'a': [1, 2]})
+
+    def test_keep_value_type(self):
+        cache = LRUCache(max_size=2)
+        value = {1: (1, 2), 'b': set(['c'])}
+        cache.set('key', value)
+        self.assertEqual(cache.get('key'), value)
+
+    def test_evict_least_recently_used(self):
+        cache = LRUCache(max_size=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_timeout(self):
+        cache = LRUCache(max_size=2, timeout=0.01)
+        cache.set('a', 1)
+        cache.set('b', 2, timeout=60)
+        time.sleep(0.02)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('b'), 2)
+
+    def test_delete_and_clear(self):
+        cache = LRUCache(max_size=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.delete('a')
+        self.assertIsNone(cache.get('a'))
+        cache.clear()
+        self.assertEqual(len(cache), 0)
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+from django.test import TestCase
+
+from pipeline.utils.graph import Graph
+
+
+class TestGraph(TestCase):
+    def test_graph_without_cycle(self):
+        graph = Graph([1, 2, 3, 4], [[1, 2], [2, 3], [3, 4]])
+        self.assertFalse(graph.has_cycle())
+        self.assertEqual(graph.get_cycle(), [])
+
+    def test_graph_with_cycle(self):
+        graph = Graph([1, 2, 3, 4], [[1, 2], [2, 3], [3, 4], [4, 1]])
+        self.assertTrue(graph.has_cycle())
+        self.assertEqual(graph.get_cycle(), [1, 2, 3, 4, 1])
+
+        graph = Graph([1, 2, 3, 4], [[1, 2], [2, 3], [3, 4], [4, 2]])
+        self.assertEqual(graph.get_cycle(), [2, 3, 4, 2])
+
+    def test_graph_with_shared_branches(self):
+        # 多层菱形结构，每层都汇聚到同一个节点
+        nodes = range(3 * 40 + 1)
+        flows = []
+        for i in xrange(0, 3 * 40, 3):
+            flows.extend([[i, i + 1], [i, i + 2], [i + 1, i + 3], [i + 2, i + 3]])
+        graph = Graph(nodes, flows)
+        self.assertFalse(graph.has_cycle())
+
+        graph = Graph(nodes, flows + [[120, 60]])
+        cycle = graph.get_cycle()
+        self.assertEqual(cycle[0], 60)
+        self.assertEqual(cycle[-1], 60)
+        self.assertEqual(cycle[-2], 120)
+
+    def test_long_chain(self):
+        nodes = range(5000)
+        flows = [[i, i + 1] for i in xrange(4999)]
+        self.assertFalse(Graph(nodes, flows).has_cycle())
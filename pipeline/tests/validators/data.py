@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+from pipeline.core.constants import PE
+
+
+def pipeline_tree(gateways, flows):
+    """
+    @summary: 生成只包含节点连接关系的流程树（format_web_data_to_pipeline 之后的格式），供网关校验使用
+    @param gateways: {网关 ID: 网关类型}
+    @param flows: [(起始节点 ID, 目标节点 ID)]，除了 start、end 以及 gateways 中的节点，其他节点都是任务节点
+    """
+    tree = {
+        'id': 'pipeline',
+        PE.start_event: {'id': 'start', 'type': PE.EmptyStartEvent, PE.incoming: [], PE.outgoing: []},
+        PE.end_event: {'id': 'end', 'type': PE.EmptyEndEvent, PE.incoming: [], PE.outgoing: []},
+        PE.activities: {},
+        PE.gateways: {},
+        PE.flows: {},
+    }
+    nodes = {'start': tree[PE.start_event], 'end': tree[PE.end_event]}
+    for gw_id, gw_type in gateways.iteritems():
+        nodes[gw_id] = tree[PE.gateways][gw_id] = {'id': gw_id, 'type': gw_type, PE.incoming: [], PE.outgoing: []}
+
+    for index, (source, target) in enumerate(flows):
+        for node_id in [source, target]:
+            if node_id not in nodes:
+                nodes[node_id] = tree[PE.activities][node_id] = {
+                    'id': node_id,
+                    'type': PE.ServiceActivity,
+                    PE.incoming: [],
+                    PE.outgoing: [],
+                }
+        flow_id = 'flow_%s' % index
+        tree[PE.flows][flow_id] = {'id': flow_id, 'source': source, 'target': target, 'is_default': False}
+        nodes[source][PE.outgoing].append(flow_id)
+        nodes[target][PE.incoming].append(flow_id)
+    return tree
+
+
+def parallel_with_exclusive_tree(exclusive_to_end):
+    """
+    @summary: 并行网关 pg 的一个分支上有一个分支网关 eg，exclusive_to_end 为 True 时 eg 的一个分支直接连接结束节点
+    """
+    gateways = {
+        'pg': PE.ParallelGateway,
+        'pg_converge': PE.ConvergeGateway,
+        'eg': PE.ExclusiveGateway,
+        'eg_converge': PE.ConvergeGateway,
+    }
+    flows = [
+        ('start', 'pg'),
+        ('pg', 'act_1'), ('act_1', 'eg'),
+        ('eg', 'act_2'), ('act_2', 'eg_converge'),
+        ('eg', 'act_3'), ('act_3', 'eg_converge'),
+        ('eg_converge', 'pg_converge'),
+        ('pg', 'act_4'), ('act_4', 'pg_converge'),
+        ('pg_converge', 'end'),
+    ]
+    if exclusive_to_end:
+        flows.extend([('eg', 'act_5'), ('act_5', 'end')])
+    return pipeline_tree(gateways, flows)
+
+
+def nested_gateways_tree(depth):
+    """
+    @summary: 嵌套 depth 层网关，并行网关与分支网关交替出现，每层网关的第一个分支连接下一层网关，另一个分支挂载一个任务节点
+    """
+    gateways = {}
+    flows = []
+    prev_id = 'start'
+    for level in xrange(depth):
+        gw_id, converge_id = 'gw_%s' % level, 'converge_%s' % level
+        gateways[gw_id] = PE.ParallelGateway if level % 2 else PE.ExclusiveGateway
+        gateways[converge_id] = PE.ConvergeGateway
+        flows.extend([(prev_id, gw_id), (gw_id, 'act_%s' % level), ('act_%s' % level, converge_id)])
+        prev_id = gw_id
+
+    flows.extend([(prev_id, 'act_inner'), ('act_inner', 'converge_%s' % (depth - 1))])
+    for level in xrange(depth - 1, 0, -1):
+        flows.append(('converge_%s' % level, 'converge_%s' % (level - 1)))
+    flows.append(('converge_0', 'end'))
+    return pipeline_tree(gateways, flows)
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+from django.test import TestCase
+
+from pipeline import exceptions
+from pipeline.core.constants import PE
+from pipeline.validators.index import PipelineTreeIndex
+from pipeline.validators.gateway import match_converge_gateways
+from pipeline.tests.validators.data import pipeline_tree, parallel_with_exclusive_tree, nested_gateways_tree
+
+
+class TestMatchConvergeGateways(TestCase):
+    def test_match(self):
+        index = PipelineTreeIndex(parallel_with_exclusive_tree(exclusive_to_end=False))
+        self.assertEqual(match_converge_gateways(index), {'pg': 'pg_converge'})
+
+    def test_exclusive_to_end_in_parallel(self):
+        index = PipelineTreeIndex(parallel_with_exclusive_tree(exclusive_to_end=True))
+        self.assertRaises(exceptions.ConvergeMatchError, match_converge_gateways, index)
+        try:
+            match_converge_gateways(index)
+        except exceptions.ConvergeMatchError as e:
+            self.assertEqual(e.gateway_id, 'eg')
+
+    def test_parallel_not_converge_all_branches(self):
+        tree = pipeline_tree({'pg': PE.ParallelGateway, 'converge': PE.ConvergeGateway}, [
+            ('start', 'pg'),
+            ('pg', 'act_1'), ('act_1', 'converge'),
+            ('pg', 'act_2'), ('act_2', 'converge'),
+            ('pg', 'act_3'), ('act_3', 'end'),
+            ('converge', 'end'),
+        ])
+        self.assertRaises(exceptions.ConvergeMatchError, match_converge_gateways, PipelineTreeIndex(tree))
+
+    def test_deeply_nested_gateways(self):
+        matches = match_converge_gateways(PipelineTreeIndex(nested_gateways_tree(depth=2000)))
+        self.assertEqual(len(matches), 1000)
+        self.assertEqual(matches['gw_1'], 'converge_1')
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+import copy
+
+from django.test import TestCase
+
+from pipeline import exceptions
+from pipeline.parser.format import format_web_data_to_pipeline
+from pipeline.validators.base import validate_web_pipeline_tree, validate_pipeline_tree
+from pipeline.validators.index import PipelineTreeIndex
+from pipeline.tests.pipeline_parser.new_data_for_test import WEB_PIPELINE_WITH_SUB_PROCESS2
+
+
+class TestValidators(TestCase):
+    def test_validate_web_pipeline_tree(self):
+        validate_web_pipeline_tree(WEB_PIPELINE_WITH_SUB_PROCESS2)
+
+        web_pipeline = copy.deepcopy(WEB_PIPELINE_WITH_SUB_PROCESS2)
+        web_pipeline['start_event']['type'] = 'EmptyEndEvent'
+        self.assertRaises(exceptions.ParserWebTreeException, validate_web_pipeline_tree, web_pipeline)
+
+    def test_validate_pipeline_tree(self):
+        pipeline_tree = format_web_data_to_pipeline(WEB_PIPELINE_WITH_SUB_PROCESS2)
+        before = copy.deepcopy(pipeline_tree['flows'])
+        validate_pipeline_tree(pipeline_tree)
+        self.assertEqual(pipeline_tree['flows'], before)
+        for gateway in pipeline_tree['gateways'].values():
+            if gateway['type'] != 'ConvergeGateway':
+                self.assertIn('converge_gateway_id', gateway)
+
+    def test_check_connection(self):
+        pipeline_tree = format_web_data_to_pipeline(WEB_PIPELINE_WITH_SUB_PROCESS2)
+        self.assertTrue(PipelineTreeIndex(pipeline_tree).check_connection()['result'])
+
+        # 结束节点没有入度
+        pipeline_tree['end_event']['incoming'] = ''
+        result = PipelineTreeIndex(pipeline_tree).check_connection()
+        self.assertFalse(result['result'])
+        self.assertIn(pipeline_tree['end_event']['id'], result['failed_nodes'])
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """
+    进程内的 LRU 缓存，可选过期时间（秒）
+    set 和 get 时都会深拷贝缓存值，调用方可以随意修改而不会污染缓存，缓存值的类型也会原样保留
+    """
+
+    def __init__(self, max_size, timeout=None):
+        self.max_size = max_size
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.pop(key, None)
+            if item is None:
+                return default
+            expire_at, value = item
+            if expire_at is not None and expire_at < time.time():
+                return default
+            # move to the end as the most recently used
+            self._data[key] = item
+        return copy.deepcopy(value)
+
+    def set(self, key, value, timeout=None):
+        timeout = timeout or self.timeout
+        expire_at = time.time() + timeout if timeout else None
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (expire_at, value)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
@@ -7,24 +7,42 @@ class Graph(object):
         self.flows = flows
         self.path = []
         self.last_visited_node = ''
+        self.targets = {}
+        for flow in flows:
+            self.targets.setdefault(flow[0], []).append(flow[1])
 
     def has_cycle(self):
         self.path = []
+        visited = set()
         for node in self.nodes:
-            if self.visit(node):
+            if node not in visited and self.visit(node, visited):
                 return True
         return False
 
-    def visit(self, node):
+    def visit(self, node, visited=None):
+        """
+        深度优先遍历，self.path 中保存当前搜索路径；已经完整遍历过的节点记录在 visited 中不再重复访问
+        """
+        if visited is None:
+            visited = set()
         self.path.append(node)
-        target_nodes = [flow[1] for flow in self.flows if flow[0] == node]
-        for target in target_nodes:
-            if target in self.path:
-                self.last_visited_node = target
-                return True
-            if self.visit(target):
-                return True
-        self.path.remove(node)
+        in_path = {node}
+        stack = [iter(self.targets.get(node, []))]
+        while stack:
+            for target in stack[-1]:
+                if target in in_path:
+                    self.last_visited_node = target
+                    return True
+                if target not in visited:
+                    self.path.append(target)
+                    in_path.add(target)
+                    stack.append(iter(self.targets.get(target, [])))
+                    break
+            else:
+                stack.pop()
+                finished = self.path.pop()
+                in_path.discard(finished)
+                visited.add(finished)
         return False
 
     def get_cycle(self):
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+from multiprocessing.pool import ThreadPool
+
+from django.db import connection
+from django.utils import translation
+
+
+def map_in_threads(func, items, pool_size):
+    """
+    @summary: 在线程池中对 items 中的每一项执行 func
+              pool_size 不大于 1 或者只有一项时直接在当前线程中执行；
+              工作线程会沿用当前线程的语言设置，并在每一项执行完毕后关闭该线程的数据库连接
+    @param func: 处理函数
+    @param items: 待处理的数据列表
+    @param pool_size: 线程数
+    @return: 与 items 一一对应的结果列表
+    """
+    items = list(items)
+    if pool_size <= 1 or len(items) <= 1:
+        return map(func, items)
+
+    language = translation.get_language()
+
+    def run(item):
+        translation.activate(language)
+        try:
+            return func(item)
+        finally:
+            connection.close()
+
+    pool = ThreadPool(min(pool_size, len(items)))
+    try:
+        return pool.map(run, items)
+    finally:
+        pool.close()
+        pool.join()
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+from django.utils.translation import ugettext_lazy as _
+
+from pipeline import exceptions
+from pipeline.core.constants import PE
+
+
+def match_converge_gateways(index):
+    """
+    @summary: 一次遍历计算所有网关对应的汇聚网关
+              按后序处理网关，处理某个网关时其分支上的所有网关都已经处理过，
+              分支沿着已匹配的汇聚网关向后跳转，直到遇到汇聚网关或结束节点，每个网关只计算一次
+    @param index: 流程树节点索引 PipelineTreeIndex
+    @return: {并行网关 ID: 汇聚网关 ID}
+    @raise ConvergeMatchError:
+    """
+    converge_list, gateway_list = index.get_converge_nodes()
+    end_event = index.end
+
+    # (汇聚网关 ID, 汇聚网关是否还汇聚了其他网关的分支)
+    results = {}
+    # 网关分支上直接经过的网关
+    callees = {}
+    end_branch_gateways = []
+    post_order = _post_order(converge_list, gateway_list)
+    for gateway_id in post_order:
+        if gateway_id not in gateway_list:
+            continue
+        gateway = gateway_list[gateway_id]
+        branch_gateways = callees[gateway_id] = []
+        target = []
+        for node_id in gateway['target']:
+            while node_id in gateway_list:
+                branch_gateways.append(node_id)
+                converge_id, shared = results[node_id]
+                if not converge_id:
+                    node_id = end_event
+                elif shared:
+                    node_id = converge_id
+                else:
+                    node_id = converge_list[converge_id]['target'][0]
+            target.append(node_id)
+
+        is_exg = gateway['type'] == PE.ExclusiveGateway
+        converge_id = None
+        shared = False
+
+        # 判断各个分支的汇聚网关是否相同
+        for node_id in target:
+            if node_id in converge_list and not converge_id:
+                converge_id = node_id
+            elif node_id in converge_list and converge_id == node_id:
+                pass
+            elif is_exg and node_id == end_event:
+                end_branch_gateways.append(gateway_id)
+            else:
+                raise exceptions.ConvergeMatchError(gateway_id, _(u"该网关的分支并必须汇聚到同一个汇聚网关"))
+
+        # 判断汇聚网关有没有连接其他的节点产生的分支
+        if is_exg:
+            if converge_id in converge_list:
+                if len(converge_list[converge_id]['incoming']) > len(target):
+                    shared = True
+        else:
+            converge_incoming = len(converge_list[converge_id]['incoming'])
+            gateway_outgoing = len(target)
+            if converge_incoming > gateway_outgoing:
+                shared = True
+            elif converge_incoming < gateway_outgoing:
+                raise exceptions.ConvergeMatchError(converge_id, _(u"汇聚网关没有汇聚其对应的并行网关的所有分支"))
+
+        results[gateway_id] = (converge_id, shared)
+
+    # 并行网关分支中的分支网关不能有直接连接结束节点的分支
+    if end_branch_gateways:
+        in_parallel = set()
+        for gateway_id in reversed(post_order):
+            if gateway_id in callees and (gateway_id in in_parallel or
+                                          gateway_list[gateway_id]['type'] == PE.ParallelGateway):
+                in_parallel.update(callees[gateway_id])
+        for gateway_id in end_branch_gateways:
+            if gateway_id in in_parallel:
+                raise exceptions.ConvergeMatchError(gateway_id,
+                                                    _(u"并行网关中的分支网关必须将所有分支汇聚到一个汇聚网关"))
+
+    return {gateway_id: results[gateway_id][0] for gateway_id, gateway in gateway_list.iteritems()
+            if gateway['type'] != PE.ExclusiveGateway}
+
+
+def _post_order(converge_list, gateway_list):
+    """
+    @summary: 网关（包括汇聚网关）的后序遍历序列，节点总是排在其后继节点之后
+    @raise ConvergeMatchError: 网关之间存在环路
+    """
+    nodes = {}
+    nodes.update(converge_list)
+    nodes.update(gateway_list)
+
+    order = []
+    finished = set()
+    for root in nodes:
+        if root in finished:
+            continue
+        in_path = {root}
+        stack = [(root, iter(nodes[root]['target']))]
+        while stack:
+            node_id, targets = stack[-1]
+            for target in targets:
+                if target not in nodes or target in finished:
+                    continue
+                if target in in_path:
+                    raise exceptions.ConvergeMatchError(target, _(u"该网关的分支并必须汇聚到同一个汇聚网关"))
+                in_path.add(target)
+                stack.append((target, iter(nodes[target]['target'])))
+                break
+            else:
+                stack.pop()
+                in_path.discard(node_id)
+                finished.add(node_id)
+                order.append(node_id)
+    return order
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+from django.utils.translation import ugettext_lazy as _
+
+from pipeline.utils.graph import Graph
+from pipeline.validators.constants import ACTIVITY_RULES
+
+
+def format_to_list(notype):
+    """
+    format a data to list
+    :return:
+    """
+    if isinstance(notype, list):
+        return notype
+    if not notype:
+        return []
+    return [notype]
+
+
+class PipelineTreeIndex(object):
+    """
+    流程树节点索引，记录每个节点的前驱、后继节点，供连接、环路、汇聚网关校验共用
+    只读取流程树，不会拷贝或修改流程树中的数据
+    """
+
+    def __init__(self, pipeline_tree):
+        self.tree = pipeline_tree
+        self.start = pipeline_tree['start_event']['id']
+        self.end = pipeline_tree['end_event']['id']
+        self.activities = pipeline_tree['activities']
+        self.gateways = pipeline_tree['gateways']
+
+        self.nodes = {
+            self.start: pipeline_tree['start_event'],
+            self.end: pipeline_tree['end_event'],
+        }
+        self.nodes.update(self.activities)
+        self.nodes.update(self.gateways)
+
+        flows = pipeline_tree['flows']
+        self.incoming = {}
+        self.sources = {}
+        self.targets = {}
+        for node_id, node in self.nodes.iteritems():
+            incoming = format_to_list(node['incoming'])
+            self.incoming[node_id] = incoming
+            self.sources[node_id] = [flows[flow_id]['source'] for flow_id in incoming]
+            self.targets[node_id] = [flows[flow_id]['target'] for flow_id in format_to_list(node['outgoing'])]
+
+    def check_connection(self):
+        """
+        节点连接合法性校验，会检查所有节点并汇总每个不合法节点的错误信息，
+        而不是在遇到第一个节点后就返回
+
+        return {
+            "result": False,
+            "message": {"dfc939e785c4484f884583beb9bb791a": "error message"},
+            "failed_nodes": ["dfc939e785c4484f884583beb9bb791a", "8f0bf9a291dd94627997870405eeff4d"]
+        }
+        """
+        result = {
+            "result": True,
+            "message": {},
+            "failed_nodes": []
+        }
+
+        for node_id, node in self.nodes.iteritems():
+            rule = ACTIVITY_RULES[node['type']]
+            sources = self.sources[node_id]
+            targets = self.targets[node_id]
+            message = ""
+            for target in targets:
+                if self.nodes[target]['type'] not in rule['allowed_out']:
+                    message += _(u"不能连接%s类型节点\n") % node['type']
+            if rule["min_in"] > len(sources) or len(sources) > rule['max_in']:
+                message += _(u"节点的入度最大为%s，最小为%s\n") % (rule['max_in'], rule['min_in'])
+            if rule["min_out"] > len(targets) or len(targets) > rule['max_out']:
+                message += _(u"节点的出度最大为%s，最小为%s\n") % (rule['max_out'], rule['min_out'])
+            if message:
+                result['failed_nodes'].append(node_id)
+                result["message"][node_id] = message
+
+        if result['failed_nodes']:
+            result['result'] = False
+        return result
+
+    def check_cycle(self):
+        """
+        validate if a graph has not cycle
+
+        return {
+            "result": False,
+            "message": "error message",
+            "failed_nodes": ["dfc939e785c4484f884583beb9bb791a", "8f0bf9a291dd94627997870405eeff4d"]
+        }
+        """
+        flows = [[source, target] for source, targets in self.targets.iteritems() for target in targets]
+        cycle = Graph(self.nodes.keys(), flows).get_cycle()
+        if cycle:
+            return {
+                'result': False,
+                'message': 'pipeline graph has cycle',
+                'error_data': cycle
+            }
+        return {'result': True, 'data': []}
+
+    def get_converge_nodes(self):
+        """
+        @summary: 获取汇聚网关校验所需的网关信息，网关的 target 为跳过任务节点后的第一个 网关/结束事件
+        @return: 汇聚网关, 其他网关
+        """
+        converge_list = {}
+        gateway_list = {}
+        for gateway_id, item in self.gateways.iteritems():
+            target = []
+            for index in self.targets[gateway_id]:
+                while index in self.activities:
+                    index = self.targets[index][0]
+                target.append(index)
+            node = {
+                "incoming": self.incoming[gateway_id],
+                "type": item["type"],
+                "target": target,
+                "match": None,
+                "id": item['id']
+            }
+
+            if item['type'] == "ConvergeGateway":
+                converge_list[gateway_id] = node
+            else:
+                gateway_list[gateway_id] = node
+        return converge_list, gateway_list
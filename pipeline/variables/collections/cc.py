@@ -4,7 +4,7 @@ import re
 import logging
 
 from pipeline.conf import settings
-from pipeline.exceptions import VariableHydrateException
+from pipeline.exceptions import VariableHydrateException, ComponentApiException
 from pipeline.components.utils import (cc_get_ips_info_by_str,
                                        cc_get_ips_by_set_and_module)
 from pipeline.core.data.var import LazyVariable
@@ -17,8 +17,18 @@ logger = logging.getLogger('root')
 class VarIpPickerVariable(LazyVariable):
     code = 'var_ip_picker'
     form = '%svariables/var_ip_picker.js' % settings.STATIC_URL
+    # 相同业务和执行人的同一个选择在短时间内创建的任务中复用，不需要每次都查询配置平台
+    cache_ttl = 60
+    cache_scope = ('biz_cc_id', 'executor')
 
     def get_value(self):
+        # 查询配置平台失败时抛出异常，不能把空值作为变量的值，否则会被缓存并被其他任务复用
+        try:
+            return self._get_value()
+        except ComponentApiException as e:
+            raise VariableHydrateException(u'var_ip_picker get value error: %s' % e)
+
+    def _get_value(self):
         var_ip_picker = self.value
         username = self.pipeline_data['executor']
         biz_cc_id = self.pipeline_data['biz_cc_id']
@@ -30,7 +40,7 @@ class VarIpPickerVariable(LazyVariable):
         if produce_method == 'custom':
             custom_value = var_ip_picker['var_ip_custom_value']
             if value_type == 'ip':
-                data = cc_get_ips_info_by_str(username, biz_cc_id, custom_value)
+                data = cc_get_ips_info_by_str(username, biz_cc_id, custom_value, raise_exception=True)
                 ip_list = data['ip_result']
             elif value_type == 'dns':
                 dns_list = custom_value.split('\n')
@@ -63,6 +73,7 @@ class VarIpPickerVariable(LazyVariable):
                     select_set,
                     None,
                     select_module,
+                    raise_exception=True,
                 )
 
         else:
@@ -78,6 +89,7 @@ class VarIpPickerVariable(LazyVariable):
                     None,
                     set_names,
                     module_names,
+                    raise_exception=True,
                 )
 
         if value_type == 'ip':
@@ -0,0 +1,83 @@
+(function () {
+    $.atoms.batch_restart_vm = [
+        {
+            tag_code: "is_interface",
+            type: "input",
+            attrs: {
+                name: gettext("接口调用"),
+                placeholder: gettext("必填(true/false)"),
+                hookable: true
+            },
+            validation: [
+                {
+                    type: "required"
+                }
+            ]
+        },
+        {
+            tag_code: "host",
+            type: "input",
+            attrs: {
+                name: gettext("主机"),
+                placeholder: gettext("必填，主机IP"),
+                hookable: true
+            },
+            validation: [
+                {
+                    type: "required"
+                }
+            ]
+        },
+        {
+            tag_code: "account",
+            type: "input",
+            attrs: {
+                name: gettext("VC账号"),
+                placeholder: gettext("必填，VC账号"),
+                hookable: true
+            },
+            validation: [
+                {
+                    type: "required"
+                }
+            ]
+        },
+        {
+            tag_code: "password",
+            type: "input",
+            attrs: {
+                name: gettext("VC密码"),
+                placeholder: gettext("必填，VC密码"),
+                hookable: true
+            },
+            validation: [
+                {
+                    type: "required"
+                }
+            ]
+        },
+        {
+            tag_code: "vm_moIds",
+            type: "textarea",
+            attrs: {
+                name: gettext("vm_moIds"),
+                placeholder: gettext("必填，虚拟机ID，多个用换行符或逗号分隔"),
+                hookable: true
+            },
+            validation: [
+                {
+                    type: "required"
+                }
+            ]
+        },
+        {
+            tag_code: "concurrency",
+            type: "input",
+            attrs: {
+                name: gettext("并发数"),
+                placeholder: gettext("选填，同时执行的虚拟机数量，默认为10"),
+                hookable: true
+            }
+        }
+    ];
+})();
\ No newline at end of file